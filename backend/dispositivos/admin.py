@@ -1,6 +1,8 @@
 from django.contrib import admin  # type: ignore
 from django.contrib.auth.admin import UserAdmin
-from .models import Sede, Servicios, Posicion, Dispositivo, Movimiento, Historial, RolUser
+from .busqueda import buscar_dispositivos
+from .diffs import decodificar_cambios
+from .models import Sede, Servicios, Posicion, Dispositivo, Movimiento, Historial, RolUser, ResumenInventario, TokenRevocado
 
 # Admin para RolUser
 @admin.register(RolUser)
@@ -57,10 +59,18 @@ class DispositivoAdmin(admin.ModelAdmin):
     list_editable = ('estado',)
     ordering = ('modelo',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Usa el índice de texto completo en lugar de icontains sobre cada campo
+        if not search_term:
+            return queryset, False
+        ids = buscar_dispositivos(Dispositivo.objects.all(), search_term).values('id')
+        return queryset.filter(id__in=ids), False
+
 # Admin para Movimiento
 @admin.register(Movimiento)
 class MovimientoAdmin(admin.ModelAdmin):
     list_display = ('dispositivo', 'encargado', 'fecha_movimiento', 'ubicacion_origen', 'ubicacion_destino')
+    list_select_related = ('dispositivo', 'encargado')
     search_fields = ('dispositivo__serial', 'encargado__username', 'ubicacion_origen', 'ubicacion_destino')
     list_filter = ('fecha_movimiento', 'ubicacion_origen', 'ubicacion_destino')
     date_hierarchy = 'fecha_movimiento'
@@ -69,8 +79,30 @@ class MovimientoAdmin(admin.ModelAdmin):
 @admin.register(Historial)
 class HistorialAdmin(admin.ModelAdmin):
     list_display = ('dispositivo', 'usuario', 'fecha_modificacion', 'tipo_cambio', 'cambios')
+    list_select_related = ('dispositivo', 'usuario')
+    readonly_fields = ('cambios_legibles',)
     search_fields = ('dispositivo__serial', 'usuario__username', 'tipo_cambio')
     list_filter = ('fecha_modificacion', 'tipo_cambio')
     date_hierarchy = 'fecha_modificacion'
-    
-    
+
+    @admin.display(description='Cambios (legible)')
+    def cambios_legibles(self, obj):
+        detalle = decodificar_cambios([obj.cambios])[0]
+        if not isinstance(detalle, list):
+            return detalle
+        return "; ".join(f"{d['etiqueta']}: {d['antes']} → {d['despues']}" for d in detalle)
+
+# Admin para ResumenInventario (solo lectura, se mantiene con señales)
+@admin.register(ResumenInventario)
+class ResumenInventarioAdmin(admin.ModelAdmin):
+    list_display = ('sede', 'tipo', 'estado', 'cantidad')
+    list_filter = ('sede', 'tipo', 'estado')
+    readonly_fields = ('sede', 'tipo', 'estado', 'cantidad')
+
+# Admin para TokenRevocado (se alimenta con el logout y la revocación de tokens)
+@admin.register(TokenRevocado)
+class TokenRevocadoAdmin(admin.ModelAdmin):
+    list_display = ('jti', 'usuario', 'expira', 'fecha_revocacion')
+    list_select_related = ('usuario',)
+    search_fields = ('jti', 'usuario__username')
+    readonly_fields = ('jti', 'usuario', 'expira', 'fecha_revocacion')
@@ -0,0 +1,193 @@
+"""
+Archivo de auditoría (Historial y Movimiento).
+
+Las tablas de auditoría solo guardan los registros recientes. La retención mueve los
+registros anteriores al corte a archivos JSONL comprimidos con gzip, uno por mes y tabla:
+
+    <AUDITORIA_ARCHIVO_DIR>/<tabla>/<AAAA-MM>/<primer_id>-<ultimo_id>.jsonl.gz
+
+Cada tabla tiene un `indice.json` con el mes, el rango de ids y los dispositivos de cada
+archivo, de modo que una consulta por dispositivo solo abre los archivos que lo contienen.
+`registros_dispositivo` devuelve los registros recientes y archivados como un único
+listado ordenado del más reciente al más antiguo; la línea de tiempo del dispositivo lo
+usa para continuar en el archivo cuando se agotan las tablas.
+"""
+import gzip
+import json
+import os
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings # type: ignore
+from django.core.serializers.json import DjangoJSONEncoder # type: ignore
+from django.db import transaction # type: ignore
+from django.db.models import Min, Q # type: ignore
+from django.utils import timezone # type: ignore
+from django.utils.dateparse import parse_datetime # type: ignore
+
+from .models import Historial, Movimiento
+
+CAMPOS_FECHA = {
+    Historial: 'fecha_modificacion',
+    Movimiento: 'fecha_movimiento',
+}
+
+BATCH_SIZE = 2000
+
+
+def directorio_archivo():
+    return str(getattr(settings, 'AUDITORIA_ARCHIVO_DIR', os.path.join(settings.BASE_DIR, 'archivo_auditoria')))
+
+
+def campos(modelo):
+    return [field.attname for field in modelo._meta.concrete_fields]
+
+
+def _ruta_tabla(modelo, directorio):
+    return os.path.join(directorio, modelo._meta.model_name)
+
+
+def leer_indice(modelo, directorio=None):
+    ruta = os.path.join(_ruta_tabla(modelo, directorio or directorio_archivo()), 'indice.json')
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def _guardar_indice(modelo, directorio, indice):
+    ruta = os.path.join(_ruta_tabla(modelo, directorio), 'indice.json')
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(indice, archivo)
+    os.replace(temporal, ruta)
+
+
+def _siguiente_mes(fecha):
+    return fecha.replace(year=fecha.year + fecha.month // 12, month=fecha.month % 12 + 1)
+
+
+def _inicio_mes(fecha):
+    return fecha.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _escribir_mes(modelo, registros, directorio, mes):
+    """
+    Escribe los registros en un archivo temporal y lo renombra al terminar. El nombre
+    depende de los ids archivados, así que repetir una ejecución interrumpida sobrescribe
+    el mismo archivo en lugar de duplicar registros.
+    """
+    carpeta = os.path.join(_ruta_tabla(modelo, directorio), mes)
+    os.makedirs(carpeta, exist_ok=True)
+    temporal = os.path.join(carpeta, '.en-curso.jsonl.gz')
+
+    ids = []
+    dispositivos = set()
+    with gzip.open(temporal, 'wt', encoding='utf-8') as archivo:
+        for registro in registros:
+            archivo.write(json.dumps(registro, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n')
+            ids.append(registro['id'])
+            dispositivos.add(registro['dispositivo_id'])
+
+    if not ids:
+        os.remove(temporal)
+        return None, []
+
+    nombre = os.path.join(mes, f"{ids[0]}-{ids[-1]}.jsonl.gz")
+    os.replace(temporal, os.path.join(_ruta_tabla(modelo, directorio), nombre))
+    entrada = {
+        'archivo': nombre, 'mes': mes, 'primer_id': ids[0], 'ultimo_id': ids[-1],
+        'registros': len(ids), 'dispositivos': sorted(dispositivos),
+    }
+    return entrada, ids
+
+
+def archivar(modelo, corte, directorio=None, aplicar=True):
+    """
+    Mueve al archivo los registros de `modelo` anteriores a `corte`, mes a mes.
+    Devuelve [(mes, registros)]. Con `aplicar=False` solo cuenta lo que se archivaría.
+    """
+    directorio = directorio or directorio_archivo()
+    campo_fecha = CAMPOS_FECHA[modelo]
+    antiguos = modelo.objects.filter(**{f"{campo_fecha}__lt": corte})
+    primera = antiguos.aggregate(primera=Min(campo_fecha))['primera']
+    if primera is None:
+        return []
+
+    resultado = []
+    indice = leer_indice(modelo, directorio)
+    inicio = _inicio_mes(primera)
+    while inicio < corte:
+        fin = min(_siguiente_mes(inicio), corte)
+        mes = inicio.strftime('%Y-%m')
+        del_mes = antiguos.filter(**{f"{campo_fecha}__gte": inicio, f"{campo_fecha}__lt": fin}).order_by('id')
+
+        if not aplicar:
+            cantidad = del_mes.count()
+            if cantidad:
+                resultado.append((mes, cantidad))
+            inicio = fin
+            continue
+
+        entrada, ids = _escribir_mes(modelo, del_mes.values(*campos(modelo)).iterator(chunk_size=BATCH_SIZE), directorio, mes)
+        if entrada:
+            # El índice se actualiza antes de borrar: si el borrado falla, los registros
+            # siguen en la tabla y la siguiente ejecución reescribe el mismo archivo.
+            indice = [e for e in indice if e['archivo'] != entrada['archivo']] + [entrada]
+            _guardar_indice(modelo, directorio, indice)
+            with transaction.atomic():
+                for i in range(0, len(ids), BATCH_SIZE):
+                    modelo.objects.filter(id__in=ids[i:i + BATCH_SIZE]).delete()
+            resultado.append((mes, len(ids)))
+        inicio = fin
+
+    return resultado
+
+
+def _leer_archivo(modelo, directorio, nombre, dispositivo_id):
+    campo_fecha = CAMPOS_FECHA[modelo]
+    with gzip.open(os.path.join(_ruta_tabla(modelo, directorio), nombre), 'rt', encoding='utf-8') as archivo:
+        for linea in archivo:
+            registro = json.loads(linea)
+            if registro['dispositivo_id'] == dispositivo_id:
+                registro[campo_fecha] = parse_datetime(registro[campo_fecha])
+                yield registro
+
+
+def registros_dispositivo(modelo, dispositivo_id, limite=None, directorio=None, antes=None):
+    """
+    Registros de `modelo` de un dispositivo, del más reciente al más antiguo, combinando
+    la tabla y el archivo. Los archivos solo se abren si la tabla no alcanza el `limite`.
+    Con `antes=(fecha, id)` solo se devuelven los registros anteriores a esa clave.
+    """
+    directorio = directorio or directorio_archivo()
+    campo_fecha = CAMPOS_FECHA[modelo]
+    recientes = modelo.objects.filter(dispositivo_id=dispositivo_id)
+    if antes:
+        fecha, id_antes = antes
+        recientes = recientes.filter(Q(**{f"{campo_fecha}__lt": fecha}) | Q(**{campo_fecha: fecha, 'id__lt': id_antes}))
+    recientes = recientes.order_by(f"-{campo_fecha}", '-id').values(*campos(modelo))
+    registros = list(recientes[:limite] if limite else recientes)
+    if limite and len(registros) >= limite:
+        return registros
+
+    # Los meses del índice están en UTC; los posteriores a la clave no se abren
+    mes_antes = antes[0].astimezone(dt_timezone.utc).strftime('%Y-%m') if antes else None
+    # Todo lo archivado es anterior a lo que queda en la tabla
+    for entrada in sorted(leer_indice(modelo, directorio), key=lambda e: (e['mes'], e['primer_id']), reverse=True):
+        if dispositivo_id not in entrada['dispositivos'] or (mes_antes and entrada['mes'] > mes_antes):
+            continue
+        archivados = sorted(
+            (
+                r for r in _leer_archivo(modelo, directorio, entrada['archivo'], dispositivo_id)
+                if not antes or (r[campo_fecha], r['id']) < antes
+            ),
+            key=lambda r: (r[campo_fecha], r['id']), reverse=True
+        )
+        registros.extend(archivados)
+        if limite and len(registros) >= limite:
+            return registros[:limite]
+    return registros
+
+
+def corte_retencion(dias, ahora=None):
+    return (ahora or timezone.now()) - timedelta(days=dias)
@@ -0,0 +1,120 @@
+"""
+Cola de auditoría para Historial y Movimiento.
+
+Los registros de auditoría se acumulan durante la transacción y se escriben al confirmarla
+con un `bulk_create` por modelo, en lugar de un INSERT por cada cambio. Hay un lote por
+savepoint, cada uno con su callback `on_commit`: si un savepoint se revierte, Django descarta
+su callback y el lote se pierde con él, sin afectar a los demás.
+
+Con `AUDITORIA_ASINCRONA = True` los lotes confirmados se entregan a un hilo escritor con
+una cola acotada (`AUDITORIA_COLA_MAXIMA` lotes). Si la cola está llena durante más de
+`AUDITORIA_TIMEOUT_COLA` segundos, el lote se escribe en la misma petición (contrapresión)
+en lugar de descartarse.
+"""
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings # type: ignore
+from django.db import close_old_connections, transaction # type: ignore
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+_local = threading.local()
+
+
+def registrar(*objetos):
+    """
+    Agrega registros de auditoría (instancias sin guardar) a la transacción actual.
+    Fuera de un bloque atómico se escriben de inmediato.
+    """
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        entregar(list(objetos))
+        return
+
+    # Django reemplaza la lista de callbacks pendientes al confirmar o revertir (también un
+    # savepoint): los lotes abiertos antes pueden haberse descartado y se empieza de nuevo.
+    if getattr(_local, 'callbacks', None) is not conexion.run_on_commit:
+        _local.callbacks = conexion.run_on_commit
+        _local.lotes = {}
+
+    clave = tuple(conexion.savepoint_ids)
+    lote = _local.lotes.get(clave)
+    if lote is None:
+        lote = _local.lotes[clave] = []
+        transaction.on_commit(lambda: _confirmar(clave, lote))
+    lote.extend(objetos)
+
+
+def _confirmar(clave, lote):
+    if _local.lotes.get(clave) is lote:
+        del _local.lotes[clave]
+    entregar(lote)
+
+
+def entregar(lote):
+    """Escribe (o encola) un lote de registros confirmados."""
+    if not lote:
+        return
+    if getattr(settings, 'AUDITORIA_ASINCRONA', False):
+        escritor.encolar(lote)
+    else:
+        escribir(lote)
+
+
+def escribir(lote):
+    """Inserta el lote con un bulk_create por modelo, conservando el orden de registro."""
+    por_modelo = {}
+    for objeto in lote:
+        por_modelo.setdefault(type(objeto), []).append(objeto)
+    with transaction.atomic():
+        for modelo, objetos in por_modelo.items():
+            modelo.objects.bulk_create(objetos, batch_size=BATCH_SIZE)
+
+
+class EscritorAuditoria:
+    """Hilo escritor de lotes de auditoría con cola acotada."""
+
+    def __init__(self):
+        self.cola = None
+        self.hilo = None
+        self.lock = threading.Lock()
+
+    def iniciar(self):
+        with self.lock:
+            if self.hilo is None or not self.hilo.is_alive():
+                self.cola = queue.Queue(maxsize=getattr(settings, 'AUDITORIA_COLA_MAXIMA', 100))
+                self.hilo = threading.Thread(target=self.procesar, name='escritor-auditoria', daemon=True)
+                self.hilo.start()
+
+    def encolar(self, lote):
+        self.iniciar()
+        try:
+            self.cola.put(lote, timeout=getattr(settings, 'AUDITORIA_TIMEOUT_COLA', 2))
+        except queue.Full:
+            logger.error("Cola de auditoría llena, se escribe el lote de forma síncrona")
+            escribir(lote)
+
+    def procesar(self):
+        while True:
+            lote = self.cola.get()
+            try:
+                escribir(lote)
+            except Exception as e:
+                logger.error(f"Error al escribir {len(lote)} registros de auditoría: {str(e)}")
+            finally:
+                close_old_connections()
+                self.cola.task_done()
+
+    def esperar(self):
+        """Bloquea hasta que se hayan escrito todos los lotes encolados."""
+        if self.cola is not None and self.hilo is not None and self.hilo.is_alive():
+            self.cola.join()
+
+
+escritor = EscritorAuditoria()
+atexit.register(escritor.esperar)
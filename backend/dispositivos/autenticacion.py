@@ -0,0 +1,204 @@
+"""
+Autenticación JWT sin consultas a la base de datos.
+
+Los tokens emitidos por `login_user` incluyen en sus claims el rol, el estado y las sedes del
+usuario, y `JWTClaimsAuthentication` construye el usuario de la petición a partir de ellos
+(`UsuarioToken`) en lugar de leer `RolUser` y sus sedes en cada petición.
+
+Como un token sigue siendo válido hasta que expira, hay dos listas de revocación:
+
+- Usuarios: al desactivar un usuario o cambiar su rol o sus sedes, las señales guardan en
+  `RolUser.tokens_validos_desde` el instante desde el que sus tokens son válidos y se
+  rechazan los emitidos antes.
+- Tokens: el logout y el bloqueo de un token guardan su jti en `TokenRevocado`. Cada
+  proceso carga los jti vigentes en un set en memoria.
+
+Ambas listas viven en la base de datos, compartida por todos los procesos; cada proceso
+vuelve a leerlas como mucho cada `JWT_REVOCACION_REFRESCO` segundos, así que una revocación
+hecha en otro proceso se aplica en ese plazo (en el propio proceso, de inmediato).
+
+`validar_token` (usado por el endpoint que el frontend llama constantemente) guarda además
+los tokens ya verificados en un LRU en memoria: un token conocido se valida sin decodificar
+la firma ni consultar la base de datos.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings # type: ignore
+from django.utils import timezone # type: ignore
+from rest_framework.exceptions import AuthenticationFailed # type: ignore
+from rest_framework_simplejwt.authentication import JWTAuthentication # type: ignore
+from rest_framework_simplejwt.exceptions import TokenError # type: ignore
+from rest_framework_simplejwt.models import TokenUser # type: ignore
+from rest_framework_simplejwt.settings import api_settings # type: ignore
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken # type: ignore
+
+CLAIM_SEDES = 'sedes'
+# Instante de emisión en milisegundos: `iat` (en segundos) no distingue un token emitido
+# justo después de una revocación de uno emitido en el mismo segundo antes de ella
+CLAIM_EMISION = 'emision_ms'
+
+_lock = threading.Lock()
+_revocados = {}
+_jtis = set()
+_leido = None
+
+_verificados = OrderedDict()  # token -> claims, del menos al más reciente
+
+
+class TokenInvalido(Exception):
+    pass
+
+
+def token_para_usuario(user):
+    """RefreshToken con los claims del usuario; el access token derivado los hereda."""
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.username
+    refresh['rol'] = user.rol
+    refresh['is_active'] = user.is_active
+    refresh[CLAIM_SEDES] = list(user.sedes.values_list('id', flat=True))
+    refresh[CLAIM_EMISION] = _ahora_ms()
+    return refresh
+
+
+def _vida_token():
+    # Un refresh token anterior a la revocación emite access tokens con su misma emisión
+    return int(max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME).total_seconds())
+
+
+def _ahora_ms():
+    return int(time.time() * 1000)
+
+
+def _emision(token):
+    """Emisión del token en milisegundos; los tokens sin el claim usan el inicio de su `iat`."""
+    emision = token.get(CLAIM_EMISION)
+    return int(emision) if emision is not None else int(token.get('iat', 0)) * 1000
+
+
+def revocar_usuario(user_id):
+    """
+    Invalida los tokens ya emitidos del usuario en todos los procesos y devuelve el nuevo
+    `tokens_validos_desde`.
+    """
+    from .models import RolUser
+    # Los tokens emitidos en el mismo milisegundo también se revocan
+    desde = _ahora_ms() + 1
+    RolUser.objects.filter(id=user_id).update(tokens_validos_desde=desde)
+    with _lock:
+        _revocados[user_id] = desde
+    return desde
+
+
+def revocar_token(token):
+    """Agrega el jti de un token (AccessToken o RefreshToken ya validado) a la lista de revocados."""
+    from .models import RolUser, TokenRevocado
+    jti = token[api_settings.JTI_CLAIM]
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    TokenRevocado.objects.get_or_create(jti=jti, defaults={
+        'usuario_id': user_id if RolUser.objects.filter(id=user_id).exists() else None,
+        'expira': datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc),
+    })
+    # Los tokens expirados ya no pasan la validación: no hace falta conservarlos
+    TokenRevocado.objects.filter(expira__lte=timezone.now()).delete()
+    with _lock:
+        _jtis.add(jti)
+
+
+def _refrescar_revocados():
+    global _revocados, _jtis, _leido
+    refresco = getattr(settings, 'JWT_REVOCACION_REFRESCO', 5)
+    if _leido is not None and time.monotonic() - _leido <= refresco:
+        return
+    from .models import RolUser, TokenRevocado
+    with _lock:
+        # Basta con las revocaciones posteriores a la emisión del token más antiguo vigente
+        _revocados = dict(
+            RolUser.objects.filter(tokens_validos_desde__gt=_ahora_ms() - _vida_token() * 1000)
+            .values_list('id', 'tokens_validos_desde')
+        )
+        _jtis = set(TokenRevocado.objects.filter(expira__gt=timezone.now()).values_list('jti', flat=True))
+        _leido = time.monotonic()
+
+
+def _revocado(user_id, emision, jti):
+    _refrescar_revocados()
+    if jti in _jtis:
+        return True
+    validos_desde = _revocados.get(user_id)
+    return validos_desde is not None and emision < validos_desde
+
+
+def token_revocado(token):
+    return _revocado(token.get(api_settings.USER_ID_CLAIM), _emision(token), token.get(api_settings.JTI_CLAIM))
+
+
+def validar_token(token):
+    """
+    Valida un access token y devuelve sus claims principales (user_id, jti, iat, emision, exp).
+    Lanza TokenInvalido si la firma no es válida, expiró o fue revocado.
+    """
+    with _lock:
+        claims = _verificados.get(token)
+        if claims is not None:
+            _verificados.move_to_end(token)
+
+    if claims is None:
+        try:
+            access = AccessToken(token)
+        except TokenError:
+            raise TokenInvalido("Token inválido o expirado")
+        claims = {
+            'user_id': access.get(api_settings.USER_ID_CLAIM),
+            'jti': access.get(api_settings.JTI_CLAIM),
+            'iat': access.get('iat', 0),
+            'emision': _emision(access),
+            'exp': access['exp'],
+        }
+        with _lock:
+            _verificados[token] = claims
+            if len(_verificados) > getattr(settings, 'JWT_CACHE_VERIFICADOS', 10000):
+                _verificados.popitem(last=False)
+    elif claims['exp'] <= time.time():
+        with _lock:
+            _verificados.pop(token, None)
+        raise TokenInvalido("Token inválido o expirado")
+
+    if _revocado(claims['user_id'], claims['emision'], claims['jti']):
+        raise TokenInvalido("Token revocado")
+    return claims
+
+
+class UsuarioToken(TokenUser):
+    """Usuario de la petición construido solo con los claims del token."""
+
+    @property
+    def is_active(self):
+        return self.token.get('is_active', True)
+
+    @property
+    def rol(self):
+        return self.token.get('rol')
+
+    @property
+    def sede_ids(self):
+        return self.token.get(CLAIM_SEDES, [])
+
+
+class JWTClaimsAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que no consulta `RolUser`. Los tokens emitidos antes de incluir los
+    claims (sin 'rol') se siguen resolviendo contra la base de datos.
+    """
+
+    def get_user(self, validated_token):
+        if token_revocado(validated_token):
+            raise AuthenticationFailed("El token fue revocado.", code='token_revoked')
+        if 'rol' not in validated_token:
+            return super().get_user(validated_token)
+        usuario = UsuarioToken(validated_token)
+        if not usuario.is_active:
+            raise AuthenticationFailed("El usuario está inactivo.", code='user_inactive')
+        return usuario
@@ -0,0 +1,242 @@
+"""
+Benchmark de los endpoints de `inventario/urls.py`.
+
+Cada endpoint se ejecuta en proceso con el cliente de pruebas de Django (pasando por
+todo el stack de middlewares) y se registra la latencia p50/p95/p99, el número de
+consultas SQL y el pico de memoria. Cada petición se ejecuta dentro de una transacción
+que se revierte, para que el benchmark no altere los datos.
+
+Las rutas se piden con GET salvo las de `PETICIONES`, que llevan su método y un cuerpo
+válido. Las que no aceptan GET y no están en `PETICIONES` (p. ej. las que revocan tokens
+en memoria o reciben archivos) no se miden y aparecen en el reporte como no medidas.
+"""
+import math
+import re
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection, reset_queries, transaction # type: ignore
+from django.http import HttpResponse # type: ignore
+from django.test import Client # type: ignore
+from django.test.utils import CaptureQueriesContext # type: ignore
+from django.urls import URLPattern, URLResolver, get_resolver # type: ignore
+from django.utils.module_loading import import_string # type: ignore
+
+# Prefijos que no forman parte de la API REST
+RUTAS_EXCLUIDAS = ('admin/',)
+
+# Parámetros de query string y cuerpos de petición por ruta
+PARAMETROS = {
+    'api/dispositivos/': {'page_size': 50},
+    'api/dispositivos/search/': {'q': 'dell'},
+    'api/posiciones/plano/': {'sede': 1, 'piso': 'PISO1', 'tile_x': 0, 'tile_y': 0},
+}
+
+# Rutas que no se piden con GET: (método, cuerpo a partir del contexto y los ids de `valores`)
+PETICIONES = {
+    'api/login/': ('post', lambda contexto, valores: {'username': contexto['username'], 'password': contexto['password']}),
+    'api/validate-token/': ('post', lambda contexto, valores: {}),
+    'api/editusuarios/<int:user_id>/': ('put', lambda contexto, valores: {'nombre': 'Usuario benchmark'}),
+    'api/dispositivos/lote/': ('patch', lambda contexto, valores: {'cambios': [{'id': valores['dispositivo_id'], 'estado': 'REPARAR'}]}),
+}
+
+
+def percentil(valores, p):
+    """Percentil por el método del rango más cercano."""
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def recorrer_rutas(patrones=None, prefijo=''):
+    """Genera (ruta, patrón) para cada URL, expandiendo los include()."""
+    if patrones is None:
+        patrones = get_resolver().url_patterns
+    for patron in patrones:
+        ruta = prefijo + str(patron.pattern)
+        if isinstance(patron, URLResolver):
+            yield from recorrer_rutas(patron.url_patterns, ruta)
+        elif isinstance(patron, URLPattern):
+            yield ruta, patron
+
+
+def construir_ruta(ruta, valores):
+    """
+    Sustituye los parámetros de la ruta (`<int:sede_id>` o `(?P<pk>...)`) por ids reales.
+    Devuelve None si falta algún valor o la ruta es una variante de formato.
+    """
+    ruta = ruta.replace('^', '').replace('$', '')
+    nombres = re.findall(r'<(?:\w+:)?(\w+)>', ruta)
+    if 'format' in nombres or any(valores.get(nombre) is None for nombre in nombres):
+        return None
+    ruta = re.sub(r'\(\?P<(\w+)>[^)]*\)', lambda m: str(valores[m.group(1)]), ruta)
+    ruta = re.sub(r'<(?:\w+:)?(\w+)>', lambda m: str(valores[m.group(1)]), ruta)
+    if re.search(r'[\\()\[\]?*+]', ruta):
+        return None
+    return '/' + ruta
+
+
+def metodos_vista(callback):
+    """Métodos HTTP (en minúsculas) que acepta la vista, o None si no se pueden determinar."""
+    acciones = getattr(callback, 'actions', None)  # ViewSets registrados en un router
+    if acciones:
+        return set(acciones)
+    cls = getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+    if cls is None:
+        return None
+    return {metodo for metodo in cls.http_method_names if metodo not in ('head', 'options') and hasattr(cls, metodo)}
+
+
+def medir_peticion(cliente, metodo, url, datos, headers):
+    """Ejecuta una petición dentro de una transacción revertida y consume la respuesta."""
+    with transaction.atomic():
+        if metodo == 'get':
+            response = cliente.get(url, datos, headers=headers)
+        else:
+            response = getattr(cliente, metodo)(url, datos, content_type='application/json', headers=headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        transaction.set_rollback(True)
+    return response
+
+
+def medir_endpoint(cliente, metodo, url, datos, headers, iteraciones):
+    tiempos = []
+    # Calentamiento (cachés, compilación de plantillas, etc.)
+    response = medir_peticion(cliente, metodo, url, datos, headers)
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        response = medir_peticion(cliente, metodo, url, datos, headers)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    # Consultas y memoria en una pasada aparte para no distorsionar la latencia
+    # Con DEBUG=True las iteraciones llenan connection.queries_log (máximo 9000) y la
+    # captura no vería consultas nuevas
+    reset_queries()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as consultas:
+            medir_peticion(cliente, metodo, url, datos, headers)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'metodo': metodo.upper(),
+        'url': url,
+        'status': response.status_code,
+        'p50_ms': round(percentil(tiempos, 50), 3),
+        'p95_ms': round(percentil(tiempos, 95), 3),
+        'p99_ms': round(percentil(tiempos, 99), 3),
+        'media_ms': round(statistics.mean(tiempos), 3),
+        # SAVEPOINT/RELEASE de la transacción del benchmark no cuentan
+        'consultas': sum(1 for q in consultas if 'SAVEPOINT' not in q['sql']),
+        'memoria_pico_kb': round(pico / 1024, 1),
+        'medido': True,
+    }
+
+
+def ejecutar_benchmark(valores, contexto, iteraciones=50, filtro=None):
+    """
+    Ejecuta el benchmark sobre todas las rutas y devuelve la lista de resultados.
+    `valores` mapea los nombres de parámetros de ruta a ids existentes; `contexto`
+    contiene las credenciales y el token del usuario del benchmark.
+    """
+    cliente = Client()
+    headers = {'Authorization': f"Bearer {contexto['token']}"}
+    resultados = []
+    for ruta, patron in recorrer_rutas():
+        if ruta.startswith(RUTAS_EXCLUIDAS) or (filtro and filtro not in ruta):
+            continue
+        url = construir_ruta(ruta, valores)
+        if url is None:
+            continue
+        clave = ruta.replace('^', '').replace('$', '')
+        metodos = metodos_vista(patron.callback)
+        if clave in PETICIONES:
+            metodo, cuerpo = PETICIONES[clave]
+            datos = cuerpo(contexto, valores)
+        elif metodos is None or 'get' in metodos:
+            metodo, datos = 'get', PARAMETROS.get(clave, {})
+        else:
+            # Medir un 405 como si fuera la latencia del endpoint falsearía el reporte
+            resultados.append({
+                'metodo': '/'.join(sorted(metodos)).upper(), 'url': url, 'ruta': clave, 'medido': False,
+            })
+            continue
+        resultado = medir_endpoint(cliente, metodo, url, datos, headers, iteraciones)
+        resultado['ruta'] = clave
+        resultados.append(resultado)
+    return resultados
+
+
+def medir_operacion(operacion, iteraciones):
+    """
+    Mide una operación (sin argumentos) ejecutada `iteraciones` veces, cada una en una
+    transacción revertida. Devuelve operaciones por segundo, latencias y consultas por ejecución.
+    """
+    def ejecutar():
+        with transaction.atomic():
+            operacion()
+            transaction.set_rollback(True)
+
+    ejecutar()  # Calentamiento
+    tiempos = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        ejecutar()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    reset_queries()
+    with CaptureQueriesContext(connection) as consultas:
+        ejecutar()
+
+    return {
+        'por_segundo': round(1000 / statistics.mean(tiempos), 1),
+        'p50_ms': round(percentil(tiempos, 50), 3),
+        'p95_ms': round(percentil(tiempos, 95), 3),
+        'consultas': sum(1 for q in consultas if 'SAVEPOINT' not in q['sql']),
+    }
+
+
+def construir_cadena(middlewares, vista):
+    """Envuelve `vista` con los middlewares (rutas importables) en el orden de MIDDLEWARE."""
+    handler = vista
+    for ruta in reversed(middlewares):
+        handler = import_string(ruta)(handler)
+    return handler
+
+
+def _vista_vacia(request):
+    return HttpResponse('ok')
+
+
+def _medir_cadena(handler, crear_peticion, iteraciones):
+    handler(crear_peticion())  # Calentamiento
+    tiempos = []
+    for _ in range(iteraciones):
+        peticion = crear_peticion()
+        inicio = time.perf_counter()
+        handler(peticion)
+        tiempos.append((time.perf_counter() - inicio) * 1e6)
+    return statistics.median(tiempos)
+
+
+def medir_middlewares(middlewares, crear_peticion, iteraciones=2000):
+    """
+    Costo por petición (µs, mediana) de la cadena de middlewares sobre una vista vacía.
+    El costo de cada middleware es marginal: la cadena hasta él menos la cadena hasta el
+    anterior, porque varios dependen de los que van antes (sesión, usuario).
+    """
+    base = _medir_cadena(_vista_vacia, crear_peticion, iteraciones)
+    detalle = []
+    anterior = 0.0
+    for i, ruta in enumerate(middlewares, start=1):
+        costo = max(_medir_cadena(construir_cadena(middlewares[:i], _vista_vacia), crear_peticion, iteraciones) - base, 0.0)
+        detalle.append({'middleware': ruta, 'us': round(max(costo - anterior, 0.0), 2)})
+        anterior = costo
+
+    reset_queries()
+    with CaptureQueriesContext(connection) as consultas:
+        construir_cadena(middlewares, _vista_vacia)(crear_peticion())
+    return {'total_us': round(anterior, 2), 'consultas': len(consultas), 'middlewares': detalle}
@@ -0,0 +1,67 @@
+"""
+Búsqueda de dispositivos por texto.
+
+En PostgreSQL se usa búsqueda de texto completo con la configuración 'simple' (sin
+stemming, adecuada para seriales y placas) sobre el índice GIN `dispositivo_busqueda_gin`.
+Cada término se busca como prefijo, así que una búsqueda parcial de serial usa el índice.
+"""
+import re
+
+from django.contrib.postgres.indexes import GinIndex # type: ignore
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector # type: ignore
+from django.db import connection, models # type: ignore
+from django.db.models import Q # type: ignore
+
+# Deben coincidir con la expresión del índice para que PostgreSQL lo use
+CAMPOS_BUSQUEDA = ('serial', 'placa_cu', 'modelo', 'marca', 'proveedor', 'razon_social')
+CONFIG_BUSQUEDA = 'simple'
+
+
+def vector_busqueda():
+    return SearchVector(*CAMPOS_BUSQUEDA, config=CONFIG_BUSQUEDA)
+
+
+class IndiceBusqueda(GinIndex):
+    """
+    Índice GIN de texto completo. En motores distintos de PostgreSQL (por ejemplo SQLite
+    para desarrollo o benchmarks locales) se crea en su lugar un índice simple sobre el
+    serial con el mismo nombre, para que el esquema pueda crearse igualmente.
+    """
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return models.Index(fields=['serial'], name=self.name).create_sql(model, schema_editor, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+
+def terminos_busqueda(texto):
+    """Separa el texto en términos alfanuméricos (evita errores de sintaxis en tsquery)."""
+    return re.findall(r'\w+', texto.lower())
+
+
+def buscar_dispositivos(queryset, texto):
+    """
+    Filtra el queryset por los términos de `texto` y lo ordena por relevancia.
+    """
+    terminos = terminos_busqueda(texto)
+    if not terminos:
+        return queryset.none()
+
+    if connection.vendor != 'postgresql':
+        # Alternativa sin índice para otros motores (por ejemplo SQLite en desarrollo)
+        for termino in terminos:
+            condicion = Q()
+            for campo in CAMPOS_BUSQUEDA:
+                condicion |= Q(**{f"{campo}__icontains": termino})
+            queryset = queryset.filter(condicion)
+        return queryset.order_by('id')
+
+    consulta = SearchQuery(' & '.join(f"{termino}:*" for termino in terminos), search_type='raw', config=CONFIG_BUSQUEDA)
+    vector = vector_busqueda()
+    return (
+        queryset
+        .annotate(busqueda=vector)
+        .filter(busqueda=consulta)
+        .annotate(relevancia=SearchRank(vector, consulta))
+        .order_by('-relevancia', 'id')
+    )
@@ -0,0 +1,112 @@
+"""
+Catálogos de referencia (sedes, servicios y opciones de los dispositivos) cacheados.
+
+Son tablas pequeñas que el frontend pide en cada pantalla y que casi nunca cambian. Cada
+catálogo se calcula una vez por versión y se guarda en la caché de Django junto con su
+ETag (hash del contenido) y la fecha de la última modificación, de modo que las vistas
+pueden responder 304 sin tocar la base de datos. La versión se incrementa desde las
+señales de Sede y Servicios.
+
+Si la caché es local del proceso (LocMemCache), el incremento no llega a los demás
+workers: ahí la versión y las entradas duran solo `CACHE_TTL_LOCAL` segundos, que es lo
+máximo que otro proceso puede servir datos o ETags viejos.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings # type: ignore
+from django.core.cache import cache, caches # type: ignore
+from django.db import transaction # type: ignore
+from django.utils.cache import get_conditional_response, patch_cache_control # type: ignore
+from django.utils.http import http_date, quote_etag # type: ignore
+from rest_framework.response import Response # type: ignore
+from rest_framework.utils.encoders import JSONEncoder # type: ignore
+
+from .sesiones import cache_compartida
+
+CACHE_TIMEOUT = 60 * 60 * 24  # Las versiones anteriores dejan de usarse y expiran solas
+CACHE_VERSION_KEY = 'catalogos:version'
+CACHE_MODIFICADO_KEY = 'catalogos:modificado'
+
+
+def timeout_cache(timeout):
+    """`timeout` si la caché la comparten todos los procesos; si es local, `CACHE_TTL_LOCAL`."""
+    if cache_compartida(caches['default']):
+        return timeout
+    return getattr(settings, 'CACHE_TTL_LOCAL', 30)
+
+
+def _sedes():
+    from .models import Sede
+    return list(Sede.objects.order_by('id').values('id', 'nombre', 'ciudad', 'direccion'))
+
+
+def _servicios():
+    from .models import Servicios
+    from .serializers import ServiciosSerializer
+    servicios = ServiciosSerializer.setup_eager_loading(Servicios.objects.order_by('id'))
+    return ServiciosSerializer(servicios, many=True).data
+
+
+def _opciones():
+    """{campo: [{valor, etiqueta}]} de los campos de Dispositivo con opciones."""
+    from .models import Dispositivo
+    return {
+        field.name: [{'valor': valor, 'etiqueta': str(etiqueta)} for valor, etiqueta in field.flatchoices]
+        for field in Dispositivo._meta.concrete_fields if field.choices
+    }
+
+
+CATALOGOS = {
+    'sedes': _sedes,
+    'servicios': _servicios,
+    'opciones': _opciones,
+}
+
+
+def obtener_catalogo(nombre):
+    """Devuelve {'datos', 'etag', 'modificado'} del catálogo, calculándolo si no está en caché."""
+    # La versión inicial es un instante: al expirar no se repite una versión ya cacheada
+    version = cache.get_or_set(CACHE_VERSION_KEY, time.time_ns, timeout_cache(None))
+    clave = f"catalogos:v{version}:{nombre}"
+    entrada = cache.get(clave)
+    if entrada is None:
+        contenido = json.dumps(CATALOGOS[nombre](), cls=JSONEncoder, ensure_ascii=False)
+        entrada = {
+            'datos': json.loads(contenido),
+            'etag': quote_etag(hashlib.md5(contenido.encode()).hexdigest()),
+            'modificado': int(cache.get_or_set(CACHE_MODIFICADO_KEY, time.time, timeout_cache(None))),
+        }
+        cache.set(clave, entrada, timeout_cache(CACHE_TIMEOUT))
+    return entrada
+
+
+def respuesta_catalogo(request, nombre, envolver=None):
+    """
+    Respuesta del catálogo con ETag y Last-Modified; 304 si el cliente ya tiene la versión
+    actual. `envolver` permite anidar los datos bajo una clave (p. ej. {"sedes": [...]}).
+    """
+    entrada = obtener_catalogo(nombre)
+    respuesta = get_conditional_response(request, etag=entrada['etag'], last_modified=entrada['modificado'])
+    if respuesta is None:
+        datos = entrada['datos']
+        respuesta = Response({envolver: datos} if envolver else datos)
+    respuesta['ETag'] = entrada['etag']
+    respuesta['Last-Modified'] = http_date(entrada['modificado'])
+    # El cliente puede guardar la respuesta pero debe revalidarla en cada uso
+    patch_cache_control(respuesta, no_cache=True)
+    return respuesta
+
+
+def invalidar_catalogos():
+    def invalidar():
+        cache.set(CACHE_MODIFICADO_KEY, time.time(), timeout_cache(None))
+        try:
+            cache.incr(CACHE_VERSION_KEY)
+        except ValueError:
+            cache.set(CACHE_VERSION_KEY, time.time_ns(), timeout_cache(None))
+
+    invalidar()
+    # Repetir al confirmar: una lectura concurrente pudo cachear los datos previos a la transacción
+    transaction.on_commit(invalidar)
@@ -0,0 +1,62 @@
+"""
+Colores de las posiciones derivados de `Servicios.color`.
+
+Los colores de todos los servicios se cargan con una sola consulta y se guardan en memoria
+del proceso. La caché se invalida cuando cambia un servicio; la versión se comparte por la
+caché de Django para que los demás procesos también descarten su copia. Si esa caché es
+local (LocMemCache), la versión expira a los `CACHE_TTL_LOCAL` segundos y cada proceso
+recarga los colores con ese intervalo como máximo.
+"""
+import threading
+import time
+
+from django.core.cache import cache # type: ignore
+from django.db import transaction # type: ignore
+
+from .catalogos import timeout_cache
+
+COLOR_DEFECTO = '#B0BEC5'
+CACHE_VERSION_KEY = 'servicios:colores:version'
+
+_lock = threading.Lock()
+_colores = {}
+_version = None
+
+
+def _version_actual():
+    # La versión inicial es un instante: al expirar no coincide con la que tiene el proceso
+    return cache.get_or_set(CACHE_VERSION_KEY, time.time_ns, timeout_cache(None))
+
+
+def colores_servicios():
+    """Devuelve {servicio_id: color}, recargándolo solo si la versión cambió."""
+    global _colores, _version
+    version = _version_actual()
+    if _version == version:
+        return _colores
+
+    from .models import Servicios
+    with _lock:
+        if _version != version:
+            _colores = dict(Servicios.objects.values_list('id', 'color'))
+            _version = version
+    return _colores
+
+
+def color_servicio(servicio_id):
+    if servicio_id is None:
+        return COLOR_DEFECTO
+    return colores_servicios().get(servicio_id) or COLOR_DEFECTO
+
+
+def invalidar_colores():
+    def invalidar():
+        global _version
+        _version = None
+        try:
+            cache.incr(CACHE_VERSION_KEY)
+        except ValueError:
+            cache.set(CACHE_VERSION_KEY, time.time_ns(), timeout_cache(None))
+
+    invalidar()
+    transaction.on_commit(invalidar)
@@ -0,0 +1,145 @@
+"""
+Codificación compacta de los cambios de un dispositivo guardados en `Historial.cambios`.
+
+Formato: {"v": 1, "c": [[campo, antes, despues], ...]}
+
+- `campo` es un id numérico estable (ver CAMPOS_DIFF); un campo sin id se guarda por nombre.
+- Los valores son escalares JSON preparados por el propio campo; las relaciones se guardan
+  solo como ids.
+
+El decodificador restaura el tipo con el campo del modelo y devuelve un diff legible,
+con las etiquetas de las opciones y el nombre de los objetos relacionados. También acepta
+el formato anterior ({"campo": {"antes": ..., "despues": ...}}).
+"""
+from functools import cache
+
+from django.apps import apps # type: ignore
+from django.core.exceptions import FieldDoesNotExist, ValidationError # type: ignore
+
+VERSION_DIFF = 1
+
+# Ids estables: no reutilizar ni renumerar, solo añadir nuevos al final
+CAMPOS_DIFF = {
+    1: 'tipo', 2: 'estado', 3: 'marca', 4: 'razon_social', 5: 'regimen', 6: 'modelo',
+    7: 'serial', 8: 'placa_cu', 9: 'servicio', 10: 'piso', 11: 'estado_propiedad',
+    12: 'posicion', 13: 'sede', 14: 'tipo_disco_duro', 15: 'capacidad_disco_duro',
+    16: 'tipo_memoria_ram', 17: 'capacidad_memoria_ram', 18: 'ubicacion', 19: 'proveedor',
+    20: 'sistema_operativo', 21: 'procesador', 22: 'usuario_asignado', 23: 'disponible',
+}
+_ESCALARES = (str, int, float, bool, type(None))
+
+
+def _opts():
+    # Sin importar models: models.py usa este módulo al registrar el historial
+    return apps.get_model('dispositivos', 'Dispositivo')._meta
+
+
+@cache
+def _ids_por_attname():
+    return {_opts().get_field(nombre).attname: id_campo for id_campo, nombre in CAMPOS_DIFF.items()}
+
+
+def _campo(clave):
+    nombre = CAMPOS_DIFF.get(clave, clave) if isinstance(clave, int) else clave
+    return _opts().get_field(nombre)
+
+
+def _nombres(modelo, ids):
+    """{id: texto} de los objetos relacionados, sin consultas adicionales por objeto."""
+    if any(field.name == 'nombre' for field in modelo._meta.concrete_fields):
+        return dict(modelo.objects.filter(id__in=ids).values_list('id', 'nombre'))
+    return {pk: str(objeto) for pk, objeto in modelo.objects.in_bulk(ids).items()}
+
+
+def _preparar(field, valor):
+    valor = field.get_prep_value(valor)
+    return valor if isinstance(valor, _ESCALARES) else str(valor)
+
+
+def codificar_cambios(cambios):
+    """
+    Codifica {attname: (antes, despues)} (ver `RastreoCamposMixin`). Devuelve None si no hay cambios.
+    """
+    opts = _opts()
+    ids = _ids_por_attname()
+    filas = []
+    for attname, (antes, despues) in cambios.items():
+        field = opts.get_field(attname)
+        filas.append([ids.get(field.attname, field.name), _preparar(field, antes), _preparar(field, despues)])
+    if not filas:
+        return None
+    return {"v": VERSION_DIFF, "c": filas}
+
+
+def _es_diff(cambios):
+    if not isinstance(cambios, dict):
+        return False
+    if 'c' in cambios and 'v' in cambios:
+        return True
+    return all(isinstance(valores, dict) and 'antes' in valores for valores in cambios.values())
+
+
+def _filas(cambios):
+    """(field, antes, despues) de un diff en formato compacto o anterior. Omite campos que ya no existen."""
+    if 'c' in cambios and 'v' in cambios:
+        filas = cambios['c']
+    else:
+        filas = [(nombre, valores.get('antes'), valores.get('despues')) for nombre, valores in cambios.items()]
+    for clave, antes, despues in filas:
+        try:
+            yield _campo(clave), antes, despues
+        except FieldDoesNotExist:
+            continue
+
+
+def decodificar_cambios(lista_cambios):
+    """
+    Decodifica varios diffs a la vez. Los objetos relacionados se resuelven con una consulta
+    por modelo para todo el lote. Lo que no es un diff (p. ej. el texto de los movimientos)
+    se devuelve tal cual.
+    """
+    decodificados = []
+    pendientes = {}
+    for cambios in lista_cambios:
+        if not _es_diff(cambios):
+            decodificados.append(cambios)
+            continue
+        filas = []
+        for field, antes, despues in _filas(cambios):
+            try:
+                antes, despues = field.to_python(antes), field.to_python(despues)
+            except ValidationError:
+                # Registros antiguos con el repr del objeto en lugar del id: se muestran tal cual
+                filas.append((None, field, antes, despues))
+                continue
+            if field.is_relation:
+                pendientes.setdefault(field.related_model, set()).update(v for v in (antes, despues) if v is not None)
+            filas.append((field, field, antes, despues))
+        decodificados.append(filas)
+
+    relacionados = {modelo: _nombres(modelo, ids) for modelo, ids in pendientes.items()}
+
+    def legible(field, valor):
+        if valor is None or field is None:
+            return valor
+        if field.is_relation:
+            nombre = relacionados[field.related_model].get(valor)
+            return nombre if nombre is not None else f"#{valor} (eliminado)"
+        if field.choices:
+            return str(dict(field.flatchoices).get(valor, valor))
+        if isinstance(valor, bool):
+            return "Sí" if valor else "No"
+        return valor
+
+    return [
+        filas if not isinstance(filas, list) else [
+            {
+                "campo": campo.name,
+                "etiqueta": str(campo.verbose_name),
+                "antes": legible(field, antes),
+                "despues": legible(field, despues),
+            }
+            for field, campo, antes, despues in filas
+        ]
+        for filas in decodificados
+    ]
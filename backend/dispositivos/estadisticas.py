@@ -0,0 +1,101 @@
+"""
+Estadísticas del dashboard calculadas con agregación condicional y cacheadas por sede.
+"""
+from django.core.cache import cache # type: ignore
+from django.db import transaction # type: ignore
+from django.db.models import Count, Q # type: ignore
+
+from .models import Dispositivo, Sede
+
+CACHE_TIMEOUT = 60
+CACHE_VERSION_KEY = 'dashboard:version'
+
+# (clave en la respuesta, campo, opciones)
+DIMENSIONES = [
+    ('por_tipo', 'tipo', Dispositivo.TIPOS_DISPOSITIVOS),
+    ('por_estado', 'estado', Dispositivo.ESTADO_DISPOSITIVO),
+    ('por_marca', 'marca', Dispositivo.FABRICANTES),
+    ('por_sistema_operativo', 'sistema_operativo', Dispositivo.SISTEMAS_OPERATIVOS),
+    ('por_estado_propiedad', 'estado_propiedad', Dispositivo.ESTADOS_PROPIEDAD),
+]
+
+
+def _clave_cache(sede_id):
+    version = cache.get_or_set(CACHE_VERSION_KEY, 1, None)
+    return f"dashboard:v{version}:{sede_id or 'todas'}"
+
+
+def calcular_estadisticas(sede_id=None):
+    """
+    Calcula todos los conteos con una única consulta de agregación sobre Dispositivo.
+    """
+    dispositivos = Dispositivo.objects.all()
+    sedes = []
+    if sede_id:
+        dispositivos = dispositivos.filter(sede_id=sede_id)
+    else:
+        sedes = list(Sede.objects.values_list('id', 'nombre'))
+
+    agregados = {
+        'total': Count('id'),
+        'asignados': Count('id', filter=Q(usuario_asignado__isnull=False)),
+    }
+    for clave, campo, opciones in DIMENSIONES:
+        for codigo, _ in opciones:
+            agregados[f"{clave}__{codigo}"] = Count('id', filter=Q(**{campo: codigo}))
+        agregados[f"{clave}__SIN_DATO"] = Count('id', filter=Q(**{f"{campo}__isnull": True}))
+    for id_sede, _ in sedes:
+        agregados[f"por_sede__{id_sede}"] = Count('id', filter=Q(sede_id=id_sede))
+    agregados['por_sede__SIN_DATO'] = Count('id', filter=Q(sede__isnull=True))
+
+    resultado = dispositivos.aggregate(**agregados)
+
+    estadisticas = {
+        'total': resultado['total'],
+        'asignados': resultado['asignados'],
+        'sin_asignar': resultado['total'] - resultado['asignados'],
+    }
+    for clave, _, opciones in DIMENSIONES:
+        estadisticas[clave] = {
+            codigo: resultado[f"{clave}__{codigo}"] for codigo, _ in opciones
+        }
+        estadisticas[clave]['SIN_DATO'] = resultado[f"{clave}__SIN_DATO"]
+    if not sede_id:
+        estadisticas['por_sede'] = [
+            {'id': id_sede, 'nombre': nombre, 'total': resultado[f"por_sede__{id_sede}"]}
+            for id_sede, nombre in sedes
+        ]
+        estadisticas['por_sede'].append({'id': None, 'nombre': 'Sin sede', 'total': resultado['por_sede__SIN_DATO']})
+    return estadisticas
+
+
+def obtener_estadisticas(sede_id=None):
+    """
+    Devuelve las estadísticas desde la caché, calculándolas si no existen.
+    """
+    clave = _clave_cache(sede_id)
+    estadisticas = cache.get(clave)
+    if estadisticas is None:
+        estadisticas = calcular_estadisticas(sede_id)
+        cache.set(clave, estadisticas, CACHE_TIMEOUT)
+    return estadisticas
+
+
+def invalidar_estadisticas(sede_ids=None):
+    """
+    Invalida las estadísticas de las sedes indicadas y las globales.
+    Sin `sede_ids` se invalidan todas incrementando la versión de las claves.
+    """
+    def invalidar():
+        if sede_ids is None:
+            try:
+                cache.incr(CACHE_VERSION_KEY)
+            except ValueError:
+                cache.set(CACHE_VERSION_KEY, 1, None)
+            return
+        cache.delete_many([_clave_cache(None)] + [_clave_cache(sede_id) for sede_id in sede_ids if sede_id])
+
+    # Se invalida ya y de nuevo al confirmar la transacción, para que una lectura
+    # concurrente no deje en caché datos anteriores al commit.
+    invalidar()
+    transaction.on_commit(invalidar)
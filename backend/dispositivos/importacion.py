@@ -0,0 +1,243 @@
+"""
+Importación masiva de dispositivos desde archivos Excel (.xlsx) o CSV.
+
+Las filas se leen en streaming (openpyxl en modo read-only o el módulo csv), se validan
+en memoria contra las listas de opciones de `Dispositivo` y se insertan con
+`bulk_create` por lotes.
+"""
+import codecs
+import csv
+import time
+from collections import Counter
+
+from django.db import DatabaseError, transaction # type: ignore
+from openpyxl import load_workbook # type: ignore
+
+from .estadisticas import invalidar_estadisticas
+from .models import Dispositivo, Posicion, Sede
+from .resumen import ajustar_resumen, clave_resumen
+
+CAMPOS_OBLIGATORIOS = ('tipo', 'marca', 'modelo', 'serial')
+
+CAMPOS_TEXTO = ('modelo', 'serial', 'placa_cu', 'razon_social', 'proveedor')
+
+CAMPOS_OPCIONES = {
+    'tipo': Dispositivo.TIPOS_DISPOSITIVOS,
+    'marca': Dispositivo.FABRICANTES,
+    'estado': Dispositivo.ESTADO_DISPOSITIVO,
+    'regimen': Dispositivo.REGIMENES,
+    'tipo_disco_duro': Dispositivo.TIPOS_DISCO_DURO,
+    'capacidad_disco_duro': Dispositivo.CAPACIDADES_DISCO_DURO,
+    'tipo_memoria_ram': Dispositivo.TIPOS_MEMORIA_RAM,
+    'capacidad_memoria_ram': Dispositivo.CAPACIDADES_MEMORIA_RAM,
+    'ubicacion': Dispositivo.UBICACIONES,
+    'sistema_operativo': Dispositivo.SISTEMAS_OPERATIVOS,
+    'procesador': Dispositivo.PROCESADORES,
+    'estado_propiedad': Dispositivo.ESTADOS_PROPIEDAD,
+}
+
+LONGITUDES = {campo: Dispositivo._meta.get_field(campo).max_length for campo in CAMPOS_TEXTO}
+
+BATCH_SIZE = 1000
+
+
+def _mapa_opciones(opciones):
+    """Acepta tanto el código como la etiqueta de cada opción, sin distinguir mayúsculas."""
+    mapa = {}
+    for codigo, etiqueta in opciones:
+        mapa[str(codigo).lower()] = codigo
+        mapa[str(etiqueta).lower()] = codigo
+    return mapa
+
+
+OPCIONES = {campo: _mapa_opciones(opciones) for campo, opciones in CAMPOS_OPCIONES.items()}
+
+
+def leer_filas(archivo, nombre):
+    """
+    Genera un diccionario por fila usando la primera fila como encabezados.
+    `archivo` puede ser una ruta o un objeto tipo archivo abierto en modo binario.
+    """
+    if nombre.lower().endswith('.csv'):
+        stream = open(archivo, 'rb') if isinstance(archivo, str) else archivo
+        try:
+            lector = csv.reader(codecs.iterdecode(stream, 'utf-8-sig'))
+            encabezados = [h.strip().lower() for h in next(lector, [])]
+            for valores in lector:
+                if any(valores):
+                    yield dict(zip(encabezados, valores))
+        finally:
+            if isinstance(archivo, str):
+                stream.close()
+        return
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = [str(h or '').strip().lower() for h in next(filas, ())]
+        for valores in filas:
+            if not any(v not in (None, '') for v in valores):
+                continue
+            yield dict(zip(encabezados, valores))
+    finally:
+        libro.close()
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def construir_referencias():
+    """
+    Construye en una sola pasada los diccionarios de búsqueda de sedes y posiciones.
+    Las sedes se resuelven por id o por nombre; las posiciones por (sede, nombre).
+    """
+    sedes = {}
+    for sede_id, nombre in Sede.objects.values_list('id', 'nombre'):
+        sedes[str(sede_id)] = sede_id
+        sedes[nombre.strip().lower()] = sede_id
+
+    posiciones = {}
+    for posicion_id, sede_id, nombre, piso in Posicion.objects.values_list('id', 'sede_id', 'nombre', 'piso'):
+        posiciones[(sede_id, str(posicion_id))] = (posicion_id, piso)
+        posiciones[(sede_id, nombre.strip().lower())] = (posicion_id, piso)
+    return sedes, posiciones
+
+
+def validar_fila(fila, sedes, posiciones):
+    """
+    Valida una fila en memoria. Devuelve (datos, errores).
+    """
+    datos = {}
+    errores = {}
+
+    for campo in CAMPOS_TEXTO:
+        valor = _texto(fila.get(campo))
+        if len(valor) > LONGITUDES[campo]:
+            errores[campo] = f"Máximo {LONGITUDES[campo]} caracteres."
+        datos[campo] = valor or None
+
+    for campo, mapa in OPCIONES.items():
+        valor = _texto(fila.get(campo))
+        if not valor:
+            datos[campo] = None
+            continue
+        codigo = mapa.get(valor.lower())
+        if codigo is None:
+            errores[campo] = f"Valor inválido: {valor}"
+        datos[campo] = codigo
+
+    for campo in CAMPOS_OBLIGATORIOS:
+        if not datos.get(campo) and campo not in errores:
+            errores[campo] = "Este campo es obligatorio."
+
+    sede = _texto(fila.get('sede'))
+    datos['sede_id'] = None
+    if sede:
+        datos['sede_id'] = sedes.get(sede.lower())
+        if datos['sede_id'] is None:
+            errores['sede'] = f"Sede no encontrada: {sede}"
+
+    posicion = _texto(fila.get('posicion'))
+    datos['posicion_id'] = None
+    if posicion:
+        encontrada = posiciones.get((datos['sede_id'], posicion.lower()))
+        if encontrada is None:
+            errores['posicion'] = f"Posición no encontrada en la sede: {posicion}"
+        else:
+            datos['posicion_id'], datos['piso'] = encontrada
+
+    return datos, errores
+
+
+def _guardar_lote(lote, reporte, batch_size):
+    """
+    Descarta los seriales/placas ya existentes en la base de datos e inserta el resto.
+    """
+    seriales = [datos['serial'] for _, datos in lote]
+    placas = [datos['placa_cu'] for _, datos in lote if datos['placa_cu']]
+    existentes = set(Dispositivo.objects.filter(serial__in=seriales).values_list('serial', flat=True))
+    placas_existentes = set(Dispositivo.objects.filter(placa_cu__in=placas).values_list('placa_cu', flat=True)) if placas else set()
+
+    nuevos = []
+    for numero, datos in lote:
+        if datos['serial'] in existentes:
+            reporte['errores'].append({"fila": numero, "errores": {"serial": "Ya existe un dispositivo con este número de serial."}})
+        elif datos['placa_cu'] in placas_existentes:
+            reporte['errores'].append({"fila": numero, "errores": {"placa_cu": "Ya existe un dispositivo con esta placa."}})
+        else:
+            nuevos.append((numero, Dispositivo(**datos)))
+
+    try:
+        _insertar([d for _, d in nuevos], batch_size)
+        reporte['creados'] += len(nuevos)
+        return
+    except DatabaseError:
+        pass
+
+    # El lote falló completo: se reintenta fila por fila para reportar solo las que fallan
+    for numero, dispositivo in nuevos:
+        try:
+            _insertar([dispositivo], batch_size)
+            reporte['creados'] += 1
+        except DatabaseError as e:
+            reporte['errores'].append({"fila": numero, "errores": {"fila": f"No se pudo insertar la fila: {e}"}})
+
+
+def _insertar(dispositivos, batch_size):
+    with transaction.atomic():
+        Dispositivo.objects.bulk_create(dispositivos, batch_size=batch_size)
+        # bulk_create no dispara señales: se actualiza el resumen del lote de una vez
+        ajustar_resumen(Counter(clave_resumen(d.sede_id, d.tipo, d.estado) for d in dispositivos))
+
+
+def importar_dispositivos(filas, batch_size=BATCH_SIZE):
+    """
+    Importa las filas recibidas y devuelve un reporte con los errores por fila
+    y el rendimiento (filas por segundo).
+    """
+    inicio = time.perf_counter()
+    sedes, posiciones = construir_referencias()
+    reporte = {"filas": 0, "creados": 0, "errores": []}
+    vistos_serial = set()
+    vistos_placa = set()
+    lote = []
+
+    # La fila 1 son los encabezados
+    for numero, fila in enumerate(filas, start=2):
+        reporte['filas'] += 1
+        datos, errores = validar_fila(fila, sedes, posiciones)
+
+        if datos['serial'] in vistos_serial:
+            errores['serial'] = "Serial duplicado en el archivo."
+        if datos['placa_cu'] and datos['placa_cu'] in vistos_placa:
+            errores['placa_cu'] = "Placa duplicada en el archivo."
+
+        if errores:
+            reporte['errores'].append({"fila": numero, "errores": errores})
+            continue
+
+        vistos_serial.add(datos['serial'])
+        if datos['placa_cu']:
+            vistos_placa.add(datos['placa_cu'])
+        lote.append((numero, datos))
+
+        if len(lote) >= batch_size:
+            _guardar_lote(lote, reporte, batch_size)
+            lote = []
+
+    if lote:
+        _guardar_lote(lote, reporte, batch_size)
+
+    # bulk_create no dispara señales
+    if reporte['creados']:
+        invalidar_estadisticas()
+
+    segundos = time.perf_counter() - inicio
+    reporte['segundos'] = round(segundos, 3)
+    reporte['filas_por_segundo'] = round(reporte['filas'] / segundos, 1) if segundos else None
+    return reporte
@@ -0,0 +1,207 @@
+"""
+Actualización masiva de dispositivos.
+
+Todo el lote se valida en memoria (opciones, longitudes y nulos con los campos del modelo;
+las relaciones con una consulta por modelo relacionado) y se aplica en una sola transacción
+con `bulk_update` o, para los dispositivos que reciben los mismos valores, con un UPDATE por
+grupo. Como estas escrituras no disparan señales, aquí se hace lo que harían los receptores
+de `Dispositivo`: historial y movimientos (en bloque, ver `auditoria`), resumen de
+inventario y estadísticas.
+"""
+import time
+from collections import Counter
+
+from django.core.exceptions import ValidationError # type: ignore
+from django.db import transaction # type: ignore
+
+from . import auditoria
+from .diffs import codificar_cambios
+from .estadisticas import invalidar_estadisticas
+from .models import Dispositivo, Historial, Movimiento, Posicion, RolUser
+from .resumen import ajustar_resumen, clave_resumen
+
+# serial y placa_cu son únicos: se editan de forma individual
+CAMPOS_LOTE = (
+    'tipo', 'estado', 'marca', 'razon_social', 'regimen', 'modelo', 'posicion', 'sede', 'servicio',
+    'usuario_asignado', 'piso', 'tipo_disco_duro', 'capacidad_disco_duro', 'tipo_memoria_ram',
+    'capacidad_memoria_ram', 'ubicacion', 'sistema_operativo', 'procesador', 'proveedor',
+    'estado_propiedad', 'disponible',
+)
+MAX_LOTE = 10000
+BATCH_SIZE = 1000
+
+
+class ErrorLote(Exception):
+    def __init__(self, errores):
+        super().__init__(errores)
+        self.errores = errores
+
+
+def _validar_valor(field, valor):
+    if field.is_relation:
+        if valor in (None, ''):
+            if not field.null:
+                raise ValidationError("Este campo no puede ser nulo.")
+            return None
+        return field.target_field.to_python(valor)
+    return field.clean(valor, None)
+
+
+def preparar_cambios(cambios_por_id):
+    """
+    Valida {id: {campo: valor}} y devuelve {id: {attname: valor}}.
+    Lanza ErrorLote con los errores por id si algún valor no es válido.
+    """
+    errores = {}
+    preparados = {}
+    validados = {}  # (campo, valor) ya validados; en un lote suelen repetirse
+    relaciones = {}  # modelo relacionado -> ids referenciados
+
+    for pk, campos in cambios_por_id.items():
+        if not isinstance(campos, dict) or not campos:
+            errores[pk] = {"campos": "Debe indicar al menos un campo a modificar."}
+            continue
+        fila = {}
+        for nombre, valor in campos.items():
+            if nombre not in CAMPOS_LOTE:
+                errores.setdefault(pk, {})[nombre] = "Campo no editable en lote."
+                continue
+            field = Dispositivo._meta.get_field(nombre)
+            clave = (nombre, valor if not isinstance(valor, (list, dict)) else repr(valor))
+            try:
+                if clave not in validados:
+                    validados[clave] = _validar_valor(field, valor)
+                fila[field.attname] = validados[clave]
+            except ValidationError as e:
+                errores.setdefault(pk, {})[nombre] = " ".join(e.messages)
+                continue
+            if field.is_relation and fila[field.attname] is not None:
+                relaciones.setdefault(field.related_model, set()).add(fila[field.attname])
+        preparados[pk] = fila
+
+    # Existencia de las relaciones: una consulta por modelo relacionado
+    inexistentes = {
+        modelo: ids - set(modelo.objects.filter(id__in=ids).values_list('id', flat=True))
+        for modelo, ids in relaciones.items()
+    }
+    for pk, fila in preparados.items():
+        for attname, valor in fila.items():
+            field = Dispositivo._meta.get_field(attname)
+            if field.is_relation and valor in inexistentes.get(field.related_model, ()):
+                errores.setdefault(pk, {})[field.name] = f"No existe {field.related_model._meta.verbose_name} con id {valor}."
+
+    if errores:
+        raise ErrorLote(errores)
+    return preparados
+
+
+def _movimientos(modificados, encargado):
+    """Movimientos e historiales de los dispositivos cuya posición cambió."""
+    cambios_posicion = {d.id: c['posicion_id'] for d, c in modificados if 'posicion_id' in c and c['posicion_id'][1]}
+    if not cambios_posicion:
+        return []
+
+    posiciones = Posicion.objects.in_bulk({pk for par in cambios_posicion.values() for pk in par if pk})
+    usuarios = RolUser.objects.in_bulk({d.usuario_asignado_id for d, _ in modificados if d.usuario_asignado_id})
+    if encargado is None:
+        encargado = RolUser.objects.filter(rol='admin').first()
+
+    registros = []
+    for dispositivo, _ in modificados:
+        if dispositivo.id not in cambios_posicion:
+            continue
+        anterior_id, nueva_id = cambios_posicion[dispositivo.id]
+        if anterior_id == nueva_id:
+            continue
+        origen, destino = Movimiento.ubicaciones(posiciones.get(anterior_id), posiciones.get(nueva_id))
+        movimiento = Movimiento(
+            dispositivo=dispositivo,
+            ubicacion_origen=origen,
+            ubicacion_destino=destino,
+            encargado=usuarios.get(dispositivo.usuario_asignado_id) or encargado,
+        )
+        movimiento.preparar()
+        registros += [movimiento, movimiento.historial()]
+    return registros
+
+
+def _guardar(modificados, preparados, campos):
+    """
+    Los dispositivos que reciben exactamente los mismos valores (el caso habitual: mover una
+    planta completa de sede) se actualizan con un UPDATE ... WHERE id IN por grupo; el resto
+    con bulk_update, que genera un CASE por campo y es bastante más costoso.
+    """
+    grupos = {}
+    for dispositivo, _ in modificados:
+        grupos.setdefault(tuple(sorted(preparados[dispositivo.id].items())), []).append(dispositivo.id)
+
+    individuales = []
+    for valores, ids in grupos.items():
+        if len(ids) == 1:
+            individuales.append(ids[0])
+            continue
+        for i in range(0, len(ids), BATCH_SIZE):
+            Dispositivo.objects.filter(id__in=ids[i:i + BATCH_SIZE]).update(**dict(valores))
+
+    if individuales:
+        por_id = {dispositivo.id: dispositivo for dispositivo, _ in modificados}
+        Dispositivo.objects.bulk_update([por_id[pk] for pk in individuales], sorted(campos), batch_size=BATCH_SIZE)
+
+
+def actualizar_lote(cambios_por_id, encargado=None):
+    """
+    Aplica {id: {campo: valor}} en una transacción y devuelve el reporte.
+    `encargado` es el usuario responsable de los movimientos de dispositivos sin usuario asignado.
+    """
+    inicio = time.perf_counter()
+    if len(cambios_por_id) > MAX_LOTE:
+        raise ErrorLote({"lote": f"El lote no puede superar {MAX_LOTE} dispositivos."})
+
+    preparados = preparar_cambios(cambios_por_id)
+    dispositivos = Dispositivo.objects.in_bulk(list(preparados))
+    faltantes = [pk for pk in preparados if pk not in dispositivos]
+    if faltantes:
+        raise ErrorLote({pk: {"id": "El dispositivo no existe."} for pk in faltantes})
+
+    modificados = []
+    campos = set()
+    resumen = Counter()
+    sedes = set()
+    for pk, fila in preparados.items():
+        dispositivo = dispositivos[pk]
+        anterior = clave_resumen(dispositivo.sede_id, dispositivo.tipo, dispositivo.estado)
+        for attname, valor in fila.items():
+            setattr(dispositivo, attname, valor)
+        cambios = dispositivo.campos_modificados()
+        if not cambios:
+            continue
+        modificados.append((dispositivo, cambios))
+        campos.update(cambios)
+        nueva = clave_resumen(dispositivo.sede_id, dispositivo.tipo, dispositivo.estado)
+        if anterior != nueva:
+            resumen[anterior] -= 1
+            resumen[nueva] += 1
+        sedes.update((anterior[0], nueva[0]))
+
+    with transaction.atomic():
+        if modificados:
+            _guardar(modificados, preparados, campos)
+            ajustar_resumen(resumen)
+            historiales = [
+                Historial(
+                    dispositivo=dispositivo,
+                    usuario_id=dispositivo.usuario_asignado_id,
+                    cambios=codificar_cambios(cambios),
+                    tipo_cambio=Historial.TipoCambio.MODIFICACION,
+                )
+                for dispositivo, cambios in modificados
+            ]
+            auditoria.registrar(*historiales, *_movimientos(modificados, encargado))
+            invalidar_estadisticas(sedes)
+
+    return {
+        'solicitados': len(preparados),
+        'actualizados': len(modificados),
+        'sin_cambios': len(preparados) - len(modificados),
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
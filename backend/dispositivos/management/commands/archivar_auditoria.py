@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from dispositivos.archivo import CAMPOS_FECHA, archivar, corte_retencion, directorio_archivo
+
+
+class Command(BaseCommand):
+    help = 'Mueve el historial y los movimientos anteriores al periodo de retención a archivos JSONL comprimidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=getattr(settings, 'AUDITORIA_RETENCION_DIAS', 365),
+                            help='Días de auditoría que se conservan en la base de datos')
+        parser.add_argument('--directorio', help='Directorio del archivo (por defecto AUDITORIA_ARCHIVO_DIR)')
+        parser.add_argument('--verificar', action='store_true',
+                            help='Solo informa cuántos registros se archivarían, sin moverlos')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        corte = corte_retencion(options['dias'])
+        directorio = options['directorio'] or directorio_archivo()
+        self.stdout.write(f"Archivando registros anteriores a {corte:%Y-%m-%d} en {directorio}")
+
+        total = 0
+        for modelo in CAMPOS_FECHA:
+            for mes, cantidad in archivar(modelo, corte, directorio, aplicar=not options['verificar']):
+                self.stdout.write(f"{modelo._meta.verbose_name_plural} {mes}: {cantidad}")
+                total += cantidad
+
+        accion = "Registros a archivar" if options['verificar'] else "Registros archivados"
+        self.stdout.write(self.style.SUCCESS(f"{accion}: {total} ({time.perf_counter() - inicio:.2f} s)"))
@@ -0,0 +1,92 @@
+import json
+import subprocess
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from dispositivos.autenticacion import token_para_usuario
+from dispositivos.benchmark import ejecutar_benchmark
+from dispositivos.models import Dispositivo, RolUser, Sede, Servicios
+
+USUARIO_BENCHMARK = 'benchmark'
+CLAVE_BENCHMARK = 'benchmark-clave-123'
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia (p50/p95/p99), consultas y memoria de cada endpoint de la API y guarda un reporte JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=50)
+        parser.add_argument('--salida', default='benchmark.json', help='Archivo JSON del reporte')
+        parser.add_argument('--comparar', help='Reporte JSON anterior con el que comparar')
+        parser.add_argument('--filtro', help='Solo rutas que contengan este texto')
+
+    def handle(self, *args, **options):
+        if not Dispositivo.objects.exists():
+            raise CommandError("No hay dispositivos. Ejecute primero `manage.py generar_datos`.")
+
+        usuario = RolUser.objects.filter(username=USUARIO_BENCHMARK).first()
+        if usuario is None:
+            usuario = RolUser.objects.create_user(
+                username=USUARIO_BENCHMARK, email='benchmark@example.com',
+                password=CLAVE_BENCHMARK, rol='admin'
+            )
+
+        valores = {
+            'user_id': usuario.id,
+            'pk': usuario.id,
+            'sede_id': Sede.objects.values_list('id', flat=True).first(),
+            'servicio_id': Servicios.objects.values_list('id', flat=True).first(),
+            'dispositivo_id': Dispositivo.objects.values_list('id', flat=True).first(),
+        }
+        contexto = {
+            'username': USUARIO_BENCHMARK,
+            'password': CLAVE_BENCHMARK,
+            'token': str(token_para_usuario(usuario).access_token),
+        }
+
+        # Permite el host 'testserver' y usa el backend de correo en memoria
+        setup_test_environment()
+        try:
+            resultados = ejecutar_benchmark(valores, contexto, options['iteraciones'], options['filtro'])
+        finally:
+            teardown_test_environment()
+
+        reporte = {
+            'fecha': datetime.now(timezone.utc).isoformat(),
+            'commit': self.commit_actual(),
+            'base_de_datos': connection.vendor,
+            'dispositivos': Dispositivo.objects.count(),
+            'iteraciones': options['iteraciones'],
+            'endpoints': resultados,
+        }
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+
+        anteriores = {}
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as archivo:
+                anteriores = {(r['metodo'], r['ruta']): r for r in json.load(archivo)['endpoints'] if r.get('medido', True)}
+
+        for r in resultados:
+            if not r['medido']:
+                self.stdout.write(f"{r['metodo']:4} {r['url']:45} no medido (no acepta GET y no tiene un cuerpo de prueba)")
+                continue
+            linea = (f"{r['metodo']:4} {r['url']:45} {r['status']} p50={r['p50_ms']:.1f}ms "
+                     f"p95={r['p95_ms']:.1f}ms p99={r['p99_ms']:.1f}ms consultas={r['consultas']} "
+                     f"memoria={r['memoria_pico_kb']}KB")
+            anterior = anteriores.get((r['metodo'], r['ruta']))
+            if anterior:
+                linea += (f" | Δp50={r['p50_ms'] - anterior['p50_ms']:+.1f}ms "
+                          f"Δconsultas={r['consultas'] - anterior['consultas']:+d}")
+            self.stdout.write(linea)
+
+        self.stdout.write(self.style.SUCCESS(f"Reporte guardado en {options['salida']}"))
+
+    def commit_actual(self):
+        try:
+            return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,62 @@
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import update_last_login
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from dispositivos.benchmark import medir_operacion
+from dispositivos.models import RolUser
+
+from .benchmark_api import CLAVE_BENCHMARK, USUARIO_BENCHMARK
+
+
+class Command(BaseCommand):
+    help = 'Mide el rendimiento del inicio de sesión: guardado de last_login con y sin validación completa, y el endpoint de login'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=100)
+
+    def handle(self, *args, **options):
+        usuario = RolUser.objects.filter(username=USUARIO_BENCHMARK).first()
+        if usuario is None:
+            usuario = RolUser.objects.create_user(
+                username=USUARIO_BENCHMARK, email='benchmark@example.com',
+                password=CLAVE_BENCHMARK, rol='admin'
+            )
+
+        def guardado_validacion_completa():
+            # Comportamiento anterior: full_clean en cada save, también con update_fields
+            usuario.full_clean()
+            update_last_login(None, usuario)
+
+        def login_completo(validacion_completa):
+            def operacion():
+                autenticado = authenticate(username=USUARIO_BENCHMARK, password=CLAVE_BENCHMARK)
+                if validacion_completa:
+                    autenticado.full_clean()
+                update_last_login(None, autenticado)
+                str(RefreshToken.for_user(autenticado).access_token)
+            return operacion
+
+        cliente = Client()
+        credenciales = {'username': USUARIO_BENCHMARK, 'password': CLAVE_BENCHMARK}
+        escenarios = [
+            ('last_login con validación completa (antes)', guardado_validacion_completa),
+            ('last_login con update_fields', lambda: update_last_login(None, usuario)),
+            ('authenticate + last_login + JWT (antes)', login_completo(True)),
+            ('authenticate + last_login + JWT', login_completo(False)),
+            ('POST /api/login/', lambda: cliente.post('/api/login/', credenciales, content_type='application/json')),
+        ]
+
+        # Permite el host 'testserver' del cliente de pruebas
+        setup_test_environment()
+        try:
+            for nombre, operacion in escenarios:
+                r = medir_operacion(operacion, options['iteraciones'])
+                self.stdout.write(
+                    f"{nombre:45} {r['por_segundo']:8.1f}/s p50={r['p50_ms']:.2f}ms "
+                    f"p95={r['p95_ms']:.2f}ms consultas={r['consultas']}"
+                )
+        finally:
+            teardown_test_environment()
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, RequestFactory
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from dispositivos.benchmark import medir_middlewares
+from dispositivos.models import RolUser
+
+from .benchmark_api import CLAVE_BENCHMARK, USUARIO_BENCHMARK
+
+
+class Command(BaseCommand):
+    help = 'Mide el costo por petición de cada middleware de MIDDLEWARE (o de una lista dada) sobre una vista vacía'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=2000)
+        parser.add_argument('--middleware', help='Lista separada por comas para comparar con otro stack (p. ej. el anterior)')
+
+    def handle(self, *args, **options):
+        middlewares = options['middleware'].split(',') if options['middleware'] else list(settings.MIDDLEWARE)
+
+        usuario = RolUser.objects.filter(username=USUARIO_BENCHMARK).first()
+        if usuario is None:
+            usuario = RolUser.objects.create_user(
+                username=USUARIO_BENCHMARK, email='benchmark@example.com',
+                password=CLAVE_BENCHMARK, rol='admin'
+            )
+
+        # Permite el host 'testserver' de RequestFactory
+        setup_test_environment()
+        try:
+            cliente = Client()
+            cliente.force_login(usuario)
+            sesion = {settings.SESSION_COOKIE_NAME: cliente.cookies[settings.SESSION_COOKIE_NAME].value}
+            fabrica = RequestFactory()
+
+            def peticion(ruta, cookies=None):
+                def crear():
+                    request = fabrica.get(ruta)
+                    request.COOKIES.update(cookies or {})
+                    return request
+                return crear
+
+            escenarios = [
+                ('API sin sesión', peticion('/api/sede/')),
+                ('API con cookie de sesión', peticion('/api/sede/', sesion)),
+                ('admin con sesión', peticion('/admin/', sesion)),
+            ]
+            for nombre, crear in escenarios:
+                r = medir_middlewares(middlewares, crear, options['iteraciones'])
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{nombre}: {r['total_us']:.1f}µs por petición, {r['consultas']} consultas"))
+                for m in r['middlewares']:
+                    self.stdout.write(f"  {m['middleware']:60} {m['us']:8.2f}µs")
+        finally:
+            teardown_test_environment()
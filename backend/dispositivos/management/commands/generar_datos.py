@@ -0,0 +1,142 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dispositivos.colores import COLOR_DEFECTO, invalidar_colores
+from dispositivos.estadisticas import invalidar_estadisticas
+from dispositivos.models import Dispositivo, Historial, Movimiento, Posicion, RolUser, Sede, Servicios
+from dispositivos.resumen import reconstruir_resumen
+
+
+class Command(BaseCommand):
+    help = 'Genera un inventario sintético (sedes, servicios, posiciones, dispositivos, historial y movimientos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sedes', type=int, default=5)
+        parser.add_argument('--servicios', type=int, default=20)
+        parser.add_argument('--posiciones', type=int, default=2000)
+        parser.add_argument('--dispositivos', type=int, default=10000)
+        parser.add_argument('--historial', type=int, default=2, help='Registros de historial por dispositivo')
+        parser.add_argument('--movimientos', type=int, default=1, help='Movimientos por dispositivo')
+        parser.add_argument('--usuarios', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla aleatoria para datos reproducibles')
+        parser.add_argument('--limpiar', action='store_true', help='Elimina los datos generados previamente')
+
+    def handle(self, *args, **options):
+        random.seed(options['semilla'])
+        batch_size = options['batch_size']
+        inicio = time.perf_counter()
+
+        with transaction.atomic():
+            if options['limpiar']:
+                self.limpiar()
+
+            sedes = Sede.objects.bulk_create([
+                Sede(nombre=f"Sede Sintética {i + 1}", ciudad=random.choice(["Bogotá", "Medellín", "Cali", "Barranquilla"]),
+                     direccion=f"Calle {i + 1} # {random.randint(1, 99)}-{random.randint(1, 99)}")
+                for i in range(options['sedes'])
+            ])
+            self.stdout.write(f"Sedes: {len(sedes)}")
+
+            servicios = Servicios.objects.bulk_create([
+                Servicios(nombre=f"Servicio Sintético {i + 1}", codigo_analitico=f"{500000 + i}",
+                          color=f"#{random.randint(0, 0xFFFFFF):06X}")
+                for i in range(options['servicios'])
+            ])
+            Servicios.sedes.through.objects.bulk_create([
+                Servicios.sedes.through(servicios_id=servicio.id, sede_id=random.choice(sedes).id)
+                for servicio in servicios
+            ])
+            self.stdout.write(f"Servicios: {len(servicios)}")
+
+            pisos = [codigo for codigo, _ in Posicion.PISOS]
+            posiciones = Posicion.objects.bulk_create([
+                self.posicion(i, sedes, servicios, pisos) for i in range(options['posiciones'])
+            ], batch_size=batch_size)
+            self.stdout.write(f"Posiciones: {len(posiciones)}")
+
+            usuarios = RolUser.objects.bulk_create([
+                RolUser(username=f"sintetico{i + 1}", email=f"sintetico{i + 1}@example.com",
+                        nombre=f"Usuario Sintético {i + 1}", rol='coordinador', password='!')
+                for i in range(options['usuarios'])
+            ], batch_size=batch_size)
+            self.stdout.write(f"Usuarios: {len(usuarios)}")
+
+            dispositivos = Dispositivo.objects.bulk_create(
+                (self.dispositivo(i, sedes, posiciones, servicios, usuarios) for i in range(options['dispositivos'])),
+                batch_size=batch_size
+            )
+            self.stdout.write(f"Dispositivos: {len(dispositivos)}")
+
+            ids = [dispositivo.id for dispositivo in dispositivos]
+            estados = [codigo for codigo, _ in Dispositivo.ESTADO_DISPOSITIVO]
+            historial = Historial.objects.bulk_create(
+                (
+                    Historial(dispositivo_id=dispositivo_id, usuario=random.choice(usuarios) if usuarios else None,
+                              cambios={"estado": {"antes": random.choice(estados), "despues": random.choice(estados)}})
+                    for dispositivo_id in ids for _ in range(options['historial'])
+                ),
+                batch_size=batch_size
+            )
+            self.stdout.write(f"Historial: {len(historial)}")
+
+            ubicaciones = [codigo for codigo, _ in Movimiento.UBICACIONES]
+            movimientos = Movimiento.objects.bulk_create(
+                (
+                    Movimiento(dispositivo_id=dispositivo_id, encargado=random.choice(usuarios) if usuarios else None,
+                               ubicacion_origen=origen, ubicacion_destino=random.choice([u for u in ubicaciones if u != origen]))
+                    for dispositivo_id in ids for origen in random.choices(ubicaciones, k=options['movimientos'])
+                ),
+                batch_size=batch_size
+            )
+            self.stdout.write(f"Movimientos: {len(movimientos)}")
+
+            # bulk_create no dispara señales
+            reconstruir_resumen()
+            invalidar_estadisticas()
+            invalidar_colores()
+
+        self.stdout.write(self.style.SUCCESS(f"Datos generados en {time.perf_counter() - inicio:.2f} s"))
+
+    def posicion(self, i, sedes, servicios, pisos):
+        # bulk_create no pasa por Posicion.save(), el color se toma del servicio aquí
+        servicio = random.choice(servicios) if servicios else None
+        return Posicion(
+            sede=sedes[i % len(sedes)], servicio=servicio,
+            nombre=f"Espacio S{i + 1:05d}", piso=random.choice(pisos),
+            coordenada_x=(i // len(sedes)) % 100 * 50, coordenada_y=(i // len(sedes)) // 100 * 50,
+            estado='ocupado', color=servicio.color if servicio else COLOR_DEFECTO,
+        )
+
+    def dispositivo(self, i, sedes, posiciones, servicios, usuarios):
+        posicion = random.choice(posiciones) if posiciones else None
+        return Dispositivo(
+            tipo=random.choice(Dispositivo.TIPOS_DISPOSITIVOS)[0],
+            estado=random.choice(Dispositivo.ESTADO_DISPOSITIVO)[0],
+            marca=random.choice(Dispositivo.FABRICANTES)[0],
+            modelo=f"Modelo {random.randint(1, 60)}",
+            serial=f"SIN-{i + 1:08d}",
+            placa_cu=f"CU-{i + 1:08d}",
+            razon_social=random.choice(["ECCC", "ECOL", "CNC"]),
+            regimen=random.choice(Dispositivo.REGIMENES)[0],
+            sistema_operativo=random.choice(Dispositivo.SISTEMAS_OPERATIVOS)[0],
+            procesador=random.choice(Dispositivo.PROCESADORES)[0],
+            estado_propiedad=random.choice(Dispositivo.ESTADOS_PROPIEDAD)[0],
+            ubicacion='SEDE',
+            proveedor=random.choice(["Compumax", "Tecnoglass", "Datecsa", None]),
+            sede_id=posicion.sede_id if posicion else random.choice(sedes).id,
+            posicion=posicion,
+            piso=posicion.piso if posicion else None,
+            servicio=posicion.servicio if posicion else None,
+            usuario_asignado=random.choice(usuarios) if usuarios and random.random() < 0.7 else None,
+        )
+
+    def limpiar(self):
+        Dispositivo.objects.filter(serial__startswith="SIN-").delete()
+        Posicion.objects.filter(nombre__startswith="Espacio S").delete()
+        Servicios.objects.filter(nombre__startswith="Servicio Sintético").delete()
+        Sede.objects.filter(nombre__startswith="Sede Sintética").delete()
+        RolUser.objects.filter(username__startswith="sintetico").delete()
@@ -0,0 +1,34 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dispositivos.importacion import BATCH_SIZE, importar_dispositivos, leer_filas
+
+
+class Command(BaseCommand):
+    help = 'Importa dispositivos de forma masiva desde un archivo Excel (.xlsx) o CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .xlsx o .csv')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help=f'Filas por lote de inserción (por defecto {BATCH_SIZE})')
+        parser.add_argument('--max-errores', type=int, default=20,
+                            help='Cantidad máxima de errores por fila a mostrar')
+
+    def handle(self, *args, **options):
+        archivo = options['archivo']
+        if not os.path.exists(archivo):
+            raise CommandError(f"El archivo {archivo} no existe.")
+
+        reporte = importar_dispositivos(leer_filas(archivo, archivo), batch_size=options['batch_size'])
+
+        for error in reporte['errores'][:options['max_errores']]:
+            self.stdout.write(self.style.WARNING(f"Fila {error['fila']}: {error['errores']}"))
+        if len(reporte['errores']) > options['max_errores']:
+            self.stdout.write(f"... y {len(reporte['errores']) - options['max_errores']} errores más.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Filas leídas: {reporte['filas']} | Creados: {reporte['creados']} | "
+            f"Errores: {len(reporte['errores'])} | {reporte['segundos']} s "
+            f"({reporte['filas_por_segundo']} filas/s)"
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dispositivos.models import Sede
+from dispositivos.planos import BATCH_SIZE, importar_plano, leer_celdas
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza las posiciones de una sede con un plano JSON (sections/cells) o JSONL (una celda por línea)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .json o .jsonl')
+        parser.add_argument('--sede', default='Sede Principal', help='Nombre de la sede (se crea si no existe)')
+        parser.add_argument('--sin-eliminar', action='store_true',
+                            help='No elimina las posiciones que ya no están en el plano')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        sede, created = Sede.objects.get_or_create(nombre=options['sede'])
+
+        try:
+            estadisticas = importar_plano(
+                leer_celdas(options['archivo']), sede,
+                eliminar=not options['sin_eliminar'], batch_size=options['batch_size']
+            )
+        except OSError as e:
+            raise CommandError(f"No se pudo leer el archivo: {e}")
+        except (ValueError, KeyError, TypeError) as e:
+            raise CommandError(f"Plano inválido: {e}")
+
+        for clave, valor in estadisticas.items():
+            self.stdout.write(f"{clave}: {valor}")
+        self.stdout.write(self.style.SUCCESS(f"Plano cargado en la sede '{sede.nombre}'"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from dispositivos.resumen import reconstruir_resumen
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen de inventario por sede, tipo y estado e informa las diferencias encontradas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help='Solo informa las diferencias, sin reconstruir el resumen')
+
+    def handle(self, *args, **options):
+        diferencias = reconstruir_resumen(aplicar=not options['verificar'])
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("El resumen coincide con el inventario."))
+            return
+
+        for (sede_id, tipo, estado), en_resumen, real in diferencias:
+            self.stdout.write(self.style.WARNING(
+                f"Sede {sede_id or 'sin sede'} / {tipo} / {estado or 'sin estado'}: "
+                f"resumen={en_resumen} real={real}"
+            ))
+
+        accion = "Diferencias encontradas" if options['verificar'] else "Resumen reconstruido, diferencias corregidas"
+        self.stdout.write(self.style.SUCCESS(f"{accion}: {len(diferencias)}"))
@@ -1,10 +1,26 @@
+from django.conf import settings
 from django.contrib.auth import logout
-from django.utils.deprecation import MiddlewareMixin
 
-class AutoLogoutMiddleware(MiddlewareMixin):
+
+class AutoLogoutMiddleware:
     """
-    Middleware para cerrar sesión si el usuario está desactivado.
+    Middleware para cerrar la sesión si el usuario está desactivado.
+
+    Solo aplica a las rutas con sesión (admin y vistas HTML): las rutas de
+    `AUTO_LOGOUT_RUTAS_EXCLUIDAS` (API y estáticos) se autentican con el token y sus claims,
+    y las peticiones sin cookie de sesión no tienen usuario que revisar. Así no se carga la
+    sesión ni el usuario en cada petición.
     """
-    def process_request(self, request):
-        if request.user.is_authenticated and not request.user.is_active:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.excluidas = tuple(getattr(settings, 'AUTO_LOGOUT_RUTAS_EXCLUIDAS', ('/api/', settings.STATIC_URL)))
+
+    def __call__(self, request):
+        if self.aplica(request) and request.user.is_authenticated and not request.user.is_active:
             logout(request)
+        return self.get_response(request)
+
+    def aplica(self, request):
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return False
+        return not request.path_info.startswith(self.excluidas)
@@ -10,6 +10,64 @@ from colorfield.fields import ColorField  # type: ignore
 from django.utils.translation import gettext_lazy as _
 from django.contrib.postgres.fields import JSONField
 from django.db.models.signals import post_save, pre_save
+from .busqueda import IndiceBusqueda, vector_busqueda
+from .colores import COLOR_DEFECTO, color_servicio
+from . import auditoria
+from .diffs import codificar_cambios
+
+class RastreoCamposMixin:
+    """
+    Guarda en la instancia los valores cargados desde la base de datos para detectar
+    los campos modificados al guardar sin volver a consultar la fila.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._valores_cargados = dict(zip(field_names, values))
+        return instance
+
+    def _valores_actuales(self):
+        diferidos = self.get_deferred_fields()
+        return {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in diferidos
+        }
+
+    def campos_modificados(self):
+        """
+        Devuelve {attname: (valor_anterior, valor_nuevo)} respecto a lo cargado de la base de datos.
+        """
+        cargados = getattr(self, '_valores_cargados', None) or {}
+        cambios = {}
+        for attname, anterior in cargados.items():
+            nuevo = getattr(self, attname)
+            if anterior != nuevo:
+                cambios[attname] = (anterior, nuevo)
+        return cambios
+
+    def save(self, *args, **kwargs):
+        # Los receptores de post_save leen `_valores_previos` y `_cambios`
+        self._valores_previos = dict(getattr(self, '_valores_cargados', None) or {})
+        self._cambios = self.campos_modificados()
+        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        actuales = self._valores_actuales()
+        if update_fields is not None:
+            attnames = {self._meta.get_field(nombre).attname for nombre in update_fields}
+            # Una instancia creada en memoria (no con from_db) aún no tiene valores cargados
+            cargados = getattr(self, '_valores_cargados', None) or {}
+            cargados.update({k: v for k, v in actuales.items() if k in attnames})
+            self._valores_cargados = cargados
+        else:
+            self._valores_cargados = actuales
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._valores_cargados = self._valores_actuales()
+
 
 class Sede(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
@@ -23,7 +81,7 @@ class Sede(models.Model):
         verbose_name = "Sede"
         verbose_name_plural = "Sedes"
 
-class RolUser(AbstractUser):
+class RolUser(RastreoCamposMixin, AbstractUser):
     ROLES_CHOICES = [
         ('admin', 'Administrador'),
         ('coordinador', 'Coordinador'),
@@ -53,6 +111,10 @@ class RolUser(AbstractUser):
     # Relación con sedes
     sedes = models.ManyToManyField('Sede', blank=True, related_name='usuarios_asignados')
 
+    # Epoch (milisegundos) desde el que son válidos los tokens del usuario; lo fijan las
+    # señales al cambiar el rol, el estado o las sedes, que viajan como claims en el token
+    tokens_validos_desde = models.PositiveBigIntegerField(null=True, blank=True, editable=False, db_index=True)
+
     # Relación con grupos y permisos
     groups = models.ManyToManyField(
         'auth.Group',
@@ -85,8 +147,21 @@ class RolUser(AbstractUser):
             })
 
     def save(self, *args, **kwargs):
-        # Ejecuta las validaciones antes de guardar (opcional, puedes comentarlo si da problemas)
-        self.full_clean()
+        """
+        Valida antes de guardar. Con `update_fields` solo se validan esos campos: las
+        escrituras internas (last_login, is_active, password) no repiten las consultas de
+        unicidad de username, email y documento.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.full_clean()
+        else:
+            campos = {self._meta.get_field(nombre).name for nombre in update_fields}
+            exclude = [field.name for field in self._meta.fields if field.name not in campos]
+            self.clean_fields(exclude=exclude)
+            if campos & {'email', 'celular'}:
+                self.clean()
+            self.validate_unique(exclude=exclude)
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -98,7 +173,7 @@ class RolUser(AbstractUser):
         ordering = ['id']
 
         
-class Servicios(models.Model):
+class Servicios(RastreoCamposMixin, models.Model):
     nombre = models.CharField(max_length=100)
     codigo_analitico = models.CharField(max_length=255, null=True, blank=True)  
     sedes = models.ManyToManyField('Sede', related_name="servicios")
@@ -123,24 +198,6 @@ class Posicion(models.Model):
         ('inactivo', 'Inactivo'),
     ]
 
-    COLORES = {
-        '530001': '#0094FF',  # Azul claro
-        '530013': '#00FF00',  # Verde
-        '530014': '#FF9900',  # Naranja
-        '152001': '#9900FF',  # Morado
-        '320026': '#6600CC',  # Azul oscuro
-        '221003': '#FFD700',  # Amarillo
-        '390001': '#008080',  # Verde azulado
-        '153001': '#FF66B2',  # Rosa
-        '269001': '#FF0000',  # Rojo
-        '186020': '#FF4500',  # Rojo oscuro
-        'Desarrollo': '#FF0000',  # Rojo fuerte
-        'Soporte': '#8B0000',  # Rojo oscuro
-        'Selección': '#808000',  # Verde oliva
-        'Leroy Merli': '#8A2BE2',  # Púrpura
-        'default': '#B0BEC5'  # Gris azulado por defecto
-    }
-
     PISOS = [
         ('PISO1', 'Piso 1'),
         ('PISO2', 'Piso 2'),
@@ -158,18 +215,16 @@ class Posicion(models.Model):
     coordenada_y = models.IntegerField()
     descripcion = models.TextField(blank=True, null=True)
     estado = models.CharField(max_length=10, choices=ESTADOS, default='disponible')
-    color = models.CharField(max_length=20, default='#B0BEC5')
+    color = models.CharField(max_length=20, default=COLOR_DEFECTO)
+    # Identificador de la celda en el plano de origen (p. ej. "E001"), estable entre cargas
+    id_externo = models.CharField(max_length=50, null=True, blank=True)
 
     def save(self, *args, **kwargs):
         """
-        Asegura que el color de la posición se actualiza correctamente.
-        Primero intenta obtener el color según el nombre del servicio.
-        Si no hay servicio o el nombre del servicio no está en la lista, usa el color por defecto.
+        Asigna el color del servicio de la posición, o el color por defecto si no tiene.
+        El color se resuelve desde la caché de colores de servicios, sin consultar el servicio.
         """
-        if self.servicio and self.servicio.nombre in self.COLORES:
-            self.color = self.COLORES[self.servicio.nombre]
-        else:
-            self.color = self.COLORES['default']
+        self.color = color_servicio(self.servicio_id)
 
         super(Posicion, self).save(*args, **kwargs)
 
@@ -179,10 +234,21 @@ class Posicion(models.Model):
     class Meta:
         verbose_name = "Posición"
         verbose_name_plural = "Posiciones"
+        indexes = [
+            # Consultas del plano por sede, piso y ventana de coordenadas
+            models.Index(fields=['sede', 'piso', 'coordenada_x', 'coordenada_y'], name='posicion_plano_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sede', 'id_externo'],
+                condition=models.Q(id_externo__isnull=False),
+                name='posicion_id_externo_unico',
+            ),
+        ]
 
 
 
-class Dispositivo(models.Model):
+class Dispositivo(RastreoCamposMixin, models.Model):
     TIPOS_DISPOSITIVOS = [
         ('COMPUTADOR', 'Computador'),
         ('DESKTOP', 'Desktop'),
@@ -319,7 +385,8 @@ class Dispositivo(models.Model):
     estado_propiedad = models.CharField(max_length=10, choices=ESTADOS_PROPIEDAD, null=True, blank=True)
     # Clave foránea a Posicion con related_name para evitar conflicto
     posicion = models.ForeignKey(Posicion, on_delete=models.SET_NULL, null=True, blank=True, related_name='dispositivos')
-    sede = models.ForeignKey('Sede', on_delete=models.SET_NULL, null=True, blank=True, related_name="dispositivos", db_index=True)
+    # El índice compuesto (sede, id) de Meta.indexes cubre las búsquedas por sede
+    sede = models.ForeignKey('Sede', on_delete=models.SET_NULL, null=True, blank=True, related_name="dispositivos", db_index=False)
     tipo_disco_duro = models.CharField(max_length=10, choices=TIPOS_DISCO_DURO, null=True, blank=True)
     capacidad_disco_duro = models.CharField(max_length=10, choices=CAPACIDADES_DISCO_DURO, null=True, blank=True)
     tipo_memoria_ram = models.CharField(max_length=10, choices=TIPOS_MEMORIA_RAM, null=True, blank=True)
@@ -337,10 +404,70 @@ class Dispositivo(models.Model):
     )
     
     disponible = models.BooleanField(default=True) 
+
+    class Meta:
+        indexes = [
+            # Listado paginado por cursor (id) con los filtros de dispositivo_view
+            models.Index(fields=['sede', 'id'], name='dispositivo_sede_id_idx'),
+            models.Index(fields=['tipo', 'id'], name='dispositivo_tipo_id_idx'),
+            models.Index(fields=['estado', 'id'], name='dispositivo_estado_id_idx'),
+            # Dispositivos sin usuario asignado por sede
+            models.Index(fields=['sede'], condition=models.Q(usuario_asignado__isnull=True), name='dispositivo_sin_asignar_idx'),
+            # Búsqueda de texto completo (ver dispositivos.busqueda)
+            IndiceBusqueda(vector_busqueda(), name='dispositivo_busqueda_gin'),
+        ]
     
 
 
 
+class ResumenInventario(models.Model):
+    """
+    Conteo materializado de dispositivos por sede, tipo y estado.
+    Se mantiene de forma incremental con señales (ver `dispositivos.resumen`).
+    """
+    sede = models.ForeignKey('Sede', on_delete=models.CASCADE, null=True, blank=True, related_name='resumen_inventario')
+    tipo = models.CharField(max_length=17, choices=Dispositivo.TIPOS_DISPOSITIVOS)
+    estado = models.CharField(max_length=10, blank=True, default='')  # '' = sin estado
+    cantidad = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.sede_id or 'Sin sede'} - {self.tipo} - {self.estado or 'Sin estado'}: {self.cantidad}"
+
+    class Meta:
+        verbose_name = "Resumen de inventario"
+        verbose_name_plural = "Resumen de inventario"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sede', 'tipo', 'estado'],
+                condition=models.Q(sede__isnull=False),
+                name='resumen_inventario_unico_sede',
+            ),
+            models.UniqueConstraint(
+                fields=['tipo', 'estado'],
+                condition=models.Q(sede__isnull=True),
+                name='resumen_inventario_unico_sin_sede',
+            ),
+        ]
+
+
+class TokenRevocado(models.Model):
+    """
+    Tokens JWT revocados (logout o bloqueo). Se conservan hasta que el token expira;
+    la validación usa una copia en memoria (ver `dispositivos.autenticacion`).
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    usuario = models.ForeignKey('RolUser', on_delete=models.CASCADE, null=True, blank=True, related_name='tokens_revocados')
+    expira = models.DateTimeField(db_index=True)
+    fecha_revocacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.jti
+
+    class Meta:
+        verbose_name = "Token revocado"
+        verbose_name_plural = "Tokens revocados"
+
+
 class Movimiento(models.Model):
     UBICACIONES = [
         ('CASA', 'Casa'),
@@ -352,7 +479,8 @@ class Movimiento(models.Model):
     dispositivo = models.ForeignKey(
         Dispositivo, 
         on_delete=models.CASCADE, 
-        related_name="movimientos"
+        related_name="movimientos",
+        db_index=False  # Cubierto por el índice (dispositivo, -fecha_movimiento)
     )
     encargado = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
@@ -366,9 +494,25 @@ class Movimiento(models.Model):
     ubicacion_destino = models.CharField(max_length=50, choices=UBICACIONES)
     observacion = models.TextField(null=True, blank=True)
 
-    def save(self, *args, **kwargs):
-        """Genera automáticamente una descripción detallada de la acción realizada."""
-        
+    @staticmethod
+    def ubicaciones(anterior, nueva):
+        """
+        (origen, destino) para un cambio entre dos posiciones. Si las dos se llaman igual
+        (otro piso u otra sede) se agregan su id y su piso para distinguirlas.
+        """
+        def texto(posicion, calificar):
+            if posicion is None:
+                return "Desconocido"
+            if not calificar:
+                return posicion.nombre
+            return f"{posicion.nombre[:30]} #{posicion.id} ({posicion.piso})"
+
+        calificar = anterior is not None and nueva is not None and anterior.nombre == nueva.nombre
+        return texto(anterior, calificar), texto(nueva, calificar)
+
+    def preparar(self):
+        """Valida el movimiento y genera automáticamente una descripción detallada de la acción realizada."""
+
         # Verifica que el movimiento tenga sentido
         if self.ubicacion_origen == self.ubicacion_destino:
             raise ValueError("La ubicación de origen y destino no pueden ser iguales.")
@@ -380,45 +524,43 @@ class Movimiento(models.Model):
                 f"por {self.encargado.get_full_name() if self.encargado else 'Desconocido'}."
             )
 
+    def save(self, *args, **kwargs):
+        self.preparar()
         super().save(*args, **kwargs)
 
+    def historial(self):
+        """Registro de historial (sin guardar) que acompaña al movimiento."""
+        dispositivo = self.dispositivo
+        usuario = self.encargado
+        return Historial(
+            dispositivo=dispositivo,
+            usuario=usuario,  # Si no hay usuario, deja el campo vacío
+            cambios=(
+                f"El dispositivo {dispositivo.serial} ({dispositivo.marca} {dispositivo.modelo}) "
+                f"fue movido de {self.ubicacion_origen} a {self.ubicacion_destino} "
+                f"por {usuario.nombre if usuario else 'Desconocido'}."
+            ),
+            tipo_cambio=Historial.TipoCambio.MOVIMIENTO
+        )
+
     def __str__(self):
         return f"Movimiento de {self.dispositivo.serial} - {self.fecha_movimiento.strftime('%Y-%m-%d %H:%M:%S')}"
 
     class Meta:
         verbose_name = "Movimiento"
         verbose_name_plural = "Movimientos"
-
-
-@receiver(post_save, sender=Movimiento)
-def handle_movimiento_post_save(sender, instance, created, **kwargs):
-    if created:
-        print(f"Nuevo movimiento creado: {instance}")
-    else:
-        print(f"Movimiento actualizado: {instance}")
-
-
+        indexes = [
+            models.Index(fields=['dispositivo', '-fecha_movimiento', '-id'], name='movimiento_disp_fecha_idx'),
+        ]
 
 
 @receiver(post_save, sender=Movimiento)
 def crear_historial_por_movimiento(sender, instance, created, **kwargs):
-    """Crea automáticamente un historial cuando se registra un movimiento."""
+    """Crea automáticamente un historial cuando se registra un movimiento guardado individualmente."""
     if created:
-        dispositivo = instance.dispositivo
-        usuario = instance.encargado
-        cambios = (
-            f"El dispositivo {dispositivo.serial} ({dispositivo.marca} {dispositivo.modelo}) "
-            f"fue movido de {instance.ubicacion_origen} a {instance.ubicacion_destino} "
-            f"por {usuario.nombre if usuario else 'Desconocido'}."
-        )
+        auditoria.registrar(instance.historial())
+
 
-        Historial.objects.create(
-            dispositivo=dispositivo,
-            usuario=usuario if usuario else None,  # Si no hay usuario, deja el campo vacío
-            cambios=cambios,
-            tipo_cambio="Movimiento registrado"
-        )
-        
 class Historial(models.Model):
     class TipoCambio(models.TextChoices):  
         MOVIMIENTO = 'MOVIMIENTO', _('Movimiento registrado')
@@ -426,7 +568,7 @@ class Historial(models.Model):
         ASIGNACION = 'ASIGNACION', _('Cambio de usuario asignado')
         OTRO = 'OTRO', _('Otro')
 
-    dispositivo = models.ForeignKey('Dispositivo', on_delete=models.CASCADE, related_name='historial')
+    dispositivo = models.ForeignKey('Dispositivo', on_delete=models.CASCADE, related_name='historial', db_index=False)  # Ver Meta.indexes
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     fecha_modificacion = models.DateTimeField(auto_now_add=True)
     cambios = models.JSONField(null=True, blank=True)
@@ -439,75 +581,69 @@ class Historial(models.Model):
         verbose_name = "Historial"
         verbose_name_plural = "Historiales"
         ordering = ['-fecha_modificacion']
-
-
-# 📌 Guardamos el estado anterior antes de actualizar
-@receiver(pre_save, sender=Dispositivo)
-def guardar_estado_anterior(sender, instance, **kwargs):
-    if instance.pk:  # Solo si el objeto ya existe
-        try:
-            instance._estado_anterior = Dispositivo.objects.get(pk=instance.pk)
-        except Dispositivo.DoesNotExist:
-            instance._estado_anterior = None
+        indexes = [
+            models.Index(fields=['dispositivo', '-fecha_modificacion', '-id'], name='historial_disp_fecha_idx'),
+        ]
 
 
 # 📌 Registramos los cambios en el historial después de actualizar
 @receiver(post_save, sender=Dispositivo)
 def registrar_cambios_historial(sender, instance, created, **kwargs):
+    """
+    Registra en el historial los campos modificados, usando los valores cargados en la
+    instancia (ver `RastreoCamposMixin`) en lugar de volver a leer la fila.
+    """
     if created:
         return  # No registrar historial en la creación, solo en modificaciones
 
-    cambios = {}
-    estado_anterior = getattr(instance, '_estado_anterior', None)
-    
-    if estado_anterior:
-        for field in instance._meta.fields:
-            nombre_campo = field.name
-            valor_anterior = getattr(estado_anterior, nombre_campo)
-            valor_nuevo = getattr(instance, nombre_campo)
-
-            if valor_anterior != valor_nuevo:
-                cambios[nombre_campo] = {"antes": valor_anterior, "despues": valor_nuevo}
-
+    cambios = codificar_cambios(getattr(instance, '_cambios', None) or {})
     if cambios:
-        Historial.objects.create(
+        # Se escribe al confirmar la transacción junto con el resto de la auditoría
+        auditoria.registrar(Historial(
             dispositivo=instance,
-            usuario=instance.usuario_asignado,  # Usuario que lo tiene asignado
+            usuario_id=instance.usuario_asignado_id,  # Usuario que lo tiene asignado
             cambios=cambios,
             tipo_cambio=Historial.TipoCambio.MODIFICACION
-        )
-    
-    
+        ))
 
 
 @receiver(post_save, sender=Dispositivo)
-def registrar_movimiento(sender, instance, **kwargs):
+def registrar_movimiento(sender, instance, created, **kwargs):
     """Registra un movimiento automáticamente cuando cambia la posición de un dispositivo."""
+    if created:
+        return
+
+    # La posición anterior sale de los valores cargados, no de una nueva consulta
+    modificados = getattr(instance, '_cambios', None) or {}
+    if 'posicion_id' not in modificados:
+        return
 
-    # Obtener la posición anterior del dispositivo antes de la actualización
-    dispositivo_anterior = sender.objects.filter(pk=instance.pk).first()
-    posicion_anterior = dispositivo_anterior.posicion if dispositivo_anterior else None
+    posicion_anterior_id, posicion_nueva_id = modificados['posicion_id']
+
+    # Crear el movimiento solo si hay una nueva posición asignada
+    if not posicion_nueva_id:
+        return
 
-    # Si la posición no cambió, no registrar un nuevo movimiento
-    if posicion_anterior == instance.posicion:
-        return  
+    posiciones = Posicion.objects.in_bulk([pk for pk in (posicion_anterior_id, posicion_nueva_id) if pk])
+    posicion_anterior = posiciones.get(posicion_anterior_id)
+    posicion_nueva = posiciones.get(posicion_nueva_id)
 
-    # Determinar la ubicación de origen y destino
-    ubicacion_origen = posicion_anterior.nombre if posicion_anterior else "Desconocido"
-    ubicacion_destino = instance.posicion.nombre if instance.posicion else "Desconocido"
+    # Determinar la ubicación de origen y destino (`_cambios` solo tiene campos que cambiaron)
+    ubicacion_origen, ubicacion_destino = Movimiento.ubicaciones(posicion_anterior, posicion_nueva)
 
     # Determinar el encargado del movimiento
     encargado = instance.usuario_asignado
-    if not encargado and instance.posicion and instance.posicion.sede:
-        encargado = instance.posicion.sede.usuarios_asignados.first()
+    if not encargado and posicion_nueva:
+        encargado = RolUser.objects.filter(sedes=posicion_nueva.sede_id).first()
     if not encargado:
         encargado = RolUser.objects.filter(rol='admin').first()
 
-    # Crear el movimiento solo si hay una nueva posición asignada
-    if instance.posicion:
-        Movimiento.objects.create(
-            dispositivo=instance,
-            ubicacion_origen=ubicacion_origen,
-            ubicacion_destino=ubicacion_destino,
-            encargado=encargado,
-        )
+    movimiento = Movimiento(
+        dispositivo=instance,
+        ubicacion_origen=ubicacion_origen,
+        ubicacion_destino=ubicacion_destino,
+        encargado=encargado,
+    )
+    movimiento.preparar()
+    # bulk_create no dispara post_save, el historial del movimiento se encola con él
+    auditoria.registrar(movimiento, movimiento.historial())
@@ -0,0 +1,25 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination # type: ignore
+
+
+class DispositivoCursorPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) para el listado de dispositivos.
+
+    El cursor se basa en el `id`, por lo que cada página se resuelve con
+    `WHERE id > <ultimo_id> ORDER BY id LIMIT n` y cuesta lo mismo sea la
+    página 1 o la 5.000 (no hay OFFSET).
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class BusquedaPagination(PageNumberPagination):
+    """
+    Paginación por número de página para resultados ordenados por relevancia,
+    donde no hay una clave estable para paginar por cursor.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,132 @@
+"""
+Importación de planos (layouts) de posiciones.
+
+El plano se compara con las posiciones existentes de la sede por su `id_externo`; las
+posiciones creadas antes de tener `id_externo` se emparejan por nombre y reciben el de la
+celda. Los cambios se aplican en bloque (bulk_create, bulk_update y un único DELETE) dentro de una
+transacción. Las posiciones referenciadas por dispositivos nunca se eliminan.
+"""
+import json
+import time
+
+from django.db import transaction # type: ignore
+
+from .colores import COLOR_DEFECTO
+from .models import Dispositivo, Posicion
+
+ESTADO_MAP = {
+    "available": "disponible",
+    "occupied": "ocupado",
+    "reserved": "reservado",
+    "inactive": "inactivo"
+}
+
+PISO_MAP = {
+    "Piso 1": "PISO1",
+    "Piso 2": "PISO2",
+    "Piso 3": "PISO3",
+    "Piso 4": "PISO4",
+    "Torre 1": "TORRE1"
+}
+
+CAMPOS_ACTUALIZABLES = ('nombre', 'piso', 'coordenada_x', 'coordenada_y', 'estado', 'descripcion')
+
+BATCH_SIZE = 1000
+
+
+def leer_celdas(ruta):
+    """
+    Genera las celdas de un archivo de plano.
+
+    - `.jsonl`: una celda por línea, se lee en streaming.
+    - `.json`: estructura `{"sections": [{"cells": [...]}]}`, se carga completa.
+    """
+    if ruta.lower().endswith('.jsonl'):
+        with open(ruta, encoding='utf-8') as archivo:
+            for linea in archivo:
+                if linea.strip():
+                    yield json.loads(linea)
+        return
+
+    with open(ruta, encoding='utf-8') as archivo:
+        yield from celdas_de_secciones(json.load(archivo))
+
+
+def celdas_de_secciones(data):
+    for section in data.get('sections', []):
+        yield from section.get('cells', [])
+
+
+def valores_celda(cell):
+    """Convierte una celda del plano a los campos de Posicion."""
+    return {
+        'nombre': cell.get('name') or cell['id'],
+        'piso': PISO_MAP.get(cell.get('floor'), 'PISO1'),
+        'coordenada_x': int(cell['position']['x']),
+        'coordenada_y': int(cell['position']['y']),
+        'estado': ESTADO_MAP.get(cell.get('status'), 'disponible'),
+        'descripcion': cell.get('description', ''),
+    }
+
+
+def importar_plano(celdas, sede, eliminar=True, batch_size=BATCH_SIZE):
+    """
+    Sincroniza las posiciones de `sede` con las celdas recibidas y devuelve las estadísticas.
+    """
+    inicio = time.perf_counter()
+    existentes = {}
+    sin_id_externo = {}
+    for fila in (
+        Posicion.objects.filter(sede=sede).order_by('id')
+        .values_list('id_externo', 'id', *CAMPOS_ACTUALIZABLES)
+    ):
+        if fila[0] is not None:
+            existentes[fila[0]] = fila[1:]
+        else:
+            # Si hay varias con el mismo nombre se empareja la más antigua
+            sin_id_externo.setdefault(fila[2], fila[1:])
+
+    nuevas = []
+    actualizadas = []
+    vistas = set()
+    for cell in celdas:
+        id_externo = str(cell['id'])
+        if id_externo in vistas:
+            continue
+        vistas.add(id_externo)
+        valores = valores_celda(cell)
+
+        actual = existentes.get(id_externo)
+        if actual is None:
+            actual = sin_id_externo.pop(valores['nombre'], None)
+            if actual is None:
+                nuevas.append(Posicion(sede=sede, id_externo=id_externo, color=COLOR_DEFECTO, **valores))
+            else:
+                actualizadas.append(Posicion(id=actual[0], id_externo=id_externo, **valores))
+        elif tuple(actual[1:]) != tuple(valores[campo] for campo in CAMPOS_ACTUALIZABLES):
+            actualizadas.append(Posicion(id=actual[0], id_externo=id_externo, **valores))
+    lectura = time.perf_counter() - inicio
+
+    por_eliminar = [actual[0] for id_externo, actual in existentes.items() if id_externo not in vistas] if eliminar else []
+    conservadas = set()
+    if por_eliminar:
+        conservadas = set(
+            Dispositivo.objects.filter(posicion_id__in=por_eliminar).values_list('posicion_id', flat=True).distinct()
+        )
+        por_eliminar = [pk for pk in por_eliminar if pk not in conservadas]
+
+    with transaction.atomic():
+        Posicion.objects.bulk_create(nuevas, batch_size=batch_size)
+        Posicion.objects.bulk_update(actualizadas, (*CAMPOS_ACTUALIZABLES, 'id_externo'), batch_size=batch_size)
+        eliminadas = Posicion.objects.filter(id__in=por_eliminar).delete()[0] if por_eliminar else 0
+
+    return {
+        'celdas': len(vistas),
+        'creadas': len(nuevas),
+        'actualizadas': len(actualizadas),
+        'eliminadas': eliminadas,
+        'conservadas_con_dispositivos': len(conservadas),
+        'sin_cambios': len(vistas) - len(nuevas) - len(actualizadas),
+        'segundos_lectura': round(lectura, 3),
+        'segundos_total': round(time.perf_counter() - inicio, 3),
+    }
@@ -0,0 +1,68 @@
+"""
+Mantenimiento del resumen materializado de inventario (sede × tipo × estado).
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction # type: ignore
+from django.db.models import Count, F # type: ignore
+
+from .models import Dispositivo, ResumenInventario
+
+
+def clave_resumen(sede_id, tipo, estado):
+    return (sede_id, tipo, estado or '')
+
+
+def ajustar_resumen(conteos):
+    """
+    Aplica los deltas {(sede_id, tipo, estado): delta} con incrementos F() atómicos,
+    creando las filas que aún no existan.
+    """
+    for (sede_id, tipo, estado), delta in conteos.items():
+        if not delta:
+            continue
+        filtro = {'sede_id': sede_id, 'tipo': tipo, 'estado': estado or ''}
+        if ResumenInventario.objects.filter(**filtro).update(cantidad=F('cantidad') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                ResumenInventario.objects.create(cantidad=delta, **filtro)
+        except IntegrityError:
+            # Otra transacción creó la fila entre el UPDATE y el INSERT
+            ResumenInventario.objects.filter(**filtro).update(cantidad=F('cantidad') + delta)
+
+
+def conteos_reales():
+    """
+    Calcula los conteos reales agrupando la tabla de dispositivos.
+    """
+    filas = Dispositivo.objects.order_by().values('sede_id', 'tipo', 'estado').annotate(cantidad=Count('id'))
+    conteos = Counter()
+    for fila in filas:
+        conteos[clave_resumen(fila['sede_id'], fila['tipo'], fila['estado'])] += fila['cantidad']
+    return conteos
+
+
+def reconstruir_resumen(aplicar=True):
+    """
+    Reconstruye el resumen desde cero y devuelve las diferencias encontradas como
+    lista de (clave, cantidad_en_resumen, cantidad_real).
+    """
+    with transaction.atomic():
+        reales = conteos_reales()
+        actuales = {
+            clave_resumen(r.sede_id, r.tipo, r.estado): r.cantidad
+            for r in ResumenInventario.objects.select_for_update()
+        }
+        diferencias = [
+            (clave, actuales.get(clave, 0), reales.get(clave, 0))
+            for clave in sorted(set(reales) | set(actuales), key=str)
+            if actuales.get(clave, 0) != reales.get(clave, 0)
+        ]
+        if aplicar and diferencias:
+            ResumenInventario.objects.all().delete()
+            ResumenInventario.objects.bulk_create([
+                ResumenInventario(sede_id=sede_id, tipo=tipo, estado=estado, cantidad=cantidad)
+                for (sede_id, tipo, estado), cantidad in reales.items()
+            ])
+    return diferencias
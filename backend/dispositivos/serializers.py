@@ -1,4 +1,8 @@
+from collections.abc import Mapping
+
 from rest_framework import serializers # type: ignore
+from rest_framework.validators import UniqueValidator # type: ignore
+from django.core.exceptions import ValidationError as DjangoValidationError # type: ignore
 from django.contrib.auth import authenticate # type: ignore
 from django.contrib.auth.hashers import make_password # type: ignore
 from django.utils.translation import gettext_lazy as _
@@ -6,7 +10,26 @@ from .models import RolUser, Sede, Dispositivo, Servicios, Posicion
 
 
 
-class RolUserSerializer(serializers.ModelSerializer):
+class EagerLoadingMixin:
+    """
+    Declara el plan de carga anticipada de cada serializador para evitar consultas N+1.
+    Las vistas aplican el plan con `setup_eager_loading` antes de serializar.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+
+class RolUserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = ('sedes',)
+
     sedes = serializers.PrimaryKeyRelatedField(queryset=Sede.objects.all(), many=True, required=False)
     password = serializers.CharField(write_only=True, required=False, min_length=8)
 
@@ -32,20 +55,17 @@ class RolUserSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
+        # La contraseña se cifra antes de crear: un único save (y una única validación)
         password = validated_data.pop('password', None)
-        user = super().create(validated_data)
         if password:
-            user.password = make_password(password)
-            user.save()
-        return user
+            validated_data['password'] = make_password(password)
+        return super().create(validated_data)
 
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
         if password:
-            user.password = make_password(password)
-            user.save()
-        return user
+            validated_data['password'] = make_password(password)
+        return super().update(instance, validated_data)
 
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField(required=True)
@@ -64,21 +84,114 @@ class LoginSerializer(serializers.Serializer):
         return data
     
 
-class PosicionSerializer(serializers.ModelSerializer):
+class PosicionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = Posicion
         fields = '__all__'
 
 
 
-class DispositivoSerializer(serializers.ModelSerializer):
-    sede = serializers.PrimaryKeyRelatedField(queryset=Sede.objects.all(), required=False)
+class RelacionPrecargadaField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField que, dentro de un DispositivoListSerializer, toma el objeto de los
+    precargados del lote en lugar de hacer una consulta por fila.
+    """
+
+    def to_internal_value(self, data):
+        precargados = getattr(self.root, '_precargados', {}).get(self.field_name)
+        if precargados is None:
+            return super().to_internal_value(data)
+        pk = _pk_relacion(self, data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        objeto = precargados.get(pk)
+        if objeto is None:
+            self.fail('does_not_exist', pk_value=data)
+        return objeto
+
+
+def _pk_relacion(field, valor):
+    try:
+        return field.get_queryset().model._meta.pk.to_python(valor)
+    except DjangoValidationError:
+        return None
+
+
+class UnicoEnLoteValidator(UniqueValidator):
+    """
+    UniqueValidator que, dentro de un DispositivoListSerializer, comprueba contra los valores
+    existentes precargados del lote (y los ya vistos en el propio lote) sin consultar por fila.
+    """
+
+    def __call__(self, value, serializer_field):
+        existentes = getattr(serializer_field.root, '_existentes', {}).get(serializer_field.field_name)
+        if existentes is None:
+            return super().__call__(value, serializer_field)
+        if value in existentes:
+            raise serializers.ValidationError(self.message, code='unique')
+        existentes.add(value)
+
+
+class DispositivoListSerializer(serializers.ListSerializer):
+    """
+    Valida un lote de dispositivos con un número fijo de consultas: las relaciones se
+    resuelven con un `in_bulk` por modelo relacionado y los campos únicos con una consulta
+    por campo, antes de validar las filas.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self._precargados = self.precargar_relaciones(data)
+            self._existentes = self.precargar_unicos(data)
+        return super().to_internal_value(data)
+
+    def precargar_unicos(self, data):
+        existentes = {}
+        for nombre, field in self.child.fields.items():
+            if not any(isinstance(v, UnicoEnLoteValidator) for v in field.validators):
+                continue
+            valores = set()
+            for fila in data:
+                if not isinstance(fila, Mapping) or not isinstance(fila.get(nombre), (str, int)):
+                    continue  # Los valores que no son escalares los rechaza la validación del campo
+                try:
+                    # El validador compara el valor ya limpio (p. ej. sin espacios): se precarga igual
+                    valor = field.to_internal_value(fila[nombre])
+                except serializers.ValidationError:
+                    continue
+                if valor:
+                    valores.add(valor)
+            existentes[nombre] = set(
+                Dispositivo.objects.filter(**{f"{nombre}__in": valores}).values_list(nombre, flat=True)
+            ) if valores else set()
+        return existentes
+
+    def precargar_relaciones(self, data):
+        precargados = {}
+        for nombre, field in self.child.fields.items():
+            if not isinstance(field, RelacionPrecargadaField):
+                continue
+            pks = {
+                _pk_relacion(field, fila[nombre])
+                for fila in data
+                if isinstance(fila, Mapping) and fila.get(nombre) not in (None, '')
+            }
+            pks.discard(None)
+            precargados[nombre] = field.get_queryset().in_bulk(pks) if pks else {}
+        return precargados
+
+
+class DispositivoSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('sede',)
+
+    sede = RelacionPrecargadaField(queryset=Sede.objects.all(), required=False)
     nombre_sede = serializers.CharField(source='sede.nombre', read_only=True)
-    posicion = serializers.PrimaryKeyRelatedField(queryset=Posicion.objects.all(), required=False)
+    posicion = RelacionPrecargadaField(queryset=Posicion.objects.all(), required=False)
     estado_propiedad = serializers.CharField(required=False, allow_blank=True)
 
     class Meta:
         model = Dispositivo
+        list_serializer_class = DispositivoListSerializer
         fields = [
             'id', 'tipo', 'estado', 'marca', 'razon_social', 'regimen', 'modelo', 'serial',
             'placa_cu', 'posicion', 'sede','nombre_sede',
@@ -86,43 +199,36 @@ class DispositivoSerializer(serializers.ModelSerializer):
             'ubicacion', 'sistema_operativo', 'procesador', 'proveedor', 'estado_propiedad'
         ]
 
+    def get_fields(self):
+        fields = super().get_fields()
+        for field in fields.values():
+            field.validators = [
+                UnicoEnLoteValidator(v.queryset, v.message, v.lookup) if type(v) is UniqueValidator else v
+                for v in field.validators
+            ]
+        return fields
+
     def create(self, validated_data):
-        # Validamos si `sede`, `posicion` o `servicio` existen en la base de datos
-        sede = validated_data.pop('sede', None)
-        posicion = validated_data.pop('posicion', None)
-        
-
-        dispositivo = Dispositivo.objects.create(
-            **validated_data,
-            sede=Sede.objects.filter(id=sede.id).first() if sede else None,
-            posicion=Posicion.objects.filter(id=posicion.id).first() if posicion else None
-          
-        )
-        return dispositivo
+        # `sede` y `posicion` ya son los objetos resueltos por los campos relacionados
+        return Dispositivo.objects.create(**validated_data)
 
     def update(self, instance, validated_data):
         # Actualizamos solo si se proporciona un nuevo valor válido
-        sede = validated_data.pop('sede', None)
-        posicion = validated_data.pop('posicion', None)
-    
-
-        instance.sede = Sede.objects.filter(id=sede.id).first() if sede else instance.sede
-        instance.posicion = Posicion.objects.filter(id=posicion.id).first() if posicion else instance.posicion
-    
-
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
         instance.save()
         return instance
-        
-        
+
+
 class SedeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Sede
         fields = ['id', 'nombre', 'ciudad', 'direccion']
 
-class ServiciosSerializer(serializers.ModelSerializer):
+class ServiciosSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = ('sedes',)
+
     sedes = SedeSerializer(many=True)  # 👈 Aquí usamos el serializador de sede
 
     class Meta:
@@ -0,0 +1,57 @@
+"""
+Motor de sesiones con escrituras agrupadas.
+
+Con `SESSION_SAVE_EVERY_REQUEST` Django guarda la sesión en cada petición solo para mover
+su expiración. Este motor (una extensión de `cached_db`) lee las sesiones de la caché y
+solo escribe, en la caché y en la base de datos, cuando:
+
+- los datos de la sesión cambiaron, o
+- desde la última escritura pasó al menos `SESION_FRACCION_RENOVACION` de la duración de
+  la sesión (con 300 s y 0.1, una escritura cada 30 s como máximo por sesión activa).
+
+La expiración sigue siendo deslizante: una sesión inactiva expira entre
+(1 - fracción) × duración y la duración completa después de la última petición.
+
+La caché solo se usa si la comparten todos los procesos. Con una caché local
+(LocMemCache) cada worker tendría su propia copia de la sesión y podría seguir sirviendo
+una sesión cerrada en otro, así que se lee y escribe únicamente la base de datos; omitir
+escrituras sigue siendo seguro porque el logout borra la fila.
+"""
+import time
+
+from django.conf import settings # type: ignore
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore # type: ignore
+from django.core.cache.backends.dummy import DummyCache # type: ignore
+from django.core.cache.backends.locmem import LocMemCache # type: ignore
+
+# Marca de la última escritura, guardada junto a los datos de la sesión
+CLAVE_GUARDADA = '_sesion_guardada'
+
+# Con DummyCache, cached_db lee y escribe solo la base de datos
+SIN_CACHE = DummyCache('sesiones', {})
+
+
+def cache_compartida(backend):
+    return not isinstance(backend, (LocMemCache, DummyCache))
+
+
+class SessionStore(CachedDBStore):
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        if not cache_compartida(self._cache):
+            self._cache = SIN_CACHE
+
+    def _renovacion_pendiente(self):
+        guardada = self._session.get(CLAVE_GUARDADA)
+        if guardada is None:
+            return True
+        fraccion = getattr(settings, 'SESION_FRACCION_RENOVACION', 0.1)
+        return time.time() - guardada >= self.get_expiry_age() * fraccion
+
+    def save(self, must_create=False):
+        if not must_create and self.session_key is not None and not self.modified and not self._renovacion_pendiente():
+            return
+        # Directamente en el dict: no marca la sesión como modificada
+        self._session[CLAVE_GUARDADA] = int(time.time())
+        super().save(must_create)
@@ -0,0 +1,127 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete # type: ignore
+from django.dispatch import receiver # type: ignore
+
+from .autenticacion import revocar_usuario
+from .catalogos import invalidar_catalogos
+from .colores import COLOR_DEFECTO, invalidar_colores
+from .estadisticas import invalidar_estadisticas
+from .models import Dispositivo, Posicion, RolUser, Sede, Servicios
+from .resumen import ajustar_resumen, clave_resumen, reconstruir_resumen
+
+
+@receiver(post_save, sender=Dispositivo)
+def invalidar_estadisticas_dispositivo(sender, instance, created, **kwargs):
+    """Invalida las estadísticas de la sede actual y de la anterior del dispositivo."""
+    sede_anterior = (getattr(instance, '_valores_previos', None) or {}).get('sede_id')
+    invalidar_estadisticas({instance.sede_id, sede_anterior})
+
+
+@receiver(post_delete, sender=Dispositivo)
+def invalidar_estadisticas_dispositivo_eliminado(sender, instance, **kwargs):
+    invalidar_estadisticas({instance.sede_id})
+
+
+@receiver(post_save, sender=Sede)
+@receiver(post_delete, sender=Sede)
+def invalidar_estadisticas_sede(sender, instance, **kwargs):
+    invalidar_estadisticas()
+
+
+@receiver(post_save, sender=Dispositivo)
+def actualizar_resumen_dispositivo(sender, instance, created, **kwargs):
+    """Mueve el dispositivo entre las filas del resumen si cambió su sede, tipo o estado."""
+    nueva = clave_resumen(instance.sede_id, instance.tipo, instance.estado)
+    if created:
+        ajustar_resumen({nueva: 1})
+        return
+
+    previos = getattr(instance, '_valores_previos', None)
+    if not previos:
+        return  # Sin valores cargados no se conoce el estado anterior
+
+    anterior = clave_resumen(
+        previos.get('sede_id', instance.sede_id),
+        previos.get('tipo', instance.tipo),
+        previos.get('estado', instance.estado),
+    )
+    if anterior != nueva:
+        ajustar_resumen({anterior: -1, nueva: 1})
+
+
+@receiver(post_delete, sender=Dispositivo)
+def actualizar_resumen_dispositivo_eliminado(sender, instance, **kwargs):
+    cargados = getattr(instance, '_valores_cargados', None) or {}
+    ajustar_resumen({clave_resumen(
+        cargados.get('sede_id', instance.sede_id),
+        cargados.get('tipo', instance.tipo),
+        cargados.get('estado', instance.estado),
+    ): -1})
+
+
+@receiver(post_delete, sender=Sede)
+def reconstruir_resumen_sede_eliminada(sender, instance, **kwargs):
+    """Los dispositivos de la sede quedan sin sede (SET_NULL), lo que no dispara señales."""
+    reconstruir_resumen()
+
+
+@receiver(post_save, sender=Servicios)
+def actualizar_color_posiciones(sender, instance, created, **kwargs):
+    """Propaga el color del servicio a sus posiciones con un único UPDATE."""
+    if created:
+        invalidar_colores()
+        return
+    if 'color' not in (getattr(instance, '_cambios', None) or {}):
+        return
+    invalidar_colores()
+    Posicion.objects.filter(servicio_id=instance.id).update(color=instance.color or COLOR_DEFECTO)
+
+
+@receiver(pre_delete, sender=Servicios)
+def restablecer_color_posiciones(sender, instance, **kwargs):
+    """Las posiciones quedan sin servicio (SET_NULL, sin señales) y vuelven al color por defecto."""
+    invalidar_colores()
+    Posicion.objects.filter(servicio_id=instance.id).update(color=COLOR_DEFECTO)
+
+
+@receiver(post_save, sender=Sede)
+@receiver(post_delete, sender=Sede)
+@receiver(post_save, sender=Servicios)
+@receiver(post_delete, sender=Servicios)
+def invalidar_catalogos_referencia(sender, **kwargs):
+    invalidar_catalogos()
+
+
+@receiver(m2m_changed, sender=Servicios.sedes.through)
+def invalidar_catalogos_sedes_servicio(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidar_catalogos()
+
+
+# Claims del token que dependen de campos de RolUser (las sedes se siguen con m2m_changed)
+CAMPOS_CLAIMS = {'rol', 'is_active'}
+
+
+@receiver(post_save, sender=RolUser)
+def revocar_tokens_usuario(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return  # Las cargas de fixtures (loaddata) no pasan por save() ni tienen tokens emitidos
+    cambios = getattr(instance, '_cambios', None) or {}
+    if CAMPOS_CLAIMS & cambios.keys():
+        instance.tokens_validos_desde = revocar_usuario(instance.id)
+
+
+@receiver(m2m_changed, sender=RolUser.sedes.through)
+def revocar_tokens_sedes_usuario(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            instance.tokens_validos_desde = revocar_usuario(instance.id)
+        return
+    # Desde la sede: se revocan los usuarios afectados
+    if action in ('post_add', 'post_remove'):
+        usuarios = pk_set
+    elif action == 'pre_clear':
+        usuarios = list(instance.usuarios_asignados.values_list('id', flat=True))
+    else:
+        return
+    for user_id in usuarios:
+        revocar_usuario(user_id)
@@ -1,3 +1,1215 @@
+import io
+import json
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import Workbook, load_workbook # type: ignore
+from rest_framework.test import APIClient # type: ignore
+
+from .models import Sede, Dispositivo, Posicion, Historial, Movimiento, RolUser, ResumenInventario, Servicios, TokenRevocado
+from .resumen import reconstruir_resumen
+from .busqueda import buscar_dispositivos
+
+
+def crear_dispositivo(sede=None, **kwargs):
+    datos = {
+        'tipo': 'COMPUTADOR',
+        'marca': 'DELL',
+        'modelo': 'Latitude',
+        'serial': f"SER-{Dispositivo.objects.count() + 1:05d}",
+        'estado': 'BUENO',
+        'sede': sede,
+    }
+    datos.update(kwargs)
+    return Dispositivo.objects.create(**datos)
+
+
+class DispositivoListadoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede = Sede.objects.create(nombre="Sede Norte", ciudad="Bogotá", direccion="Calle 1")
+        cls.otra_sede = Sede.objects.create(nombre="Sede Sur", ciudad="Cali", direccion="Calle 2")
+        for _ in range(5):
+            crear_dispositivo(sede=cls.sede)
+        for _ in range(3):
+            crear_dispositivo(sede=cls.otra_sede, tipo='MONITOR', estado='MALO')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_listado_sin_paginar_devuelve_todos(self):
+        response = self.client.get('/api/dispositivos/')
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data), 8)
+        self.assertEqual([d['id'] for d in data], sorted(d['id'] for d in data))
+
+    def test_paginacion_por_cursor(self):
+        response = self.client.get('/api/dispositivos/', {'page_size': 3})
+        self.assertEqual(len(response.data['results']), 3)
+        vistos = [d['id'] for d in response.data['results']]
+
+        siguiente = response.data['next']
+        while siguiente:
+            response = self.client.get(siguiente)
+            vistos += [d['id'] for d in response.data['results']]
+            siguiente = response.data['next']
+
+        self.assertEqual(vistos, sorted(Dispositivo.objects.values_list('id', flat=True)))
+
+    def test_filtros(self):
+        response = self.client.get('/api/dispositivos/', {'page_size': 10, 'sede': self.otra_sede.id, 'tipo': 'MONITOR'})
+        self.assertEqual(len(response.data['results']), 3)
+
+        response = self.client.get('/api/dispositivos/', {'page_size': 10, 'estado': 'BUENO'})
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_filtro_sede_no_numerico(self):
+        self.assertEqual(self.client.get('/api/dispositivos/', {'sede': 'norte'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/dispositivos/exportar/', {'sede': 'norte'}).status_code, 400)
+
+
+class DispositivoConsultasTests(TestCase):
+    """
+    El número de consultas del listado y del detalle no debe crecer con las filas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sedes = [
+            Sede.objects.create(nombre=f"Sede {i}", ciudad="Bogotá", direccion=f"Calle {i}")
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def crear_dispositivos(self, cantidad):
+        for i in range(cantidad):
+            crear_dispositivo(sede=self.sedes[i % len(self.sedes)])
+
+    def test_listado_paginado_consultas_constantes(self):
+        self.crear_dispositivos(3)
+        with self.assertNumQueries(1):
+            self.client.get('/api/dispositivos/', {'page_size': 50})
+
+        self.crear_dispositivos(30)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/dispositivos/', {'page_size': 50})
+        self.assertEqual(len(response.data['results']), 33)
+
+    def test_listado_completo_consultas_constantes(self):
+        self.crear_dispositivos(30)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/dispositivos/')
+            data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data), 30)
+        self.assertTrue(all(d['nombre_sede'] for d in data))
+
+    def test_detalle_una_consulta(self):
+        dispositivo = crear_dispositivo(sede=self.sedes[0])
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/dispositivos/{dispositivo.id}/')
+        self.assertEqual(response.data['nombre_sede'], self.sedes[0].nombre)
+
+
+class DispositivoCambiosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede = Sede.objects.create(nombre="Sede Centro", ciudad="Bogotá", direccion="Calle 3")
+        cls.posicion_a = Posicion.objects.create(sede=cls.sede, nombre="A1", piso='PISO1', coordenada_x=0, coordenada_y=0)
+        cls.posicion_b = Posicion.objects.create(sede=cls.sede, nombre="B1", piso='PISO1', coordenada_x=1, coordenada_y=0)
+
+    def test_modificacion_sin_consultas_extra(self):
+        dispositivo = Dispositivo.objects.get(pk=crear_dispositivo(sede=self.sede).pk)
+        dispositivo.estado = 'MALO'
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as consultas:
+                dispositivo.save()
+            self.assertFalse([q['sql'] for q in consultas if q['sql'].startswith('SELECT')])
+            # El historial se escribe al confirmar la transacción, no durante el guardado
+            self.assertFalse([q['sql'] for q in consultas if 'dispositivos_historial' in q['sql']])
+
+        historial = Historial.objects.get(dispositivo=dispositivo)
+        self.assertEqual(historial.cambios, {'v': 1, 'c': [[2, 'BUENO', 'MALO']]})
+
+    def test_guardar_sin_cambios_no_crea_historial(self):
+        dispositivo = Dispositivo.objects.get(pk=crear_dispositivo(sede=self.sede).pk)
+        with CaptureQueriesContext(connection) as consultas:
+            dispositivo.save()
+        self.assertEqual(len(consultas), 1)
+        self.assertFalse(Historial.objects.exists())
+
+    def test_update_fields_en_instancia_no_cargada(self):
+        dispositivo = crear_dispositivo(sede=self.sede)
+        parcial = Dispositivo(id=dispositivo.id, estado='MALO')
+        parcial.save(update_fields=['estado'])
+        self.assertEqual(parcial.campos_modificados(), {})
+        self.assertEqual(Dispositivo.objects.get(id=dispositivo.id).estado, 'MALO')
+
+    def test_cambio_de_posicion_registra_movimiento(self):
+        dispositivo = Dispositivo.objects.get(pk=crear_dispositivo(sede=self.sede, posicion=self.posicion_a).pk)
+        dispositivo.posicion = self.posicion_b
+        with self.captureOnCommitCallbacks(execute=True):
+            dispositivo.save()
+
+        movimiento = Movimiento.objects.get(dispositivo=dispositivo)
+        self.assertEqual((movimiento.ubicacion_origen, movimiento.ubicacion_destino), ("A1", "B1"))
+        self.assertEqual(
+            set(Historial.objects.filter(dispositivo=dispositivo).values_list('tipo_cambio', flat=True)),
+            {Historial.TipoCambio.MOVIMIENTO, Historial.TipoCambio.MODIFICACION}
+        )
+
+        # Un segundo guardado sin cambios no debe duplicar el movimiento
+        with self.captureOnCommitCallbacks(execute=True):
+            dispositivo.save()
+        self.assertEqual(Movimiento.objects.filter(dispositivo=dispositivo).count(), 1)
+
+    def test_movimiento_entre_posiciones_con_el_mismo_nombre(self):
+        otro_piso = Posicion.objects.create(sede=self.sede, nombre="A1", piso='PISO2', coordenada_x=0, coordenada_y=0)
+        dispositivo = Dispositivo.objects.get(pk=crear_dispositivo(sede=self.sede, posicion=self.posicion_a).pk)
+        dispositivo.posicion = otro_piso
+        with self.captureOnCommitCallbacks(execute=True):
+            dispositivo.save()
+
+        movimiento = Movimiento.objects.get(dispositivo=dispositivo)
+        self.assertEqual(
+            (movimiento.ubicacion_origen, movimiento.ubicacion_destino),
+            (f"A1 #{self.posicion_a.id} (PISO1)", f"A1 #{otro_piso.id} (PISO2)")
+        )
+
+
+class ImportacionDispositivosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede = Sede.objects.create(nombre="Sede Importación", ciudad="Medellín", direccion="Calle 4")
+        Posicion.objects.create(sede=cls.sede, nombre="P-01", piso='PISO2', coordenada_x=0, coordenada_y=0)
+        crear_dispositivo(serial="EXISTENTE")
+
+    def test_importar_csv(self):
+        contenido = (
+            "tipo,marca,modelo,serial,estado,sede,posicion\n"
+            "COMPUTADOR,DELL,Latitude,CSV-1,BUENO,Sede Importación,P-01\n"
+            "Monitor,hp,E24,CSV-2,,Sede Importación,\n"
+            "TOSTADORA,DELL,X,CSV-3,,,\n"
+            "COMPUTADOR,DELL,Latitude,EXISTENTE,,,\n"
+            "COMPUTADOR,DELL,Latitude,CSV-1,,,\n"
+        ).encode('utf-8')
+        archivo = SimpleUploadedFile("dispositivos.csv", contenido, content_type="text/csv")
+
+        response = APIClient().post('/api/dispositivos/importar/', {'archivo': archivo, 'batch_size': 1}, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['filas'], 5)
+        self.assertEqual(response.data['creados'], 2)
+        self.assertEqual(sorted(e['fila'] for e in response.data['errores']), [4, 5, 6])
+        creado = Dispositivo.objects.get(serial="CSV-1")
+        self.assertEqual((creado.sede_id, creado.piso), (self.sede.id, 'PISO2'))
+        self.assertEqual(Dispositivo.objects.get(serial="CSV-2").marca, 'HP')
+
+    def test_importar_xlsx(self):
+        libro = Workbook()
+        hoja = libro.active
+        hoja.append(["tipo", "marca", "modelo", "serial", "sede"])
+        for i in range(25):
+            hoja.append(["TABLET", "SAMSUNG", "Tab", f"XLSX-{i}", self.sede.id])
+        contenido = io.BytesIO()
+        libro.save(contenido)
+        archivo = SimpleUploadedFile("dispositivos.xlsx", contenido.getvalue())
+
+        response = APIClient().post('/api/dispositivos/importar/', {'archivo': archivo}, format='multipart')
+
+        self.assertEqual(response.data['creados'], 25)
+        self.assertEqual(response.data['errores'], [])
+        self.assertEqual(Dispositivo.objects.filter(sede=self.sede).count(), 25)
+
+    def test_valida_longitud_de_los_textos(self):
+        from .importacion import importar_dispositivos
+        reporte = importar_dispositivos([
+            {'tipo': 'COMPUTADOR', 'marca': 'DELL', 'modelo': 'M' * 500, 'serial': 'LARGO-1'},
+            {'tipo': 'COMPUTADOR', 'marca': 'DELL', 'modelo': 'Latitude', 'serial': 'LARGO-2'},
+        ])
+        self.assertEqual(reporte['creados'], 1)
+        self.assertEqual([(e['fila'], list(e['errores'])) for e in reporte['errores']], [(2, ['modelo'])])
+
+    def test_lote_fallido_se_reintenta_fila_por_fila(self):
+        from django.db import DataError
+        from .importacion import importar_dispositivos
+        bulk_create = Dispositivo.objects.bulk_create
+
+        def fallar_con_la_fila_mala(dispositivos, **kwargs):
+            # Simula el DataError que PostgreSQL lanzaría por un valor que no cabe en la columna
+            if any(d.serial == 'MALO' for d in dispositivos):
+                raise DataError("valor demasiado largo")
+            return bulk_create(dispositivos, **kwargs)
+
+        filas = [{'tipo': 'COMPUTADOR', 'marca': 'DELL', 'modelo': 'Latitude', 'serial': serial} for serial in ('OK-1', 'MALO', 'OK-2')]
+        with mock.patch.object(Dispositivo.objects, 'bulk_create', side_effect=fallar_con_la_fila_mala):
+            reporte = importar_dispositivos(filas)
+
+        self.assertEqual(reporte['creados'], 2)
+        self.assertEqual([e['fila'] for e in reporte['errores']], [3])
+        self.assertEqual(Dispositivo.objects.filter(serial__in=['OK-1', 'OK-2']).count(), 2)
+
+
+class ExportacionDispositivosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede = Sede.objects.create(nombre="Sede Exportación", ciudad="Barranquilla", direccion="Calle 5")
+        for _ in range(3):
+            crear_dispositivo(sede=cls.sede)
+
+    def test_exportar_csv(self):
+        response = APIClient().get('/api/dispositivos/exportar/')
+        lineas = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lineas), 4)
+        self.assertIn("Sede Exportación", lineas[1])
+        self.assertIn("Buen estado", lineas[1])
+
+    def test_exportar_xlsx(self):
+        response = APIClient().get('/api/dispositivos/exportar/', {'formato': 'xlsx'})
+        libro = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        filas = list(libro.active.iter_rows(values_only=True))
+        self.assertEqual(len(filas), 4)
+        self.assertEqual(filas[0][0], 'ID')
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede = Sede.objects.create(nombre="Sede Dashboard", ciudad="Bogotá", direccion="Calle 6")
+        cls.usuario = RolUser.objects.create_user(username="tecnico", email="tecnico@example.com", password="clave-segura-123", rol="coordinador")
+        crear_dispositivo(sede=cls.sede, usuario_asignado=cls.usuario)
+        crear_dispositivo(sede=cls.sede, tipo='MONITOR', marca='HP')
+        crear_dispositivo(tipo='MONITOR', estado=None)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_estadisticas_en_una_consulta(self):
+        # Catálogo de sedes + agregación
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/dashboard/')
+        estadisticas = response.data['estadisticas']
+        self.assertEqual((estadisticas['total'], estadisticas['asignados'], estadisticas['sin_asignar']), (3, 1, 2))
+        self.assertEqual(estadisticas['por_tipo']['MONITOR'], 2)
+        self.assertEqual(estadisticas['por_estado']['SIN_DATO'], 1)
+        self.assertEqual(response.data['cardsData'][1]['value'], "1")
+
+        response = self.client.get('/api/dashboard/', {'sede': self.sede.id})
+        self.assertEqual(response.data['estadisticas']['total'], 2)
+        self.assertNotIn('por_sede', response.data['estadisticas'])
+
+    def test_sede_no_numerica(self):
+        for sede in ('norte', '²'):
+            self.assertEqual(self.client.get('/api/dashboard/', {'sede': sede}).status_code, 400)
+
+    def test_cache_e_invalidacion(self):
+        self.client.get('/api/dashboard/', {'sede': self.sede.id})
+        with self.assertNumQueries(0):
+            self.client.get('/api/dashboard/', {'sede': self.sede.id})
+
+        crear_dispositivo(sede=self.sede)
+        response = self.client.get('/api/dashboard/', {'sede': self.sede.id})
+        self.assertEqual(response.data['estadisticas']['total'], 3)
+
+        Dispositivo.objects.filter(sede=self.sede).first().delete()
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.data['estadisticas']['total'], 3)
+
+
+class ResumenInventarioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede = Sede.objects.create(nombre="Sede Resumen", ciudad="Bogotá", direccion="Calle 7")
+        cls.otra_sede = Sede.objects.create(nombre="Sede Resumen 2", ciudad="Cali", direccion="Calle 8")
+
+    def cantidad(self, sede, tipo='COMPUTADOR', estado='BUENO'):
+        fila = ResumenInventario.objects.filter(sede=sede, tipo=tipo, estado=estado).first()
+        return fila.cantidad if fila else 0
+
+    def test_mantenimiento_incremental(self):
+        dispositivo = crear_dispositivo(sede=self.sede)
+        crear_dispositivo(sede=self.sede)
+        self.assertEqual(self.cantidad(self.sede), 2)
+
+        dispositivo = Dispositivo.objects.get(pk=dispositivo.pk)
+        dispositivo.sede = self.otra_sede
+        dispositivo.estado = 'MALO'
+        dispositivo.save()
+        self.assertEqual(self.cantidad(self.sede), 1)
+        self.assertEqual(self.cantidad(self.otra_sede, estado='MALO'), 1)
+
+        dispositivo.delete()
+        self.assertEqual(self.cantidad(self.otra_sede, estado='MALO'), 0)
+        self.assertEqual(reconstruir_resumen(aplicar=False), [])
+
+    def test_reconstruir_informa_y_corrige_diferencias(self):
+        crear_dispositivo(sede=self.sede)
+        Dispositivo.objects.update(estado=None)  # update() no dispara señales
+
+        diferencias = reconstruir_resumen()
+        self.assertEqual(len(diferencias), 2)
+        self.assertEqual(self.cantidad(self.sede, estado=''), 1)
+        self.assertEqual(reconstruir_resumen(), [])
+
+    def test_eliminar_sede_reconstruye(self):
+        crear_dispositivo(sede=self.otra_sede)
+        self.otra_sede.delete()
+        self.assertEqual(self.cantidad(None), 1)
+
+    def test_vista_filtra_por_sede(self):
+        crear_dispositivo(sede=self.sede)
+        client = APIClient()
+        response = client.get('/api/dashboard/resumen/', {'sede': self.sede.id})
+        self.assertEqual([fila['cantidad'] for fila in response.data], [1])
+        self.assertEqual(client.get('/api/dashboard/resumen/', {'sede': 'x'}).status_code, 400)
+
+
+class BusquedaDispositivosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        crear_dispositivo(serial="5CG1234XYZ", modelo="EliteBook", marca='HP')
+        crear_dispositivo(serial="PF-998877", modelo="ThinkPad", marca='LENOVO', proveedor="Compumax")
+
+    def test_busqueda_parcial_de_serial(self):
+        response = APIClient().get('/api/dispositivos/search/', {'q': '5cg12'})
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['serial'], "5CG1234XYZ")
+
+    def test_busqueda_varios_terminos(self):
+        response = APIClient().get('/api/dispositivos/search/', {'q': 'thinkpad compumax'})
+        self.assertEqual([d['serial'] for d in response.data['results']], ["PF-998877"])
+
+    def test_busqueda_sin_texto(self):
+        response = APIClient().get('/api/dispositivos/search/', {'q': ' '})
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(connection.vendor == 'postgresql', "El plan de ejecución solo se verifica en PostgreSQL")
+class IndicesConsultasTests(TestCase):
+    """
+    Ejecuta EXPLAIN sobre las consultas críticas de vistas y señales con un volumen de
+    datos grande y falla si alguna recorre la tabla completa (Seq Scan).
+    """
+    CANTIDAD = 20000
+
+    @classmethod
+    def setUpTestData(cls):
+        sedes = Sede.objects.bulk_create([
+            Sede(nombre=f"Sede índice {i}", ciudad="Bogotá", direccion=f"Calle {i}") for i in range(20)
+        ])
+        posiciones = Posicion.objects.bulk_create([
+            Posicion(sede=sedes[i % 20], nombre=f"P{i}", piso='PISO1', coordenada_x=i, coordenada_y=i) for i in range(400)
+        ])
+        usuario = RolUser.objects.create_user(username="indices", email="indices@example.com", password="clave-segura-123", rol="coordinador")
+        tipos = [codigo for codigo, _ in Dispositivo.TIPOS_DISPOSITIVOS]
+        estados = [codigo for codigo, _ in Dispositivo.ESTADO_DISPOSITIVO]
+        Dispositivo.objects.bulk_create([
+            Dispositivo(
+                tipo=tipos[i % len(tipos)], estado=estados[i % len(estados)], marca='DELL',
+                modelo=f"Modelo {i % 30}", serial=f"IDX-{i:06d}", sede=sedes[i % 20],
+                posicion=posiciones[i % 400], usuario_asignado=usuario if i % 50 else None,
+            )
+            for i in range(cls.CANTIDAD)
+        ], batch_size=2000)
+        cls.dispositivo = Dispositivo.objects.order_by('id').first()
+        cls.sede = sedes[0]
+        cls.posicion = posiciones[0]
+
+        ids = list(Dispositivo.objects.values_list('id', flat=True))
+        Historial.objects.bulk_create([
+            Historial(dispositivo_id=ids[i % len(ids)], cambios={"estado": {"antes": "BUENO", "despues": "MALO"}})
+            for i in range(cls.CANTIDAD)
+        ], batch_size=2000)
+        Movimiento.objects.bulk_create([
+            Movimiento(dispositivo_id=ids[i % len(ids)], ubicacion_origen='SEDE', ubicacion_destino='CASA')
+            for i in range(cls.CANTIDAD)
+        ], batch_size=2000)
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertSinSeqScan(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn(f"Seq Scan on {queryset.model._meta.db_table}", plan, plan)
+
+    def test_listado_por_cursor_con_filtros(self):
+        base = Dispositivo.objects.filter(id__gt=self.dispositivo.id).order_by('id')
+        self.assertSinSeqScan(base.filter(sede=self.sede)[:50])
+        self.assertSinSeqScan(base.filter(tipo='MONITOR')[:50])
+        self.assertSinSeqScan(base.filter(estado='MALO')[:50])
+
+    def test_dispositivos_sin_asignar_por_sede(self):
+        self.assertSinSeqScan(Dispositivo.objects.filter(sede=self.sede, usuario_asignado__isnull=True))
+
+    def test_dispositivos_por_posicion(self):
+        self.assertSinSeqScan(Dispositivo.objects.filter(posicion=self.posicion))
+
+    def test_serial(self):
+        self.assertSinSeqScan(Dispositivo.objects.filter(serial="IDX-000123"))
+
+    def test_busqueda(self):
+        self.assertSinSeqScan(buscar_dispositivos(Dispositivo.objects.all(), "idx-0001"))
+
+    def test_historial_y_movimientos_por_dispositivo(self):
+        self.assertSinSeqScan(Historial.objects.filter(dispositivo=self.dispositivo).order_by('-fecha_modificacion')[:20])
+        self.assertSinSeqScan(Movimiento.objects.filter(dispositivo=self.dispositivo).order_by('-fecha_movimiento')[:20])
+
+
+class BenchmarkUtilidadesTests(TestCase):
+    def test_percentil(self):
+        from .benchmark import percentil
+        valores = list(range(1, 101))
+        self.assertEqual((percentil(valores, 50), percentil(valores, 95), percentil(valores, 99)), (50, 95, 99))
+        self.assertEqual(percentil([7], 99), 7)
+
+    def test_construir_ruta(self):
+        from .benchmark import construir_ruta
+        self.assertEqual(construir_ruta('api/sedes/<int:sede_id>/', {'sede_id': 3}), '/api/sedes/3/')
+        self.assertEqual(construir_ruta('api/^usuarios/(?P<pk>[^/.]+)/$', {'pk': 7}), '/api/usuarios/7/')
+        self.assertIsNone(construir_ruta('api/^usuarios\\.(?P<format>[a-z0-9]+)/?$', {}))
+        self.assertIsNone(construir_ruta('api/sedes/<int:sede_id>/', {}))
+
+    def test_metodos_reales_y_rutas_no_medidas(self):
+        from .autenticacion import token_para_usuario
+        from .benchmark import ejecutar_benchmark
+        usuario = RolUser.objects.create_user(username="bench", email="bench@example.com", password="clave-123", rol="coordinador")
+        dispositivo = crear_dispositivo()
+        valores = {'user_id': usuario.id, 'dispositivo_id': dispositivo.id}
+        contexto = {'username': 'bench', 'password': 'clave-123', 'token': str(token_para_usuario(usuario).access_token)}
+
+        lote, = ejecutar_benchmark(valores, contexto, iteraciones=1, filtro='api/dispositivos/lote/')
+        self.assertEqual((lote['metodo'], lote['status'], lote['medido']), ('PATCH', 200, True))
+        self.assertEqual(Dispositivo.objects.get(id=dispositivo.id).estado, 'BUENO')  # Se revirtió
+        desactivar, = ejecutar_benchmark(valores, contexto, iteraciones=1, filtro='api/deusuarios/')
+        self.assertEqual((desactivar['metodo'], desactivar['medido']), ('PUT', False))
+        self.assertTrue(RolUser.objects.get(id=usuario.id).is_active)
+
+
+class PlanoPosicionesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede = Sede.objects.create(nombre="Sede Plano", ciudad="Bogotá", direccion="Calle 9")
+        for x in range(0, 1000, 100):
+            for y in range(0, 1000, 100):
+                Posicion.objects.create(sede=cls.sede, nombre=f"{x}-{y}", piso='PISO1', coordenada_x=x, coordenada_y=y)
+        Posicion.objects.create(sede=cls.sede, nombre="otro piso", piso='PISO2', coordenada_x=0, coordenada_y=0)
+        crear_dispositivo(sede=cls.sede, posicion=Posicion.objects.get(nombre="0-0"))
+
+    def test_ventana(self):
+        with self.assertNumQueries(1):
+            response = APIClient().get('/api/posiciones/plano/', {
+                'sede': self.sede.id, 'piso': 'PISO1', 'x_min': 0, 'x_max': 250, 'y_min': 0, 'y_max': 150,
+            })
+        celdas = response.data['celdas']
+        self.assertEqual(len(celdas), 6)
+        ocupada = next(c for c in celdas if c['nombre'] == "0-0")
+        self.assertEqual((ocupada['dispositivos_count'], ocupada['ocupada']), (1, True))
+
+    def test_tile(self):
+        response = APIClient().get('/api/posiciones/plano/', {'sede': self.sede.id, 'piso': 'PISO1', 'tile_x': 1, 'tile_y': 0})
+        self.assertEqual(len(response.data['celdas']), 25)
+        self.assertTrue(all(500 <= c['coordenada_x'] <= 999 for c in response.data['celdas']))
+
+    def test_parametros_obligatorios(self):
+        response = APIClient().get('/api/posiciones/plano/', {'sede': self.sede.id})
+        self.assertEqual(response.status_code, 400)
+
+    def test_tile_size_fuera_de_rango(self):
+        for tamano in (0, -500, 10 ** 9):
+            response = APIClient().get('/api/posiciones/plano/', {
+                'sede': self.sede.id, 'piso': 'PISO1', 'tile_x': 1, 'tile_y': 0, 'tile_size': tamano,
+            })
+            self.assertEqual(response.status_code, 400)
+
+
+class ImportacionPlanoTests(TestCase):
+    def setUp(self):
+        self.sede = Sede.objects.create(nombre="Sede Layout", ciudad="Cali", direccion="Calle 5")
+
+    def celda(self, id_celda, x=0, y=0, status='available'):
+        return {'id': id_celda, 'status': status, 'position': {'x': x, 'y': y}, 'floor': 'Piso 2', 'name': f"Espacio {id_celda}"}
+
+    def test_sincroniza_por_id_externo(self):
+        from .planos import importar_plano
+        importar_plano([self.celda('A1'), self.celda('A2', x=50), self.celda('A3', x=100)], self.sede)
+        ids = dict(Posicion.objects.values_list('id_externo', 'id'))
+        crear_dispositivo(sede=self.sede, posicion_id=ids['A3'])
+
+        estadisticas = importar_plano([self.celda('A1'), self.celda('A2', x=75, status='occupied'), self.celda('A4')], self.sede)
+
+        self.assertEqual(
+            (estadisticas['creadas'], estadisticas['actualizadas'], estadisticas['eliminadas'],
+             estadisticas['conservadas_con_dispositivos'], estadisticas['sin_cambios']),
+            (1, 1, 0, 1, 1)
+        )
+        # Las posiciones conservan su id y la referenciada por un dispositivo no se elimina
+        a2 = Posicion.objects.get(id=ids['A2'])
+        self.assertEqual((a2.coordenada_x, a2.estado, a2.piso), (75, 'ocupado', 'PISO2'))
+        self.assertTrue(Posicion.objects.filter(id=ids['A3']).exists())
+        self.assertEqual(Posicion.objects.filter(sede=self.sede).count(), 4)
+
+    def test_elimina_posiciones_libres(self):
+        from .planos import importar_plano
+        importar_plano([self.celda('A1'), self.celda('A2')], self.sede)
+        estadisticas = importar_plano([self.celda('A1')], self.sede)
+        self.assertEqual(estadisticas['eliminadas'], 1)
+        self.assertEqual(list(Posicion.objects.values_list('id_externo', flat=True)), ['A1'])
+
+    def test_empareja_posiciones_sin_id_externo_por_nombre(self):
+        from .planos import importar_plano
+        anterior = Posicion.objects.create(sede=self.sede, nombre="Espacio A1", piso='PISO2', coordenada_x=0, coordenada_y=0)
+
+        estadisticas = importar_plano([self.celda('A1', x=10), self.celda('A2')], self.sede)
+        self.assertEqual((estadisticas['creadas'], estadisticas['actualizadas']), (1, 1))
+        anterior.refresh_from_db()
+        self.assertEqual((anterior.id_externo, anterior.coordenada_x), ('A1', 10))
+
+        # Una segunda importación ya la encuentra por id_externo: no se duplica
+        estadisticas = importar_plano([self.celda('A1', x=10), self.celda('A2')], self.sede)
+        self.assertEqual((estadisticas['creadas'], estadisticas['sin_cambios']), (0, 2))
+        self.assertEqual(Posicion.objects.filter(sede=self.sede).count(), 2)
+
+
+class ColorPosicionTests(TestCase):
+    def setUp(self):
+        self.sede = Sede.objects.create(nombre="Sede Colores", ciudad="Bogotá", direccion="Calle 3")
+        self.servicio = Servicios.objects.create(nombre="Soporte", color="#112233")
+
+    def crear_posicion(self, nombre, servicio=None):
+        return Posicion.objects.create(sede=self.sede, servicio=servicio, nombre=nombre, piso='PISO1', coordenada_x=0, coordenada_y=0)
+
+    def test_color_del_servicio_sin_consultar(self):
+        self.crear_posicion("calentar", self.servicio)  # Carga la caché de colores
+        with CaptureQueriesContext(connection) as consultas:
+            posicion = self.crear_posicion("P1", self.servicio)
+        self.assertEqual(posicion.color, "#112233")
+        self.assertFalse([q for q in consultas if q['sql'].startswith('SELECT')])
+        self.assertEqual(self.crear_posicion("P2").color, '#B0BEC5')
+
+    def test_cache_local_expira(self):
+        self.crear_posicion("calentar", self.servicio)
+        Servicios.objects.filter(id=self.servicio.id).update(color="#445566")  # Cambio de otro proceso
+        self.assertEqual(self.crear_posicion("P1", self.servicio).color, "#112233")
+        with mock.patch('time.time', return_value=time.time() + 31):
+            self.assertEqual(self.crear_posicion("P2", self.servicio).color, "#445566")
+
+    def test_cambio_de_color_actualiza_posiciones(self):
+        self.crear_posicion("P1", self.servicio)
+        self.crear_posicion("P2", self.servicio)
+        servicio = Servicios.objects.get(id=self.servicio.id)
+        servicio.color = "#445566"
+        with CaptureQueriesContext(connection) as consultas:
+            servicio.save()
+        self.assertEqual(len([q for q in consultas if 'dispositivos_posicion' in q['sql']]), 1)
+        self.assertEqual(set(Posicion.objects.values_list('color', flat=True)), {"#445566"})
+        self.assertEqual(self.crear_posicion("P3", servicio).color, "#445566")
+
+    def test_eliminar_servicio_restablece_color(self):
+        self.crear_posicion("P1", self.servicio)
+        self.servicio.delete()
+        self.assertEqual(Posicion.objects.get(nombre="P1").color, '#B0BEC5')
+
+
+class AuditoriaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede = Sede.objects.create(nombre="Sede Auditoría", ciudad="Bogotá", direccion="Calle 4")
+
+    def test_cambios_en_lote_un_insert_por_modelo(self):
+        dispositivos = list(Dispositivo.objects.filter(pk__in=[crear_dispositivo(sede=self.sede).pk for _ in range(5)]))
+        with CaptureQueriesContext(connection) as consultas:
+            with self.captureOnCommitCallbacks(execute=True):
+                for dispositivo in dispositivos:
+                    dispositivo.estado = 'MALO'
+                    dispositivo.save()
+        inserts = [q['sql'] for q in consultas if q['sql'].startswith('INSERT INTO "dispositivos_historial"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Historial.objects.count(), 5)
+
+    def test_rollback_descarta_auditoria(self):
+        from django.db import transaction
+        dispositivo = Dispositivo.objects.get(pk=crear_dispositivo(sede=self.sede).pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    dispositivo.estado = 'MALO'
+                    dispositivo.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertFalse(Historial.objects.exists())
+
+    def test_savepoint_revertido_al_final_no_retiene_el_lote(self):
+        from django.db import transaction
+        confirmado, revertido = (Dispositivo.objects.get(pk=crear_dispositivo(sede=self.sede).pk) for _ in range(2))
+        with self.captureOnCommitCallbacks(execute=True):
+            confirmado.estado = 'MALO'
+            confirmado.save()
+            try:
+                with transaction.atomic():
+                    revertido.estado = 'MALO'
+                    revertido.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(list(Historial.objects.values_list('dispositivo_id', flat=True)), [confirmado.id])
+
+    def test_escritor_asincrono(self):
+        from .auditoria import escritor
+        dispositivo = Dispositivo.objects.get(pk=crear_dispositivo(sede=self.sede).pk)
+        dispositivo.estado = 'MALO'
+        with self.settings(AUDITORIA_ASINCRONA=True), mock.patch('dispositivos.auditoria.escribir') as escribir:
+            with self.captureOnCommitCallbacks(execute=True):
+                dispositivo.save()
+            escritor.esperar()
+        lote = escribir.call_args.args[0]
+        self.assertEqual([type(objeto) for objeto in lote], [Historial])
+
+
+class ArchivoAuditoriaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede = Sede.objects.create(nombre="Sede Archivo", ciudad="Bogotá", direccion="Calle 6")
+        cls.dispositivo = crear_dispositivo(sede=cls.sede)
+        cls.otro = crear_dispositivo(sede=cls.sede)
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio)
+
+    def crear_historial(self, dispositivo, dias):
+        historial = Historial.objects.create(dispositivo=dispositivo, cambios={"dias": dias})
+        Historial.objects.filter(id=historial.id).update(fecha_modificacion=timezone.now() - timedelta(days=dias))
+        return historial
+
+    def test_archiva_y_consulta_registros_combinados(self):
+        from .archivo import archivar, corte_retencion, leer_indice, registros_dispositivo
+        for dias in (5, 400, 430, 800):
+            self.crear_historial(self.dispositivo, dias)
+        self.crear_historial(self.otro, 500)
+
+        archivados = archivar(Historial, corte_retencion(365), self.directorio)
+
+        self.assertEqual(sum(cantidad for _, cantidad in archivados), 4)
+        self.assertEqual(list(Historial.objects.values_list('cambios', flat=True)), [{"dias": 5}])
+        registros = registros_dispositivo(Historial, self.dispositivo.id, directorio=self.directorio)
+        self.assertEqual([r['cambios']['dias'] for r in registros], [5, 400, 430, 800])
+        self.assertEqual(
+            [r['cambios']['dias'] for r in registros_dispositivo(Historial, self.dispositivo.id, limite=2, directorio=self.directorio)],
+            [5, 400]
+        )
+        # Solo los archivos que contienen al dispositivo aparecen en su índice
+        self.assertEqual(sum(1 for e in leer_indice(Historial, self.directorio) if self.otro.id in e['dispositivos']), 1)
+
+    def test_timeline_continua_en_el_archivo(self):
+        from .archivo import archivar, corte_retencion
+        from .timeline import consulta_archivo
+        for dias in (5, 400, 430):
+            self.crear_historial(self.dispositivo, dias)
+        movimiento, = Movimiento.objects.bulk_create([
+            Movimiento(dispositivo=self.dispositivo, ubicacion_origen='SEDE', ubicacion_destino='CASA')
+        ])
+        Movimiento.objects.filter(id=movimiento.id).update(fecha_movimiento=timezone.now() - timedelta(days=420))
+        for modelo in (Historial, Movimiento):
+            archivar(modelo, corte_retencion(365), self.directorio)
+
+        primera = consulta_archivo(self.dispositivo.id, 2, directorio=self.directorio)
+        self.assertEqual([(e['fuente'], e['detalle']) for e in primera], [('historial', {"dias": 5}), ('historial', {"dias": 400})])
+        ultimo = primera[-1]
+        segunda = consulta_archivo(
+            self.dispositivo.id, 2, (ultimo['fecha'], ultimo['fuente'], ultimo['registro_id']), self.directorio
+        )
+        self.assertEqual([(e['fuente'], e['detalle'] or e['origen']) for e in segunda], [('movimiento', 'SEDE'), ('historial', {"dias": 430})])
+
+    def test_verificar_no_mueve_registros(self):
+        from .archivo import archivar, corte_retencion
+        self.crear_historial(self.dispositivo, 400)
+        self.assertEqual(sum(c for _, c in archivar(Historial, corte_retencion(365), self.directorio, aplicar=False)), 1)
+        self.assertEqual(Historial.objects.count(), 1)
+
+
+class TimelineDispositivoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede = Sede.objects.create(nombre="Sede Timeline", ciudad="Bogotá", direccion="Calle 8")
+        cls.dispositivo = crear_dispositivo(sede=cls.sede)
+        ahora = timezone.now()
+        historiales = Historial.objects.bulk_create([
+            Historial(dispositivo=cls.dispositivo, cambios={"n": i}) for i in range(3)
+        ])
+        movimientos = Movimiento.objects.bulk_create([
+            Movimiento(dispositivo=cls.dispositivo, ubicacion_origen='SEDE', ubicacion_destino='CASA') for _ in range(2)
+        ])
+        # Fechas con un empate entre tablas para comprobar el desempate por fuente e id
+        for historial, minutos in zip(historiales, (50, 30, 10)):
+            Historial.objects.filter(id=historial.id).update(fecha_modificacion=ahora - timedelta(minutes=minutos))
+        for movimiento, minutos in zip(movimientos, (40, 30)):
+            Movimiento.objects.filter(id=movimiento.id).update(fecha_movimiento=ahora - timedelta(minutes=minutos))
+
+    def test_paginacion_keyset(self):
+        url = f'/api/dispositivos/{self.dispositivo.id}/timeline/'
+        vistos = []
+        with self.assertNumQueries(2):
+            response = APIClient().get(url, {'page_size': 2})
+        while True:
+            vistos += [(e['fuente'], e['detalle'] or e['origen']) for e in response.data['results']]
+            if not response.data['next']:
+                break
+            response = APIClient().get(response.data['next'])
+        self.assertEqual(vistos, [
+            ('historial', {"n": 2}), ('movimiento', 'SEDE'), ('historial', {"n": 1}),
+            ('movimiento', 'SEDE'), ('historial', {"n": 0}),
+        ])
+
+    def test_paginacion_continua_en_el_archivo(self):
+        from .archivo import archivar
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        # Archiva los dos eventos más antiguos (50 y 40 minutos)
+        corte = timezone.now() - timedelta(minutes=35)
+        for modelo in (Historial, Movimiento):
+            archivar(modelo, corte, directorio)
+        self.assertEqual((Historial.objects.count(), Movimiento.objects.count()), (2, 1))
+
+        vistos = []
+        with self.settings(AUDITORIA_ARCHIVO_DIR=directorio):
+            response = APIClient().get(f'/api/dispositivos/{self.dispositivo.id}/timeline/', {'page_size': 2})
+            while True:
+                vistos += [(e['fuente'], e['detalle'] or e['origen']) for e in response.data['results']]
+                if not response.data['next']:
+                    break
+                response = APIClient().get(response.data['next'])
+        self.assertEqual(vistos, [
+            ('historial', {"n": 2}), ('movimiento', 'SEDE'), ('historial', {"n": 1}),
+            ('movimiento', 'SEDE'), ('historial', {"n": 0}),
+        ])
+
+    def test_cursor_invalido(self):
+        response = APIClient().get(f'/api/dispositivos/{self.dispositivo.id}/timeline/', {'cursor': 'xx'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DiffHistorialTests(TestCase):
+    def test_codifica_ids_y_decodifica_legible(self):
+        from .diffs import codificar_cambios, decodificar_cambios
+        sede_a = Sede.objects.create(nombre="Sede A", ciudad="Bogotá", direccion="Calle 1")
+        sede_b = Sede.objects.create(nombre="Sede B", ciudad="Cali", direccion="Calle 2")
+        cambios = codificar_cambios({'sede_id': (sede_a.id, sede_b.id), 'estado': ('BUENO', 'MALO'), 'disponible': (True, False)})
+        self.assertEqual(cambios, {'v': 1, 'c': [[13, sede_a.id, sede_b.id], [2, 'BUENO', 'MALO'], [23, True, False]]})
+
+        antiguo = {'estado': {'antes': 'BUENO', 'despues': 'REPARAR'}, 'sede': {'antes': 'Sede object (1)', 'despues': None}}
+        with self.assertNumQueries(1):
+            nuevo, viejo, texto = decodificar_cambios([cambios, antiguo, "Movido a casa"])
+        self.assertEqual(nuevo, [
+            {'campo': 'sede', 'etiqueta': 'sede', 'antes': "Sede A", 'despues': "Sede B"},
+            {'campo': 'estado', 'etiqueta': 'estado', 'antes': 'Buen estado', 'despues': 'Mal estado'},
+            {'campo': 'disponible', 'etiqueta': 'disponible', 'antes': 'Sí', 'despues': 'No'},
+        ])
+        self.assertEqual(viejo[1]['antes'], 'Sede object (1)')
+        self.assertEqual(texto, "Movido a casa")
+
+
+class ActualizacionLoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sede_a = Sede.objects.create(nombre="Sede Origen", ciudad="Bogotá", direccion="Calle 1")
+        cls.sede_b = Sede.objects.create(nombre="Sede Destino", ciudad="Cali", direccion="Calle 2")
+        cls.posicion_a = Posicion.objects.create(sede=cls.sede_a, nombre="A1", piso='PISO1', coordenada_x=0, coordenada_y=0)
+        cls.posicion_b = Posicion.objects.create(sede=cls.sede_b, nombre="B1", piso='PISO1', coordenada_x=0, coordenada_y=0)
+        cls.ids = [crear_dispositivo(sede=cls.sede_a, posicion=cls.posicion_a).id for _ in range(20)]
+
+    def test_filtro_y_campos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().patch('/api/dispositivos/lote/', {
+                'filtro': {'sede': self.sede_a.id}, 'campos': {'sede': self.sede_b.id, 'posicion': self.posicion_b.id},
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['actualizados'], 20)
+        self.assertEqual(Dispositivo.objects.filter(sede=self.sede_b, posicion=self.posicion_b).count(), 20)
+        self.assertEqual(Historial.objects.filter(tipo_cambio=Historial.TipoCambio.MODIFICACION).count(), 20)
+        self.assertEqual(Movimiento.objects.count(), 20)
+        resumen = dict(ResumenInventario.objects.values_list('sede_id', 'cantidad'))
+        self.assertEqual((resumen[self.sede_a.id], resumen[self.sede_b.id]), (0, 20))
+        self.assertEqual(reconstruir_resumen(aplicar=False), [])
+
+    def test_filtro_que_no_restringe_nada(self):
+        for filtro in ({'ids': []}, {'sedes': self.sede_a.id}, {'sede': ''}, {'ids': 'todos'}, {'sede': 'x'}):
+            response = APIClient().patch('/api/dispositivos/lote/', {'filtro': filtro, 'campos': {'estado': 'MALO'}}, format='json')
+            self.assertEqual(response.status_code, 400, filtro)
+        self.assertFalse(Dispositivo.objects.filter(estado='MALO').exists())
+
+    def test_consultas_independientes_del_tamano(self):
+        cambios = [{'id': pk, 'estado': 'MALO'} for pk in self.ids]
+        with CaptureQueriesContext(connection) as consultas:
+            with self.captureOnCommitCallbacks(execute=True):
+                APIClient().patch('/api/dispositivos/lote/', {'cambios': cambios}, format='json')
+        sentencias = [q['sql'] for q in consultas]
+        self.assertEqual(sum(sql.startswith('UPDATE "dispositivos_dispositivo"') for sql in sentencias), 1)
+        self.assertEqual(sum(sql.startswith('INSERT INTO "dispositivos_historial"') for sql in sentencias), 1)
+        self.assertEqual(Dispositivo.objects.filter(estado='MALO').count(), 20)
+
+    def test_error_no_aplica_ningun_cambio(self):
+        response = APIClient().patch('/api/dispositivos/lote/', {'cambios': [
+            {'id': self.ids[0], 'estado': 'MALO'},
+            {'id': self.ids[1], 'estado': 'ROTO'},
+            {'id': self.ids[2], 'sede': 99999},
+            {'id': self.ids[3], 'serial': 'X'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['errores']), {self.ids[1], self.ids[2], self.ids[3]})
+        self.assertFalse(Dispositivo.objects.filter(estado='MALO').exists())
+
+
+    def test_id_duplicado(self):
+        response = APIClient().patch('/api/dispositivos/lote/', {'cambios': [
+            {'id': self.ids[0], 'estado': 'MALO'},
+            {'id': self.ids[0], 'estado': 'REPARAR'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.ids[0]), response.data['error'])
+        self.assertEqual(Dispositivo.objects.get(id=self.ids[0]).estado, 'BUENO')
+
+class DispositivoSerializerLoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sedes = [Sede.objects.create(nombre=f"Sede S{i}", ciudad="Bogotá", direccion="Calle 1") for i in range(3)]
+        cls.posicion = Posicion.objects.create(sede=cls.sedes[0], nombre="P1", piso='PISO1', coordenada_x=0, coordenada_y=0)
+        crear_dispositivo(serial="EXISTE-1")
+
+    def filas(self, n):
+        return [
+            {'tipo': 'MONITOR', 'marca': 'HP', 'modelo': 'E24', 'serial': f"LOTE-{i}", 'estado': 'BUENO',
+             'sede': self.sedes[i % 3].id, 'posicion': self.posicion.id}
+            for i in range(n)
+        ]
+
+    def test_validacion_con_consultas_constantes(self):
+        from .serializers import DispositivoSerializer
+        for n in (3, 30):
+            serializer = DispositivoSerializer(data=self.filas(n), many=True)
+            # sedes, posiciones y seriales: una consulta cada uno sin importar n (ninguna fila trae placa_cu)
+            with self.assertNumQueries(3):
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_errores_de_lote(self):
+        from .serializers import DispositivoSerializer
+        filas = self.filas(3)
+        filas[0]['serial'] = "EXISTE-1"
+        filas[1]['sede'] = 99999
+        filas[2]['serial'] = "LOTE-0"
+        filas.append(dict(filas[2]))
+        serializer = DispositivoSerializer(data=filas, many=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual([sorted(e) for e in serializer.errors], [['serial'], ['sede'], [], ['serial']])
+
+    def test_unico_con_espacios(self):
+        filas = self.filas(1)
+        filas[0]['serial'] = " EXISTE-1 "
+        response = APIClient().post('/api/dispositivos/', filas, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([sorted(e) for e in response.data], [['serial']])
+
+    def test_unico_no_escalar(self):
+        filas = self.filas(1)
+        filas[0]['serial'] = ["a"]
+        response = APIClient().post('/api/dispositivos/', filas, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([sorted(e) for e in response.data], [['serial']])
+
+    def test_alta_en_lote(self):
+        response = APIClient().post('/api/dispositivos/', self.filas(5), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Dispositivo.objects.filter(serial__startswith="LOTE-").count(), 5)
+
+    def test_actualizacion_individual_sin_reconsultar(self):
+        dispositivo = crear_dispositivo(sede=self.sedes[0])
+        with CaptureQueriesContext(connection) as consultas:
+            response = APIClient().put(f'/api/dispositivos/{dispositivo.id}/', {'sede': self.sedes[1].id, 'serial': dispositivo.serial}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # dispositivo, unicidad del serial y sede (validación); la sede no se vuelve a consultar al guardar
+        self.assertEqual(len([q for q in consultas if q['sql'].startswith('SELECT')]), 3)
+
+
+class CatalogosReferenciaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.sede = Sede.objects.create(nombre="Sede Catálogo", ciudad="Bogotá", direccion="Calle 9")
+        self.servicio = Servicios.objects.create(nombre="Soporte", color="#112233")
+        self.servicio.sedes.add(self.sede)
+
+    def test_cache_y_304(self):
+        respuesta = self.client.get('/api/servicios/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()[0]['sedes'][0]['nombre'], "Sede Catálogo")
+        etag = respuesta['ETag']
+        self.assertTrue(respuesta['Last-Modified'])
+
+        with self.assertNumQueries(0):
+            respuesta = self.client.get('/api/servicios/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        sedes = self.client.get('/api/sede/').json()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/sede/').json(), sedes)
+
+    def test_invalidacion_por_senales(self):
+        etag = self.client.get('/api/servicios/')['ETag']
+        sede = Sede.objects.create(nombre="Sede Nueva", ciudad="Cali", direccion="Calle 10")
+        self.servicio.sedes.add(sede)
+        respuesta = self.client.get('/api/servicios/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()[0]['sedes']), 2)
+        self.assertEqual(len(self.client.get('/api/sedes/').json()), 2)
+
+        self.sede.delete()
+        self.assertEqual([s['nombre'] for s in self.client.get('/api/sede/').json()['sedes']], ["Sede Nueva"])
+
+    def test_cache_local_expira(self):
+        # Un cambio hecho por otro proceso no dispara las señales de este
+        self.client.get('/api/sede/')
+        Sede.objects.filter(id=self.sede.id).update(nombre="Sede Renombrada")
+        self.assertEqual(self.client.get('/api/sede/').json()['sedes'][0]['nombre'], "Sede Catálogo")
+        with mock.patch('time.time', return_value=time.time() + 31):
+            self.assertEqual(self.client.get('/api/sede/').json()['sedes'][0]['nombre'], "Sede Renombrada")
+
+    def test_opciones_dispositivo(self):
+        respuesta = self.client.get('/api/dispositivos/opciones/')
+        self.assertEqual(respuesta.status_code, 200)
+        opciones = respuesta.json()
+        self.assertIn({'valor': 'BUENO', 'etiqueta': 'Buen estado'}, opciones['estado'])
+        self.assertIn('procesador', opciones)
+        self.assertIn('sistema_operativo', opciones)
+        respuesta = self.client.get('/api/dispositivos/opciones/', HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(respuesta.status_code, 304)
+
+
+class RolUserGuardadoTests(TestCase):
+    def setUp(self):
+        self.usuario = RolUser.objects.create_user(username="turno", email="turno@example.com", password="clave-segura-123", documento="123", rol="coordinador")
+
+    def test_update_fields_sin_consultas_de_validacion(self):
+        from django.contrib.auth.models import update_last_login
+        with CaptureQueriesContext(connection) as consultas:
+            update_last_login(None, self.usuario)
+            response = APIClient().put(f'/api/deusuarios/{self.usuario.id}/')
+        self.assertEqual(response.status_code, 200)
+        # Solo la lectura del usuario en la vista; ninguna consulta de unicidad
+        self.assertEqual(len([q for q in consultas if q['sql'].startswith('SELECT')]), 1)
+        self.usuario.refresh_from_db()
+        self.assertFalse(self.usuario.is_active)
+        self.assertIsNotNone(self.usuario.last_login)
+
+    def test_validacion_completa_y_de_campos_actualizados(self):
+        from django.core.exceptions import ValidationError
+        otro = RolUser(username="otro", email="TURNO@example.com ", rol="coordinador")
+        with self.assertRaises(ValidationError):
+            otro.save()
+        self.usuario.celular = "abc"
+        with self.assertRaises(ValidationError):
+            self.usuario.save(update_fields=['celular'])
+        self.usuario.save(update_fields=['last_login'])  # celular no se valida si no se guarda
+
+
+class AutenticacionJWTTests(TestCase):
+    def setUp(self):
+        from . import autenticacion
+        cache.clear()
+        # Los ids se reutilizan entre pruebas: se descarta la copia local de las revocaciones
+        autenticacion._revocados = {}
+        autenticacion._leido = None
+        self.sede = Sede.objects.create(nombre="Sede JWT", ciudad="Bogotá", direccion="Calle 11")
+        self.usuario = RolUser.objects.create_user(username="jwt", email="jwt@example.com", password="clave-segura-123", rol="coordinador")
+        self.usuario.sedes.add(self.sede)
+
+    def login(self):
+        response = APIClient().post('/api/login/', {'username': 'jwt', 'password': 'clave-segura-123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return cliente
+
+    def test_claims_sin_consultas(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+        from .autenticacion import JWTClaimsAuthentication
+        cliente = self.login()
+        cliente.get('/api/datos-protegidos/')  # Carga la lista de tokens revocados
+        with self.assertNumQueries(0):
+            response = cliente.get('/api/datos-protegidos/')
+        self.assertEqual(response.status_code, 200)
+
+        token = AccessToken(cliente._credentials['HTTP_AUTHORIZATION'].split()[1])
+        usuario = JWTClaimsAuthentication().get_user(token)
+        self.assertEqual((usuario.id, usuario.rol, usuario.sede_ids), (self.usuario.id, 'coordinador', [self.sede.id]))
+
+    def test_desactivacion_revoca_tokens(self):
+        cliente = self.login()
+        self.assertEqual(APIClient().put(f'/api/deusuarios/{self.usuario.id}/').status_code, 200)
+        self.assertEqual(cliente.get('/api/datos-protegidos/').status_code, 401)
+
+    def test_cambios_de_claims_revocan_desde_cualquier_guardado(self):
+        from . import autenticacion
+        cliente = self.login()
+        self.assertEqual(cliente.get('/api/datos-protegidos/').status_code, 200)
+
+        # Un guardado directo (como el del admin) también revoca, y otro proceso lo ve en la tabla
+        usuario = RolUser.objects.get(id=self.usuario.id)
+        usuario.rol = 'admin'
+        usuario.save()
+        autenticacion._revocados, autenticacion._leido = {}, None
+        self.assertEqual(cliente.get('/api/datos-protegidos/').status_code, 401)
+        self.assertIsInstance(RolUser.objects.get(id=self.usuario.id).tokens_validos_desde, int)
+
+        cliente = self.login()
+        self.assertEqual(cliente.get('/api/datos-protegidos/').status_code, 200)
+        self.sede.usuarios_asignados.clear()
+        self.assertEqual(cliente.get('/api/datos-protegidos/').status_code, 401)
+
+    def test_guardado_raw_no_falla(self):
+        from django.core import serializers as serializadores
+        fixture = serializadores.serialize('json', [RolUser.objects.get(id=self.usuario.id)], fields=['username', 'email', 'rol'])
+        for objeto in serializadores.deserialize('json', fixture):
+            objeto.save()  # Como loaddata: save_base(raw=True) sin pasar por save()
+
+    def test_token_sin_claims_usa_la_base_de_datos(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from . import autenticacion
+        # Asignar la sede en setUp revoca los tokens de ese segundo y este token solo tiene `iat`
+        RolUser.objects.filter(id=self.usuario.id).update(tokens_validos_desde=None)
+        autenticacion._revocados = {}
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.usuario).access_token}")
+        self.assertEqual(cliente.get('/api/datos-protegidos/').status_code, 200)
+        RolUser.objects.filter(id=self.usuario.id).update(is_active=False)
+        self.assertEqual(cliente.get('/api/datos-protegidos/').status_code, 401)
+
+    def test_validate_token_con_cache_y_logout(self):
+        from . import autenticacion
+        response = APIClient().post('/api/login/', {'username': 'jwt', 'password': 'clave-segura-123'}, format='json')
+        cliente = APIClient()
+        cliente.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(cliente.post('/api/validate-token/').status_code, 200)
+
+        with mock.patch.object(autenticacion, 'AccessToken', side_effect=AssertionError) as decodificar, self.assertNumQueries(0):
+            self.assertEqual(cliente.post('/api/validate-token/').status_code, 200)
+        decodificar.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            logout = cliente.post('/api/logout/', {'refresh': response.data['refresh']}, format='json')
+        self.assertEqual(logout.status_code, 200)
+        self.assertEqual(TokenRevocado.objects.filter(usuario=self.usuario).count(), 2)
+        self.assertEqual(cliente.post('/api/validate-token/').status_code, 401)
+        self.assertEqual(cliente.get('/api/datos-protegidos/').status_code, 401)
+
+        # Otro proceso, que leyó la lista justo antes del logout, la vuelve a leer al vencer el plazo
+        autenticacion._jtis = set()
+        autenticacion._leido = time.monotonic()
+        with mock.patch('dispositivos.autenticacion.time.monotonic', return_value=autenticacion._leido + 6):
+            self.assertEqual(cliente.post('/api/validate-token/').status_code, 401)
+
+    def test_token_invalido(self):
+        cliente = APIClient()
+        self.assertEqual(cliente.post('/api/validate-token/').status_code, 401)
+        cliente.credentials(HTTP_AUTHORIZATION="Bearer no-es-un-token")
+        self.assertEqual(cliente.post('/api/validate-token/').status_code, 401)
+
+
+class AutoLogoutMiddlewareTests(TestCase):
+    def procesar(self, ruta, usuario, cookie=True):
+        from django.conf import settings
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .middlewares import AutoLogoutMiddleware
+        request = RequestFactory().get(ruta)
+        if cookie:
+            request.COOKIES[settings.SESSION_COOKIE_NAME] = 'sesion'
+        request.user = usuario
+        with mock.patch('dispositivos.middlewares.logout') as logout:
+            AutoLogoutMiddleware(lambda r: HttpResponse())(request)
+        return logout
+
+    def test_api_y_sin_sesion_no_cargan_el_usuario(self):
+        from django.utils.functional import SimpleLazyObject
+        usuario = SimpleLazyObject(lambda: self.fail("No debe cargarse el usuario"))
+        self.procesar('/api/sede/', usuario)
+        self.procesar('/static/app.js', usuario)
+        self.procesar('/admin/', usuario, cookie=False)
+
+    def test_admin_cierra_sesion_de_usuario_inactivo(self):
+        inactivo = mock.Mock(is_authenticated=True, is_active=False)
+        self.procesar('/admin/', inactivo).assert_called_once()
+        activo = mock.Mock(is_authenticated=True, is_active=True)
+        self.procesar('/admin/', activo).assert_not_called()
+
+
+class SesionesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def cache_compartida(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        return self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directorio,
+        }})
+
+    def test_renovacion_agrupada(self):
+        from .sesiones import SessionStore
+        # Con una caché compartida la sesión se lee de la caché
+        with self.cache_compartida():
+            sesion = SessionStore()
+            sesion['usuario'] = 1
+            sesion.save()
+
+            # Sin cambios y dentro de la ventana: ni caché ni base de datos
+            with self.assertNumQueries(0):
+                sesion = SessionStore(sesion.session_key)
+                sesion.load()
+                sesion.save()
+
+            ahora = time.time()
+            with mock.patch('dispositivos.sesiones.time.time', return_value=ahora + 31):
+                with CaptureQueriesContext(connection) as consultas:
+                    sesion = SessionStore(sesion.session_key)
+                    sesion.load()
+                    sesion.save()
+            self.assertTrue([q for q in consultas if q['sql'].startswith('UPDATE')])
+
+            # Los cambios de datos se escriben siempre
+            sesion = SessionStore(sesion.session_key)
+            sesion['usuario'] = 2
+            with CaptureQueriesContext(connection) as consultas:
+                sesion.save()
+            self.assertTrue([q for q in consultas if q['sql'].startswith('UPDATE')])
+            self.assertEqual(SessionStore(sesion.session_key).load()['usuario'], 2)
+
+    def test_cache_local_no_sirve_sesiones_cerradas_en_otro_proceso(self):
+        from django.core.cache.backends.locmem import LocMemCache
+        from .sesiones import SessionStore
+
+        def proceso(nombre):
+            # Cada worker tiene su propia LocMemCache
+            return mock.patch('django.contrib.sessions.backends.cached_db.caches', {'default': LocMemCache(nombre, {})})
 
-# Create your tests here.
+        with proceso('a'):
+            sesion = SessionStore()
+            sesion['usuario'] = 1
+            sesion.save()
+        with proceso('b'):
+            en_b = SessionStore(sesion.session_key)
+            self.assertEqual(en_b['usuario'], 1)
+            en_b.save()  # Sin cambios: no escribe
+        with proceso('a'):
+            SessionStore(sesion.session_key).flush()  # Logout
+        with proceso('b'):
+            self.assertEqual(SessionStore(sesion.session_key).load(), {})
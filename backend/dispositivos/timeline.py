@@ -0,0 +1,162 @@
+"""
+Línea de tiempo de un dispositivo: Historial y Movimiento combinados en una sola consulta.
+
+Ambas tablas se proyectan a las mismas columnas y se unen con UNION ALL, ordenadas por
+(fecha, fuente, id) descendente; `fuente` desempata entre tablas cuyos ids coinciden.
+La paginación es por keyset: el cursor guarda la última clave devuelta y cada rama
+filtra por debajo de ella, apoyándose en los índices (dispositivo, -fecha, -id).
+
+Los registros que la retención movió al archivo se leen con `consulta_archivo`, que aplica
+el mismo orden y la misma clave de cursor: `eventos_timeline` continúa en el archivo cuando
+la página no se completa con las tablas, así que el historial no se corta al archivar.
+"""
+import base64
+import json
+import sys
+
+from django.db import connection # type: ignore
+from django.db.models import CharField, F, JSONField, Q, TextField, Value # type: ignore
+from django.db.models.constants import LOOKUP_SEP # type: ignore
+from django.utils.dateparse import parse_datetime # type: ignore
+
+from .archivo import registros_dispositivo
+from .models import Historial, Movimiento, RolUser
+
+ORDEN = ('-fecha', '-fuente', '-registro_id')
+
+
+def _nulo(campo):
+    return Value(None, output_field=campo)
+
+
+# Columnas de cada rama, en el mismo orden. Todas son anotaciones (y no campos del modelo)
+# para que el SELECT de ambas ramas tenga las columnas alineadas.
+RAMAS = (
+    (Historial, {
+        'fuente': Value('historial', output_field=CharField()),
+        'registro_id': F('id'),
+        'fecha': F('fecha_modificacion'),
+        'responsable_id': F('usuario_id'),
+        'responsable_nombre': F('usuario__nombre'),
+        'tipo': F('tipo_cambio'),
+        'detalle': F('cambios'),
+        'origen': _nulo(CharField()),
+        'destino': _nulo(CharField()),
+        'descripcion': _nulo(TextField()),
+    }),
+    (Movimiento, {
+        'fuente': Value('movimiento', output_field=CharField()),
+        'registro_id': F('id'),
+        'fecha': F('fecha_movimiento'),
+        'responsable_id': F('encargado_id'),
+        'responsable_nombre': F('encargado__nombre'),
+        'tipo': Value(Historial.TipoCambio.MOVIMIENTO.value, output_field=CharField()),
+        'detalle': _nulo(JSONField()),
+        'origen': F('ubicacion_origen'),
+        'destino': F('ubicacion_destino'),
+        'descripcion': F('observacion'),
+    }),
+)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(registro):
+    clave = {'fecha': registro['fecha'].isoformat(), 'fuente': registro['fuente'], 'id': registro['registro_id']}
+    return base64.urlsafe_b64encode(json.dumps(clave).encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        clave = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        fecha = parse_datetime(clave['fecha'])
+        if fecha is None:
+            raise ValueError
+        return fecha, str(clave['fuente']), int(clave['id'])
+    except (ValueError, KeyError, TypeError):
+        raise CursorInvalido("Cursor inválido.")
+
+
+def _filtro_keyset(fuente, clave):
+    """Filas de la rama `fuente` posteriores a `clave` en el orden descendente."""
+    fecha, fuente_cursor, id_cursor = clave
+    if fuente < fuente_cursor:
+        return Q(fecha__lte=fecha)
+    if fuente == fuente_cursor:
+        return Q(fecha__lt=fecha) | Q(fecha=fecha, registro_id__lt=id_cursor)
+    return Q(fecha__lt=fecha)
+
+
+def consulta_timeline(dispositivo_id, limite, cursor=None):
+    """Queryset (UNION ALL) con hasta `limite` eventos del dispositivo después de `cursor`."""
+    clave = decodificar_cursor(cursor) if cursor else None
+    ramas = []
+    for modelo, columnas in RAMAS:
+        rama = modelo.objects.filter(dispositivo_id=dispositivo_id).annotate(**columnas)
+        if clave:
+            rama = rama.filter(_filtro_keyset(columnas['fuente'].value, clave))
+        rama = rama.values(*columnas)
+        if connection.features.supports_slicing_ordering_in_compound:
+            # Cada rama recorre su índice y aporta como máximo `limite` filas
+            rama = rama.order_by(*ORDEN)[:limite]
+        else:
+            rama = rama.order_by()
+        ramas.append(rama)
+
+    return ramas[0].union(*ramas[1:], all=True).order_by(*ORDEN)[:limite]
+
+
+def _antes(fuente, clave):
+    """Clave (fecha, id) de `registros_dispositivo` equivalente a `_filtro_keyset`."""
+    fecha, fuente_cursor, id_cursor = clave
+    if fuente < fuente_cursor:
+        return fecha, sys.maxsize
+    if fuente == fuente_cursor:
+        return fecha, id_cursor
+    return fecha, 0
+
+
+def _evento_archivado(columnas, registro):
+    evento = {}
+    for nombre, expresion in columnas.items():
+        if isinstance(expresion, Value):
+            evento[nombre] = expresion.value
+        elif LOOKUP_SEP in expresion.name:
+            evento[nombre] = None  # Campos de relaciones: se resuelven después en bloque
+        else:
+            evento[nombre] = registro[expresion.name]
+    return evento
+
+
+def consulta_archivo(dispositivo_id, limite, clave=None, directorio=None):
+    """
+    Hasta `limite` eventos del dispositivo posteriores a `clave` (fecha, fuente, id) en el
+    orden de la línea de tiempo, leídos de las tablas y del archivo de auditoría.
+    """
+    eventos = []
+    for modelo, columnas in RAMAS:
+        antes = _antes(columnas['fuente'].value, clave) if clave else None
+        registros = registros_dispositivo(modelo, dispositivo_id, limite, directorio, antes)
+        eventos.extend(_evento_archivado(columnas, registro) for registro in registros)
+    eventos.sort(key=lambda e: (e['fecha'], e['fuente'], e['registro_id']), reverse=True)
+    eventos = eventos[:limite]
+
+    responsables = {e['responsable_id'] for e in eventos if e['responsable_id'] is not None}
+    if responsables:
+        nombres = dict(RolUser.objects.filter(id__in=responsables).values_list('id', 'nombre'))
+        for evento in eventos:
+            evento['responsable_nombre'] = nombres.get(evento['responsable_id'])
+    return eventos
+
+
+def eventos_timeline(dispositivo_id, limite, cursor=None, directorio=None):
+    """Hasta `limite` eventos después de `cursor`, de las tablas y, si no alcanzan, del archivo."""
+    clave = decodificar_cursor(cursor) if cursor else None
+    eventos = list(consulta_timeline(dispositivo_id, limite, cursor))
+    if len(eventos) < limite:
+        if eventos:
+            clave = (eventos[-1]['fecha'], eventos[-1]['fuente'], eventos[-1]['registro_id'])
+        eventos += consulta_archivo(dispositivo_id, limite - len(eventos), clave, directorio)
+    return eventos
@@ -12,18 +12,34 @@ from rest_framework.decorators import api_view, permission_classes # type: ignor
 from rest_framework import status# type: ignore
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response # type: ignore
-from .models import RolUser, Sede , Dispositivo , Servicios ,Posicion
+from .models import RolUser, Sede , Dispositivo , Servicios ,Posicion, ResumenInventario
 from .serializers import RolUserSerializer , ServiciosSerializer ,  LoginSerializer , DispositivoSerializer , SedeSerializer, PosicionSerializer
+from .pagination import DispositivoCursorPagination, BusquedaPagination
+from .busqueda import buscar_dispositivos
+from .importacion import BATCH_SIZE, importar_dispositivos, leer_filas
+from .exportacion import exportar_csv, exportar_xlsx
+from .estadisticas import obtener_estadisticas
+from .timeline import CursorInvalido, codificar_cursor, eventos_timeline
+from .diffs import decodificar_cambios
+from .lotes import MAX_LOTE, ErrorLote, actualizar_lote
+from .catalogos import respuesta_catalogo
+from .autenticacion import TokenInvalido, revocar_token, token_para_usuario, validar_token
 import logging
 logger = logging.getLogger(__name__)
 from django.views.decorators.cache import cache_control
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+import json
+from rest_framework.utils.encoders import JSONEncoder # type: ignore
+from rest_framework.utils.urls import replace_query_param # type: ignore
+from django.db import transaction
+from django.db.models import Count
 import jwt
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
 from django.contrib.auth import authenticate
 
 
@@ -47,7 +63,7 @@ def get_users_view(request):
     Obtiene la lista de usuarios.
     """
     # Obtén los usuarios de la base de datos (en tu caso RolUser)
-    users = RolUser.objects.all()
+    users = RolUserSerializer.setup_eager_loading(RolUser.objects.all())
     
     # Serializa la lista de usuarios
     serializer = RolUserSerializer(users, many=True)
@@ -56,7 +72,7 @@ def get_users_view(request):
     return Response(serializer.data)
 
 class RolUserViewSet(viewsets.ModelViewSet):
-    queryset = RolUser.objects.all()
+    queryset = RolUserSerializer.setup_eager_loading(RolUser.objects.all())
     serializer_class = RolUserSerializer
 
 @api_view(["POST"])
@@ -71,7 +87,8 @@ def login_user(request):
 
     user = authenticate(username=username, password=password)
     if user is not None:
-        refresh = RefreshToken.for_user(user)
+        # El token lleva rol, estado y sedes: las peticiones siguientes no consultan el usuario
+        refresh = token_para_usuario(user)
         return Response({
             "access": str(refresh.access_token),
             "refresh": str(refresh),
@@ -83,7 +100,7 @@ def login_user(request):
 @api_view(['GET'])
 @permission_classes([])  
 def get_users_view(request):
-    users = RolUser.objects.all()
+    users = RolUserSerializer.setup_eager_loading(RolUser.objects.all())
     serializer = RolUserSerializer(users, many=True)
     return Response(serializer.data)
 
@@ -91,7 +108,7 @@ def get_users_view(request):
 @permission_classes([IsAuthenticated])
 def user_detail_view(request, user_id):
     try:
-        user = RolUser.objects.get(id=user_id)
+        user = RolUserSerializer.setup_eager_loading(RolUser.objects.all()).get(id=user_id)
     except RolUser.DoesNotExist:
         return Response({"error": "Usuario no encontrado."}, status=404)
 
@@ -115,7 +132,7 @@ def activate_user_view(request, user_id):
         return Response({"message": "El usuario ya está activo."}, status=status.HTTP_400_BAD_REQUEST)
 
     user.is_active = True
-    user.save()
+    user.save(update_fields=['is_active'])
     return Response({"message": "Usuario activado exitosamente."}, status=status.HTTP_200_OK)
 
 
@@ -134,7 +151,7 @@ def deactivate_user_view(request, user_id):
         return Response({"message": "El usuario ya está desactivado."}, status=status.HTTP_400_BAD_REQUEST)
 
     user.is_active = False
-    user.save()
+    user.save(update_fields=['is_active'])
     return Response({"message": "Usuario desactivado exitosamente."}, status=status.HTTP_200_OK)
 
 
@@ -146,7 +163,7 @@ def get_user_detail_view(request, user_id):
     """
     try:
         # Obtener el usuario por ID
-        user = RolUser.objects.get(id=user_id)
+        user = RolUserSerializer.setup_eager_loading(RolUser.objects.all()).get(id=user_id)
     except RolUser.DoesNotExist:
         return Response({"error": "Usuario no encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -195,7 +212,6 @@ def register_user_view(request):
 
         sedes = Sede.objects.filter(id__in=sedes_ids)
         user.sedes.set(sedes)
-        user.save()
 
         return Response({"message": "Usuario registrado exitosamente."}, status=status.HTTP_201_CREATED)
 
@@ -204,21 +220,72 @@ def register_user_view(request):
         return Response({"error": "Ocurrió un error al registrar el usuario."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def token_de_cabecera(request):
+    """Token de la cabecera `Authorization: Bearer <token>`, o None si no viene."""
+    partes = request.headers.get("Authorization", "").split()
+    if len(partes) != 2 or partes[0] != "Bearer":
+        return None
+    return partes[1]
+
+
 @api_view(["POST"])
+@authentication_classes([])  # La validación la hace validar_token (con caché), no la autenticación de DRF
 @permission_classes([]) 
 def validate_token(request):
-    """Valida si el token es correcto y aún es válido."""
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or "Bearer" not in auth_header:
+    """Valida si el token es correcto, no fue revocado y aún es válido."""
+    token = token_de_cabecera(request)
+    if not token:
         return Response({"error": "Token no proporcionado"}, status=status.HTTP_401_UNAUTHORIZED)
 
     try:
-        token = auth_header.split(" ")[1]  # Extraer token de la cabecera
-        AccessToken(token)  # Decodificar y validar token
+        validar_token(token)
         return Response({"message": "Token válido"}, status=status.HTTP_200_OK)
-    except Exception:
+    except TokenInvalido as e:
+        return Response({"error": str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([])
+def logout_view(request):
+    """
+    Cierra la sesión revocando el access token de la cabecera y, si se envía, el refresh token.
+    """
+    tokens = []
+    try:
+        if token_de_cabecera(request):
+            tokens.append(AccessToken(token_de_cabecera(request)))
+        if request.data.get("refresh"):
+            tokens.append(RefreshToken(request.data["refresh"]))
+    except TokenError:
         return Response({"error": "Token inválido o expirado"}, status=status.HTTP_401_UNAUTHORIZED)
 
+    if not tokens:
+        return Response({"error": "Token no proporcionado"}, status=status.HTTP_400_BAD_REQUEST)
+
+    for token in tokens:
+        revocar_token(token)
+    return Response({"message": "Sesión cerrada."}, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def revocar_token_view(request):
+    """
+    Bloquea un token (access o refresh) de cualquier usuario. Solo para administradores.
+    """
+    if getattr(request.user, 'rol', None) != 'admin':
+        return Response({"error": "Solo un administrador puede revocar tokens."}, status=status.HTTP_403_FORBIDDEN)
+
+    token = request.data.get("token", "")
+    for clase in (AccessToken, RefreshToken):
+        try:
+            revocar_token(clase(token))
+            return Response({"message": "Token revocado."}, status=status.HTTP_200_OK)
+        except TokenError:
+            continue
+    return Response({"error": "Token inválido o expirado"}, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def obtener_datos_protegidos(request):
@@ -270,7 +337,7 @@ def reset_password(request):
     try:
         user = RolUser.objects.get(email=email)
         user.password = make_password(new_password)
-        user.save()
+        user.save(update_fields=['password'])
         return Response({"message": "Contraseña cambiada exitosamente."}, status=status.HTTP_200_OK)
     except RolUser.DoesNotExist:
         return Response({"error": "El correo no está registrado."}, status=status.HTTP_404_NOT_FOUND)
@@ -281,11 +348,10 @@ def reset_password(request):
 @permission_classes([]) 
 def get_sedes_view(request):
     """
-    Devuelve una lista de sedes disponibles.
+    Devuelve una lista de sedes disponibles (cacheada, con ETag y Last-Modified).
     """
     try:
-        sedes = Sede.objects.all().values('id', 'nombre', 'ciudad', 'direccion')
-        return Response({"sedes": list(sedes)}, status=status.HTTP_200_OK)
+        return respuesta_catalogo(request, 'sedes', envolver='sedes')
     except Exception as e:
         logger.error(f"Error al obtener las sedes: {str(e)}")
         return Response({"error": "Ocurrió un error al obtener las sedes."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -310,17 +376,94 @@ def edit_user_view(request, user_id):
 
 
 
+DISPOSITIVO_FILTROS = ('sede', 'tipo', 'estado')
+
+
+class FiltroInvalido(ValueError):
+    pass
+
+
+def id_sede(valor):
+    """Id numérico del parámetro `sede`; lanza FiltroInvalido si no lo es."""
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise FiltroInvalido("El filtro 'sede' debe ser un id numérico.")
+
+
+def filtrar_dispositivos(queryset, params):
+    """
+    Aplica los filtros opcionales `sede`, `tipo` y `estado` recibidos por query string.
+    Lanza FiltroInvalido si `sede` no es un id numérico.
+    """
+    for campo in DISPOSITIVO_FILTROS:
+        valor = params.get(campo)
+        if valor:
+            if campo == 'sede':
+                valor = id_sede(valor)
+            queryset = queryset.filter(**{campo: valor})
+    return queryset
+
+
+def stream_dispositivos_json(queryset, chunk_size=500):
+    """
+    Genera el listado de dispositivos como un arreglo JSON, serializando por bloques
+    de `chunk_size` filas para mantener la memoria constante.
+    """
+    yield '['
+    primero = True
+    bloque = []
+    for dispositivo in queryset.iterator(chunk_size=chunk_size):
+        bloque.append(dispositivo)
+        if len(bloque) == chunk_size:
+            yield ('' if primero else ',') + json.dumps(DispositivoSerializer(bloque, many=True).data, cls=JSONEncoder)[1:-1]
+            primero = False
+            bloque = []
+    if bloque:
+        yield ('' if primero else ',') + json.dumps(DispositivoSerializer(bloque, many=True).data, cls=JSONEncoder)[1:-1]
+    yield ']'
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])
 def dispositivo_view(request):
     """
     Maneja la creación y listado de dispositivos.
+
+    El listado acepta los filtros `sede`, `tipo` y `estado`. Si se envía `cursor` o
+    `page_size` la respuesta se pagina por cursor sobre el id; en caso contrario se
+    transmite la lista completa. Un POST con una lista crea los dispositivos en lote.
     """
     if request.method == 'GET':
-        # Obtener todos los dispositivos
-        dispositivos = Dispositivo.objects.all()
-        serializer = DispositivoSerializer(dispositivos, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        try:
+            dispositivos = filtrar_dispositivos(
+                DispositivoSerializer.setup_eager_loading(Dispositivo.objects.all()),
+                request.query_params
+            )
+        except FiltroInvalido as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Paginación por cursor solo si el cliente la pide (cursor o page_size)
+        if 'cursor' in request.query_params or 'page_size' in request.query_params:
+            paginator = DispositivoCursorPagination()
+            pagina = paginator.paginate_queryset(dispositivos, request)
+            serializer = DispositivoSerializer(pagina, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        # Sin paginación: se transmite la lista completa por bloques
+        return StreamingHttpResponse(
+            stream_dispositivos_json(dispositivos.order_by('id')),
+            content_type='application/json'
+        )
+
+    elif request.method == 'POST' and isinstance(request.data, list):
+        # Alta en lote: la validación resuelve relaciones y únicos con consultas por lote
+        serializer = DispositivoSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            dispositivos = serializer.save()
+        return Response({"message": f"{len(dispositivos)} dispositivos registrados exitosamente."}, status=status.HTTP_201_CREATED)
 
     elif request.method == 'POST':
         # Validar y crear un nuevo dispositivo
@@ -385,6 +528,184 @@ def dispositivo_view(request):
             return Response({"error": "Ocurrió un error al registrar el dispositivo."}, 
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def buscar_dispositivos_view(request):
+    """
+    Busca dispositivos por serial, placa, modelo, marca, proveedor o razón social (`q`).
+    Los resultados se ordenan por relevancia y se paginan (`page`, `page_size`).
+    """
+    texto = request.query_params.get('q', '').strip()
+    if not texto:
+        return Response({"error": "El parámetro q es obligatorio."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        dispositivos = filtrar_dispositivos(DispositivoSerializer.setup_eager_loading(Dispositivo.objects.all()), request.query_params)
+    except FiltroInvalido as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    dispositivos = buscar_dispositivos(dispositivos, texto)
+    paginator = BusquedaPagination()
+    pagina = paginator.paginate_queryset(dispositivos, request)
+    serializer = DispositivoSerializer(pagina, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def importar_dispositivos_view(request):
+    """
+    Importa dispositivos de forma masiva desde un archivo .xlsx o .csv (campo `archivo`).
+    Devuelve el reporte con los errores por fila y las filas procesadas por segundo.
+    """
+    archivo = request.FILES.get('archivo')
+    if not archivo:
+        return Response({"error": "Debe adjuntar un archivo .xlsx o .csv."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not archivo.name.lower().endswith(('.xlsx', '.csv')):
+        return Response({"error": "Formato no soportado. Use .xlsx o .csv."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        batch_size = int(request.data.get('batch_size', BATCH_SIZE))
+    except (TypeError, ValueError):
+        return Response({"error": "batch_size debe ser un número entero."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        reporte = importar_dispositivos(leer_filas(archivo, archivo.name), batch_size=max(batch_size, 1))
+    except Exception as e:
+        logger.error(f"Error al importar dispositivos: {str(e)}")
+        return Response({"error": "No se pudo leer el archivo."}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(reporte, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def exportar_dispositivos_view(request):
+    """
+    Exporta el inventario completo (o filtrado por `sede`, `tipo` y `estado`) en
+    formato CSV (por defecto) o XLSX (`formato=xlsx`) como respuesta en streaming.
+    """
+    formato = request.query_params.get('formato', 'csv').lower()
+    try:
+        dispositivos = filtrar_dispositivos(Dispositivo.objects.all(), request.query_params)
+    except FiltroInvalido as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if formato == 'csv':
+        response = StreamingHttpResponse(exportar_csv(dispositivos), content_type='text/csv; charset=utf-8')
+    elif formato == 'xlsx':
+        response = StreamingHttpResponse(
+            exportar_xlsx(dispositivos),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    else:
+        return Response({"error": "Formato no soportado. Use csv o xlsx."}, status=status.HTTP_400_BAD_REQUEST)
+
+    response['Content-Disposition'] = f'attachment; filename="inventario.{formato}"'
+    return response
+
+
+@api_view(['PATCH'])
+@permission_classes([AllowAny])
+def actualizar_dispositivos_lote_view(request):
+    """
+    Actualiza muchos dispositivos en una sola transacción. Acepta:
+
+    - `{"cambios": [{"id": 1, "sede": 3, ...}, ...]}`: campos distintos por dispositivo.
+    - `{"filtro": {"sede": 1, "tipo": "MONITOR", "ids": [...]}, "campos": {"sede": 4}}`:
+      los mismos campos para todos los dispositivos del filtro.
+
+    Si algún valor no es válido no se aplica ningún cambio y se devuelven los errores por id.
+    """
+    data = request.data
+    try:
+        if 'cambios' in data:
+            cambios_por_id = {}
+            for fila in data['cambios']:
+                fila = dict(fila)
+                pk = int(fila.pop('id'))
+                if pk in cambios_por_id:
+                    # Con dos filas para el mismo id una de ellas se perdería sin avisar
+                    return Response({"error": f"Id duplicado en 'cambios': {pk}."}, status=status.HTTP_400_BAD_REQUEST)
+                cambios_por_id[pk] = fila
+        elif 'filtro' in data and 'campos' in data:
+            filtro = data['filtro']
+            if not isinstance(filtro, dict):
+                return Response({"error": "El filtro debe ser un objeto."}, status=status.HTTP_400_BAD_REQUEST)
+            # Una clave mal escrita o una lista de ids vacía no puede terminar seleccionando todo el inventario
+            desconocidos = sorted(set(filtro) - {*DISPOSITIVO_FILTROS, 'ids'})
+            if desconocidos:
+                return Response({"error": f"Filtros no soportados: {', '.join(desconocidos)}."}, status=status.HTTP_400_BAD_REQUEST)
+            if 'ids' in filtro and (not isinstance(filtro['ids'], list) or not filtro['ids']):
+                return Response({"error": "'ids' debe ser una lista no vacía."}, status=status.HTTP_400_BAD_REQUEST)
+            if not any(filtro.get(campo) for campo in (*DISPOSITIVO_FILTROS, 'ids')):
+                return Response({"error": "El filtro no puede estar vacío."}, status=status.HTTP_400_BAD_REQUEST)
+            dispositivos = filtrar_dispositivos(Dispositivo.objects.all(), filtro)
+            if 'ids' in filtro:
+                dispositivos = dispositivos.filter(id__in=[int(pk) for pk in filtro['ids']])
+            ids = list(dispositivos.order_by('id').values_list('id', flat=True)[:MAX_LOTE + 1])
+            cambios_por_id = {pk: data['campos'] for pk in ids}
+        else:
+            return Response({"error": "Debe enviar 'cambios' o 'filtro' y 'campos'."}, status=status.HTTP_400_BAD_REQUEST)
+    except FiltroInvalido as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except (TypeError, ValueError, KeyError, AttributeError):
+        return Response({"error": "Formato de lote inválido: cada cambio necesita un 'id' numérico."}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Con JWT el usuario de la petición se construye desde el token; el movimiento necesita el RolUser
+    encargado = RolUser.objects.filter(id=request.user.id).first() if request.user.is_authenticated else None
+    try:
+        reporte = actualizar_lote(cambios_por_id, encargado=encargado)
+    except ErrorLote as e:
+        return Response({"errores": e.errores}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error al actualizar dispositivos en lote: {str(e)}")
+        return Response({"error": "Ocurrió un error al actualizar los dispositivos."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response(reporte, status=status.HTTP_200_OK)
+
+
+TIMELINE_PAGE_SIZE = 50
+TIMELINE_MAX_PAGE_SIZE = 200
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def dispositivo_timeline_view(request, dispositivo_id):
+    """
+    Devuelve el historial y los movimientos de un dispositivo en una sola línea de tiempo,
+    del más reciente al más antiguo, paginada con `cursor` y `page_size`. Al agotarse los
+    registros recientes la paginación continúa con los archivados.
+    """
+    if not Dispositivo.objects.filter(id=dispositivo_id).exists():
+        return Response({"error": "El dispositivo no existe."}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        page_size = min(int(request.query_params.get('page_size', TIMELINE_PAGE_SIZE)), TIMELINE_MAX_PAGE_SIZE)
+        if page_size < 1:
+            raise ValueError
+    except ValueError:
+        return Response({"error": "page_size debe ser un número entero positivo."}, status=status.HTTP_400_BAD_REQUEST)
+
+    cursor = request.query_params.get('cursor')
+    try:
+        # Se pide un evento de más para saber si hay página siguiente
+        eventos = eventos_timeline(dispositivo_id, page_size + 1, cursor)
+    except CursorInvalido as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    siguiente = None
+    if len(eventos) > page_size:
+        eventos = eventos[:page_size]
+        siguiente = replace_query_param(request.build_absolute_uri(), 'cursor', codificar_cursor(eventos[-1]))
+
+    # Diffs compactos del historial a formato legible (una consulta por modelo relacionado)
+    for evento, detalle in zip(eventos, decodificar_cambios([evento['detalle'] for evento in eventos])):
+        evento['detalle'] = detalle
+
+    return Response({"next": siguiente, "results": eventos}, status=status.HTTP_200_OK)
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([AllowAny])
 def dispositivo_detail_view(request, dispositivo_id):
@@ -393,7 +714,7 @@ def dispositivo_detail_view(request, dispositivo_id):
     """
     try:
         # Intentar obtener el dispositivo por su ID
-        dispositivo = Dispositivo.objects.get(id=dispositivo_id)
+        dispositivo = DispositivoSerializer.setup_eager_loading(Dispositivo.objects.all()).get(id=dispositivo_id)
     except Dispositivo.DoesNotExist:
         return Response({"error": "El dispositivo no existe."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -432,10 +753,8 @@ def servicios_view(request):
     """
 
     if request.method == 'GET':
-        # Obtener todos los servicios
-        servicios = Servicios.objects.all()
-        serializer = ServiciosSerializer(servicios, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Listado cacheado: responde 304 si el cliente ya tiene la versión actual
+        return respuesta_catalogo(request, 'servicios')
 
     elif request.method == 'POST':
         data = request.data
@@ -469,7 +788,7 @@ def servicio_detail_view(request, servicio_id):
     """
     try:
         # Intentar obtener el servicio por su ID
-        servicio = Servicios.objects.get(id=servicio_id)
+        servicio = ServiciosSerializer.setup_eager_loading(Servicios.objects.all()).get(id=servicio_id)
     except Servicios.DoesNotExist:
         return Response({"error": "El servicio no existe."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -516,10 +835,8 @@ def sede_view(request):
     Maneja la creación y listado de sedes.
     """
     if request.method == 'GET':
-        # Listar todas las sedes
-        sedes = Sede.objects.all()
-        serializer = SedeSerializer(sedes, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Listado cacheado: responde 304 si el cliente ya tiene la versión actual
+        return respuesta_catalogo(request, 'sedes')
 
     elif request.method == 'POST':
         # Crear una nueva sede
@@ -588,49 +905,151 @@ def sede_detail_view(request, sede_id):
             logger.error(f"Error al eliminar la sede: {str(e)}")
             return Response({"error": "Ocurrió un error al eliminar la sede."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def opciones_dispositivo_view(request):
+    """
+    Devuelve las opciones de los campos de dispositivo (tipos, marcas, procesadores,
+    sistemas operativos, etc.) como {campo: [{valor, etiqueta}]}. Cacheado, con ETag.
+    """
+    return respuesta_catalogo(request, 'opciones')
+
+
 # vistas para las posiciones
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def posiciones_view(request):
-    posiciones = Posicion.objects.all().prefetch_related('dispositivos')
+    posiciones = PosicionSerializer.setup_eager_loading(Posicion.objects.all())
     serializer = PosicionSerializer(posiciones, many=True)
 
     return Response(serializer.data, status=200)
 
 
+PLANO_MAX_CELDAS = 5000
+PLANO_TAMANO_TILE = 500
+PLANO_TAMANO_TILE_MAX = 5000
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def plano_posiciones_view(request):
+    """
+    Devuelve las celdas del plano de una sede y piso dentro de una ventana de coordenadas.
+
+    La ventana se indica con `x_min`, `x_max`, `y_min`, `y_max` o con un tile
+    (`tile_x`, `tile_y`, `tile_size`). Cada celda incluye la cantidad de dispositivos
+    y si está ocupada.
+    """
+    params = request.query_params
+    sede_id = params.get('sede')
+    piso = params.get('piso')
+    if not sede_id or not piso:
+        return Response({"error": "Los parámetros sede y piso son obligatorios."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        if 'tile_x' in params or 'tile_y' in params:
+            tamano = int(params.get('tile_size', PLANO_TAMANO_TILE))
+            if not 0 < tamano <= PLANO_TAMANO_TILE_MAX:
+                return Response(
+                    {"error": f"tile_size debe estar entre 1 y {PLANO_TAMANO_TILE_MAX}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            x_min = int(params.get('tile_x', 0)) * tamano
+            y_min = int(params.get('tile_y', 0)) * tamano
+            x_max, y_max = x_min + tamano - 1, y_min + tamano - 1
+        else:
+            x_min = int(params['x_min']) if 'x_min' in params else None
+            x_max = int(params['x_max']) if 'x_max' in params else None
+            y_min = int(params['y_min']) if 'y_min' in params else None
+            y_max = int(params['y_max']) if 'y_max' in params else None
+        sede_id = int(sede_id)
+    except ValueError:
+        return Response({"error": "Las coordenadas y la sede deben ser números enteros."}, status=status.HTTP_400_BAD_REQUEST)
+
+    posiciones = Posicion.objects.filter(sede_id=sede_id, piso=piso)
+    if x_min is not None:
+        posiciones = posiciones.filter(coordenada_x__gte=x_min)
+    if x_max is not None:
+        posiciones = posiciones.filter(coordenada_x__lte=x_max)
+    if y_min is not None:
+        posiciones = posiciones.filter(coordenada_y__gte=y_min)
+    if y_max is not None:
+        posiciones = posiciones.filter(coordenada_y__lte=y_max)
+
+    celdas = list(
+        posiciones
+        .annotate(dispositivos_count=Count('dispositivos'))
+        .order_by('coordenada_x', 'coordenada_y')
+        .values('id', 'nombre', 'coordenada_x', 'coordenada_y', 'estado', 'color', 'servicio_id', 'dispositivos_count')
+        [:PLANO_MAX_CELDAS + 1]
+    )
+    truncado = len(celdas) > PLANO_MAX_CELDAS
+    celdas = celdas[:PLANO_MAX_CELDAS]
+    for celda in celdas:
+        celda['ocupada'] = celda['dispositivos_count'] > 0 or celda['estado'] == 'ocupado'
+
+    return Response({
+        "sede": sede_id,
+        "piso": piso,
+        "ventana": {"x_min": x_min, "x_max": x_max, "y_min": y_min, "y_max": y_max},
+        "truncado": truncado,
+        "celdas": celdas,
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([]) 
 def dashboard_data(request):
-    # Ejemplo: contar dispositivos
-    total_dispositivos = Dispositivo.objects.count()
-    dispositivos_en_uso = Dispositivo.objects.filter(usuario_asignado__isnull=True).count()
-    dispositivos_disponibles = total_dispositivos - dispositivos_en_uso
+    """
+    Devuelve las tarjetas y estadísticas del dashboard, opcionalmente filtradas por `sede`.
+    Los conteos salen de una sola consulta agregada y se cachean por sede.
+    """
+    sede_id = request.query_params.get('sede')
+    try:
+        sede_id = id_sede(sede_id) if sede_id else None
+    except FiltroInvalido as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    estadisticas = obtener_estadisticas(sede_id)
 
-    # Ejemplo: Datos para tarjetas
     cardsData = [
         {
             "title": "Total dispositivos",
-            "value": str(total_dispositivos),
-            "date": "Hoy"  # Puedes formatear la fecha o agregar más info
+            "value": str(estadisticas['total']),
+            "date": "Hoy"
         },
         {
             "title": "Dispositivos en uso",
-            "value": str(dispositivos_en_uso),
+            "value": str(estadisticas['asignados']),
             "date": "Hoy"
         },
         {
             "title": "Dispositivos disponibles",
-            "value": str(dispositivos_disponibles),
+            "value": str(estadisticas['sin_asignar']),
             "date": "Hoy"
         }
     ]
 
-    # Aquí podrías agregar más consultas para datos de gráficas o estadísticas.
-    # Por ejemplo, si tienes un modelo de Estadísticas, podrías consultar Series de datos para la gráfica.
-    # De momento, devolveremos solo las cards.
     data = {
         "cardsData": cardsData,
-        # "quarterlyData": [...]  # Puedes agregar otros datos de gráficos aquí
+        "estadisticas": estadisticas,
     }
-    return Response(data)
\ No newline at end of file
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([]) 
+def resumen_inventario_view(request):
+    """
+    Devuelve el resumen materializado de dispositivos por sede, tipo y estado.
+    """
+    resumen = ResumenInventario.objects.filter(cantidad__gt=0).order_by('sede_id', 'tipo', 'estado')
+    sede_id = request.query_params.get('sede')
+    if sede_id:
+        try:
+            resumen = resumen.filter(sede_id=id_sede(sede_id))
+        except FiltroInvalido as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(list(resumen.values('sede_id', 'sede__nombre', 'tipo', 'estado', 'cantidad')))
+
@@ -50,19 +50,19 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'corsheaders.middleware.CorsMiddleware',  # Antes de CommonMiddleware para responder también a los preflight
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'corsheaders.middleware.CorsMiddleware', 
-    'django.middleware.cache.UpdateCacheMiddleware', 
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'corsheaders.middleware.CorsMiddleware',
-    'django.middleware.common.CommonMiddleware',
     'dispositivos.middlewares.AutoLogoutMiddleware',
 ]
 
+# AutoLogoutMiddleware no revisa estas rutas: la API se autentica con tokens
+AUTO_LOGOUT_RUTAS_EXCLUIDAS = ('/api/', '/static/', '/media/')
+
 # CORS Configurationx|x|
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -184,9 +184,28 @@ LOGGING = {
 }
 
 
+SESSION_ENGINE = 'dispositivos.sesiones'  # cached_db que solo escribe si hay cambios o toca renovar (sin caché si no es compartida)
 SESSION_COOKIE_AGE = 300  # 5 minutos (300 segundos)
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_SAVE_EVERY_REQUEST = True  # Renueva la sesión en cada solicitud
+SESION_FRACCION_RENOVACION = 0.1  # La expiración se extiende en BD tras 30 s (10 % de la duración)
+
+# Caché de catálogos, estadísticas, colores y sesiones. LocMemCache es por proceso: con varios
+# workers, usar FileBasedCache (o un servidor compartido) para que las invalidaciones
+# lleguen a todos.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+CACHE_TTL_LOCAL = 30  # Segundos que duran catálogos y colores si la caché es local del proceso
+
+# Auditoría (Historial y Movimiento), ver dispositivos/auditoria.py
+AUDITORIA_ASINCRONA = False  # True: los lotes se escriben en un hilo aparte
+AUDITORIA_COLA_MAXIMA = 100  # Lotes pendientes antes de aplicar contrapresión
+AUDITORIA_TIMEOUT_COLA = 2  # Segundos de espera con la cola llena antes de escribir en la petición
+AUDITORIA_RETENCION_DIAS = 365  # Días que se conservan en la base de datos (ver archivar_auditoria)
+AUDITORIA_ARCHIVO_DIR = BASE_DIR / 'archivo_auditoria'  # Archivos JSONL comprimidos con lo archivado
 
 
 
@@ -205,7 +224,7 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,  # Cambia este valor según tus necesidades
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.TokenAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'dispositivos.autenticacion.JWTClaimsAuthentication',  # Usuario desde los claims, sin consultas
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -218,4 +237,6 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),  # Extiende el tiempo del token
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
-}
\ No newline at end of file
+}
+JWT_REVOCACION_REFRESCO = 5  # Segundos entre lecturas de las revocaciones guardadas en la base de datos
+JWT_CACHE_VERIFICADOS = 10000  # Tokens verificados que validate_token recuerda por proceso (LRU)
\ No newline at end of file
@@ -34,6 +34,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     
     path('api/dashboard/', dashboard_data, name='dashboard-data'),
+    path('api/dashboard/resumen/', views.resumen_inventario_view, name='resumen-inventario'),
 
     # Autenticación y gestión de usuarios
     path('api/login/', views.login_user, name='login'),
@@ -42,6 +43,8 @@ urlpatterns = [
     path('api/dusuarios/<int:user_id>/', views.get_user_detail_view, name='get_user_detail_view'),
 
     path('api/validate-token/', validate_token, name='validate_token'),
+    path('api/logout/', views.logout_view, name='logout'),
+    path('api/tokens/revocar/', views.revocar_token_view, name='revocar_token'),
     path('api/datos-protegidos/', obtener_datos_protegidos, name='obtener_datos_protegidos'),
     # Activación y desactivación de usuarios
     path('api/activarusuarios/<int:user_id>/', views.activate_user_view, name='activate_user_view'),
@@ -59,7 +62,13 @@ urlpatterns = [
     
     # Rutas para dispositivos
     path('api/dispositivos/', views.dispositivo_view, name='dispositivo_view'),
+    path('api/dispositivos/search/', views.buscar_dispositivos_view, name='buscar_dispositivos_view'),
+    path('api/dispositivos/importar/', views.importar_dispositivos_view, name='importar_dispositivos_view'),
+    path('api/dispositivos/exportar/', views.exportar_dispositivos_view, name='exportar_dispositivos_view'),
+    path('api/dispositivos/opciones/', views.opciones_dispositivo_view, name='opciones_dispositivo_view'),
+    path('api/dispositivos/lote/', views.actualizar_dispositivos_lote_view, name='actualizar_dispositivos_lote_view'),
     path('api/dispositivos/<int:dispositivo_id>/', views.dispositivo_detail_view, name='dispositivo_view'),
+    path('api/dispositivos/<int:dispositivo_id>/timeline/', views.dispositivo_timeline_view, name='dispositivo_timeline_view'),
     
     
 # Rutas para servicios
@@ -77,6 +86,7 @@ urlpatterns = [
     
     # rutas de json plano
     path('api/posiciones/', views.posiciones_view, name='posicion-view'),
+    path('api/posiciones/plano/', views.plano_posiciones_view, name='plano-posiciones'),
 ]
 
 